@@ -0,0 +1,130 @@
+// 前端靜態資料 bundle（scripts/build_bundle.py 產生在 bundle/）
+// 只下載需要的系列 shard；搜尋索引載入後在記憶體裡直接查。
+const hocgBundle = (() => {
+  const BUNDLE_BASE = "bundle";
+
+  let manifestPromise = null;
+  let indexPromise = null;
+  const shardPromises = {};
+  const textPromises = {};
+
+  async function fetchJson(path) {
+    const resp = await fetch(`${BUNDLE_BASE}/${path}`);
+    if (!resp.ok) throw new Error(`${path}: HTTP ${resp.status}`);
+    return resp.json();
+  }
+
+  function loadManifest() {
+    if (!manifestPromise) manifestPromise = fetchJson("manifest.json");
+    return manifestPromise;
+  }
+
+  // sha256 帶在 query string，內容變了才會繞過瀏覽器快取
+  async function fetchAsset(entry) {
+    return fetchJson(`${entry.file}?v=${entry.sha256.slice(0, 12)}`);
+  }
+
+  async function loadShard(expansion) {
+    if (!shardPromises[expansion]) {
+      shardPromises[expansion] = loadManifest().then(async (manifest) => {
+        const entry = manifest.shards[expansion];
+        if (!entry) return [];
+        const shard = await fetchAsset(entry);
+        return shard.cards.map((row) => {
+          const card = { expansion };
+          manifest.card_fields.forEach((field, i) => {
+            card[field] = row[i];
+          });
+          card.prints = card.prints.map((p) => {
+            const print = {};
+            manifest.print_fields.forEach((field, i) => {
+              print[field] = p[i];
+            });
+            return print;
+          });
+          return card;
+        });
+      });
+    }
+    return shardPromises[expansion];
+  }
+
+  async function loadTexts(expansion) {
+    if (!textPromises[expansion]) {
+      textPromises[expansion] = loadManifest().then((manifest) =>
+        manifest.texts[expansion] ? fetchAsset(manifest.texts[expansion]) : {}
+      );
+    }
+    return textPromises[expansion];
+  }
+
+  function loadIndex() {
+    if (!indexPromise) {
+      indexPromise = loadManifest().then((manifest) => fetchAsset(manifest.index));
+    }
+    return indexPromise;
+  }
+
+  // 跟 scripts/ngram.py 的 normalize_text 相同
+  function normalizeText(text) {
+    return (text || "").normalize("NFKC").toLowerCase().replace(/\s+/g, "");
+  }
+
+  function codePrefixMatches(index, prefix) {
+    const codes = index.codes;
+    let lo = 0;
+    let hi = codes.length;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (codes[mid][0] < prefix) lo = mid + 1;
+      else hi = mid;
+    }
+    const ids = [];
+    for (let i = lo; i < codes.length && codes[i][0].startsWith(prefix); i++) {
+      ids.push(codes[i][1]);
+    }
+    return ids;
+  }
+
+  // 回傳 [{expansion, card_code, name_ja}]：卡號前綴符合的排前面，其次名稱 / 卡號包含 query 的
+  async function search(query, limit = 50) {
+    const index = await loadIndex();
+    const q = normalizeText(query);
+    if (!q) return [];
+
+    const size = Math.min(q.length, Math.max(...index.gram_sizes));
+    let candidates = null;
+    for (let i = 0; i + size <= q.length; i++) {
+      const posting = index.grams[q.slice(i, i + size)];
+      if (!posting) return finish(codePrefixMatches(index, q), index, limit);
+      if (candidates === null) {
+        candidates = new Set(posting);
+      } else {
+        const next = new Set();
+        for (const id of posting) if (candidates.has(id)) next.add(id);
+        candidates = next;
+      }
+    }
+
+    const ordered = codePrefixMatches(index, q);
+    const seen = new Set(ordered);
+    for (const id of candidates || []) {
+      if (seen.has(id)) continue;
+      const [, code, name] = index.cards[id];
+      // gram 都有不代表連在一起，最後用子字串確認
+      if (normalizeText(name).includes(q) || normalizeText(code).includes(q)) {
+        ordered.push(id);
+      }
+    }
+    return finish(ordered, index, limit);
+  }
+
+  function finish(ids, index, limit) {
+    return ids.slice(0, limit).map((id) => {
+      const [expansion, card_code, name_ja] = index.cards[id];
+      return { expansion, card_code, name_ja };
+    });
+  }
+
+  return { loadManifest, loadShard, loadTexts, loadIndex, search, normalizeText };
+})();
@@ -5,6 +5,10 @@ const ANON_KEY = "sb_publishable_rEvRt6x4kT6pKBUqh06YhQ_jHHO3zWU";
 // REST base
 const REST_BASE = `${PROJECT_URL}/rest/v1`;
 
+// 本機卡圖鏡像（scripts/mirror_images.py 產生），沒有就直接用官網圖
+const IMAGE_MANIFEST_URL = "images/manifest.json";
+const THUMB_WIDTH = 160;
+
 // DOM elements
 const statusEl = document.getElementById("status");
 const tableBody = document.getElementById("tableBody");
@@ -21,6 +25,7 @@ const totalFilteredValueEl = document.getElementById("totalFilteredValue");
 const totalFilteredCountEl = document.getElementById("totalFilteredCount");
 const clearSearchBtn = document.getElementById("clearSearchBtn");
 const filterSummaryEl = document.getElementById("filterSummary");
+const catalogToggle = document.getElementById("catalogToggle");
 
 const imageModal = document.getElementById("imageModal");
 const modalImage = document.getElementById("modalImage");
@@ -47,8 +52,40 @@ let sortAsc = true;
 let lastDecklogDiffRows = [];
 let decklogShowAllFlag = false;
 
+let imageManifest = {};
+
+// 卡表 bundle（bundle.js / scripts/build_bundle.py）；讀不到就維持 null，搜尋退回子字串比對
+let bundleManifest = null;
+// 篩選是非同步的（要等搜尋索引 / shard），只採用最後一次的結果
+let filterSeq = 0;
+
 /* ---------------- 共用工具 ---------------- */
 
+async function loadImageManifest() {
+  try {
+    const resp = await fetch(IMAGE_MANIFEST_URL);
+    if (!resp.ok) return;
+    const data = await resp.json();
+    imageManifest = data.images || {};
+  } catch (err) {
+    console.warn("讀取卡圖 manifest 失敗，改用官網圖片", err);
+  }
+}
+
+// 列表用本機縮圖；沒有鏡像就用原本的 URL（點開放大一律用原圖 URL）
+function thumbImageUrl(url) {
+  const entry = imageManifest[url];
+  return (entry && entry.thumbs && entry.thumbs[String(THUMB_WIDTH)]) || url;
+}
+
+async function loadBundleManifest() {
+  try {
+    bundleManifest = await hocgBundle.loadManifest();
+  } catch (err) {
+    console.warn("讀取卡表 bundle 失敗，搜尋改用子字串比對", err);
+  }
+}
+
 function setStatus(msg) {
   if (statusEl) statusEl.textContent = msg;
 }
@@ -236,18 +273,115 @@ async function loadAllRowsFromSupabase() {
   }
 }
 
+/* ---------------- 卡表 bundle：搜尋與未持有的卡 ---------------- */
+
+// 卡號比對用：跟搜尋索引一樣 NFKC + 小寫 + 去空白
+function codeKey(code) {
+  return hocgBundle.normalizeText(code);
+}
+
+// 系列名稱比對不分大小寫（HBP01 / hBP01）
+function expansionKey(exp) {
+  return (exp || "").trim().toLowerCase();
+}
+
+// 對應到 manifest 裡的 shard 名稱；bundle 沒有這個系列就回傳 null
+function shardName(exp) {
+  if (!bundleManifest) return null;
+  const key = expansionKey(exp);
+  return (
+    Object.keys(bundleManifest.shards).find((name) => expansionKey(name) === key) ||
+    null
+  );
+}
+
+// 關鍵字 → 搜尋索引裡符合的卡 [{expansion, card_code, name_ja}]；沒有 bundle 時回傳 null
+async function searchCatalog(keyword) {
+  if (!bundleManifest) return null;
+  try {
+    return await hocgBundle.search(keyword, Infinity);
+  } catch (err) {
+    console.warn("搜尋索引載入失敗，改用子字串比對", err);
+    return null;
+  }
+}
+
+// 卡圖檔名帶稀有度（hBP01-001_OSR.png）；找不到同稀有度的圖就用第一張
+function imageForRarity(cards, rarity) {
+  const suffix = `_${String(rarity || "").toUpperCase()}.`;
+  const hit = cards.find((c) => (c.image_url || "").toUpperCase().includes(suffix));
+  return (hit || cards[0]).image_url || "";
+}
+
+function yuyuCardUrl(mode, printKey) {
+  // print_key 是 YUYU 商品頁路徑（hbp01/10001）；沒有商品頁的版本交給搜尋頁
+  if (!/^[a-z0-9]+\/\d+$/.test(printKey || "")) return null;
+  return `https://yuyu-tei.jp/${mode}/hocg/card/${printKey}`;
+}
+
+// 從系列 shard 列出還沒持有的版本，格式跟持有清單相同（張數 0）。
+// 同卡號同稀有度已經有持有列的就不再列。codes 有給時只留這些卡號。
+async function loadUnownedRows(expansions, codes, name) {
+  const owned = new Set(
+    allRows.map(
+      (r) => `${codeKey(r.card_code)}\t${String(r.rarity_code || "").toUpperCase()}`
+    )
+  );
+  const shards = await Promise.all(expansions.map((exp) => hocgBundle.loadShard(exp)));
+
+  const rows = [];
+  shards.forEach((cards, i) => {
+    // 同一張卡的不同圖在 shard 裡是不同列，版本清單相同
+    const byCode = new Map();
+    for (const card of cards) {
+      if (!byCode.has(card.card_code)) byCode.set(card.card_code, []);
+      byCode.get(card.card_code).push(card);
+    }
+
+    for (const [code, images] of byCode) {
+      const card = images[0];
+      if (codes && !codes.has(codeKey(code))) continue;
+      if (name && card.name_ja !== name) continue;
+      for (const p of card.prints) {
+        const rarity = String(p.rarity || "").toUpperCase();
+        if (owned.has(`${codeKey(code)}\t${rarity}`)) continue;
+        rows.push({
+          card_code: code,
+          rarity_code: p.rarity,
+          name_ja: card.name_ja,
+          image_url: imageForRarity(images, p.rarity),
+          qty: 0,
+          sell_price_jpy: p.sell_price_jpy,
+          buy_price_jpy: p.buy_price_jpy,
+          market_value_jpy: 0,
+          sell_url: yuyuCardUrl("sell", p.print_key),
+          buy_url: yuyuCardUrl("buy", p.print_key),
+          expansion: expansions[i],
+          unowned: true,
+        });
+      }
+    }
+  });
+  return rows;
+}
+
 /* ---------------- 篩選與分頁 ---------------- */
 
 function populateExpansionFilter() {
   if (!expansionFilter) return;
-  const expansions = new Set(
-    allRows
-      .map((r) => r.expansion)
-      .filter((x) => x && x.trim().length > 0)
-  );
+  // bundle 的系列在前（拼法以 shard 為準），再補上持有清單裡 bundle 沒有的
+  const expansions = new Map();
+  for (const exp of Object.keys((bundleManifest && bundleManifest.shards) || {})) {
+    expansions.set(expansionKey(exp), exp);
+  }
+  for (const exp of allRows.map((r) => r.expansion)) {
+    if (exp && exp.trim().length > 0 && !expansions.has(expansionKey(exp))) {
+      expansions.set(expansionKey(exp), exp);
+    }
+  }
 
   expansionFilter.innerHTML = `<option value="">全部系列</option>`;
-  Array.from(expansions)
+  Array.from(expansions.values())
     .sort()
     .forEach((exp) => {
       const opt = document.createElement("option");
@@ -276,19 +410,33 @@ function populateNameFilter() {
     });
 }
 
-function applyFiltersAndRender() {
-  const keyword = searchInput.value.trim().toLowerCase();
+async function applyFiltersAndRender() {
+  const seq = ++filterSeq;
+  const keyword = searchInput.value.trim();
+  const lowerKeyword = keyword.toLowerCase();
   const expansion = expansionFilter.value;
   const name = nameFilter.value;
-
-  filteredRows = allRows.filter((row) => {
-    if (expansion && row.expansion !== expansion) return false;
+  const showUnowned = Boolean(catalogToggle && catalogToggle.checked);
+
+  // 關鍵字先查 bundle 的搜尋索引（卡號前綴 + 名稱 / 卡號 n-gram，全形半形都吃）
+  const matches = keyword ? await searchCatalog(keyword) : null;
+  if (seq !== filterSeq) return;
+  const matchedCodes = matches
+    ? new Set(matches.map((m) => codeKey(m.card_code)))
+    : null;
+
+  const rows = allRows.filter((row) => {
+    if (expansion && expansionKey(row.expansion) !== expansionKey(expansion)) {
+      return false;
+    }
     if (name && row.name_ja !== name) return false;
 
     if (keyword) {
+      if (matchedCodes && matchedCodes.has(codeKey(row.card_code))) return true;
+      // 卡表裡沒有的持有卡（或沒有 bundle）還是用子字串比對
       const code = (row.card_code || "").toLowerCase();
       const nm = (row.name_ja || "").toLowerCase();
-      if (!code.includes(keyword) && !nm.includes(keyword)) {
+      if (!code.includes(lowerKeyword) && !nm.includes(lowerKeyword)) {
         return false;
       }
     }
@@ -296,6 +444,33 @@ function applyFiltersAndRender() {
     return true;
   });
 
+  // 未持有的卡只下載需要的 shard：選了系列就是那個系列，否則是搜尋結果所在的系列
+  if (showUnowned && bundleManifest && (!keyword || matchedCodes)) {
+    const expansions = expansion
+      ? [shardName(expansion)].filter(Boolean)
+      : matches
+      ? Array.from(new Set(matches.map((m) => m.expansion)))
+      : [];
+    if (expansions.length === 0) {
+      setStatus("要列出未持有的卡，請先選系列或輸入關鍵字。");
+    } else {
+      setStatus(`讀取卡表 ${expansions.join(", ")} 中...`);
+      try {
+        const unowned = await loadUnownedRows(expansions, matchedCodes, name);
+        if (seq !== filterSeq) return;
+        rows.push(...unowned);
+        setStatus(
+          `持有 ${rows.length - unowned.length} 筆 + 未持有的版本 ${unowned.length} 筆（卡表：${expansions.join(", ")}）。`
+        );
+      } catch (err) {
+        console.error(err);
+        if (seq !== filterSeq) return;
+        setStatus(`讀取卡表失敗：${err.message}`);
+      }
+    }
+  }
+
+  filteredRows = rows;
   currentPage = 1;
   sortFilteredRows();
   updateTotals();
@@ -352,7 +527,7 @@ function updatePager() {
 function attachImageModal(img) {
   if (!imageModal || !modalImage) return;
   img.addEventListener("click", () => {
-    modalImage.src = img.src;
+    modalImage.src = img.dataset.full || img.src;
     imageModal.classList.add("active");
   });
 }
@@ -376,6 +551,9 @@ function renderTable() {
 
   for (const row of rows) {
     const tr = document.createElement("tr");
+    if (row.unowned) {
+      tr.classList.add("unowned-row");
+    }
 
     const tdCode = document.createElement("td");
     tdCode.textContent = row.card_code;
@@ -395,7 +573,8 @@ function renderTable() {
     const tdImg = document.createElement("td");
     if (row.image_url) {
       const img = document.createElement("img");
-      img.src = row.image_url;
+      img.src = thumbImageUrl(row.image_url);
+      img.dataset.full = row.image_url;
       img.alt = row.card_code;
       img.loading = "lazy";
       img.className = "card-img";
@@ -651,7 +830,8 @@ function renderDecklogResultsTable(diffRows, showAll = false) {
     const tdImg = document.createElement("td");
     if (row.image_url) {
       const img = document.createElement("img");
-      img.src = row.image_url;
+      img.src = thumbImageUrl(row.image_url);
+      img.dataset.full = row.image_url;
       img.alt = row.card_code;
       img.loading = "lazy";
       img.style.maxHeight = "64px";
@@ -824,6 +1004,12 @@ if (nameFilter) {
   });
 }
 
+if (catalogToggle) {
+  catalogToggle.addEventListener("change", () => {
+    applyFiltersAndRender();
+  });
+}
+
 // 分頁
 if (pageSizeSelect) {
   pageSizeSelect.addEventListener("change", () => {
@@ -957,4 +1143,6 @@ document.querySelectorAll("th[data-sort-key]").forEach((th) => {
 });
 
 // 初始化
-loadAllRowsFromSupabase();
+Promise.all([loadImageManifest(), loadBundleManifest()]).then(
+  loadAllRowsFromSupabase
+);
@@ -0,0 +1,230 @@
+"""
+解析器 benchmark + golden 比對。
+
+bench/fixtures/ 底下存著官網詳細頁、cardsearch_ex 清單頁、YUYU sell / buy 搜尋頁，
+manifest.json 記錄每個檔案的種類、原始 URL 與來源（source）。對每種後端（bs4 / fast）：
+
+  - 解析結果必須與 bench/golden.json 完全一致
+  - 量測每秒頁數（pages/s）與 tracemalloc 的峰值記憶體
+  - 低於 bench/thresholds.json 的門檻就失敗（exit code 1）
+
+source 是 synthetic 的 fixture 是依 data/ 裡的 CSV 重建的頁面，只證明兩個後端對
+自產的 HTML 結果相同；--record 會把頁面換成實際從網站抓下來的版本（source 改成
+recorded），再用 bs4 重建 golden。實際錄製由 .github/workflows/bench_parsers.yml 在
+GitHub Actions 上跑，並把 fixture 與 golden commit 回來；--require-recorded 讓還有
+synthetic fixture 時直接失敗。
+
+用法：
+  python scripts/bench_parsers.py                  # 跑 benchmark + 檢查
+  python scripts/bench_parsers.py --json out.json  # 另外輸出機器可讀結果
+  python scripts/bench_parsers.py --record         # 依 manifest 重新下載頁面
+  python scripts/bench_parsers.py --require-recorded  # 全部都要是實際錄製的頁面
+  python scripts/bench_parsers.py --update-golden  # 用 bs4 後端重建 golden
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+
+# golden 裡的 image_url / card_page_url 以正式站為準
+os.environ["HOCG_BASE_URL"] = "https://hololive-official-cardgame.com"
+
+import crawl_official_cards  # noqa: E402
+import crawl_yuyutei_prices  # noqa: E402
+import html_backend  # noqa: E402
+import http_client  # noqa: E402
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench")
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+MANIFEST_PATH = os.path.join(FIXTURE_DIR, "manifest.json")
+GOLDEN_PATH = os.path.join(BENCH_DIR, "golden.json")
+THRESHOLDS_PATH = os.path.join(BENCH_DIR, "thresholds.json")
+
+BACKENDS = ["bs4", "fast"]
+MIN_SECONDS = 0.5  # 每個種類至少跑這麼久再算速度
+
+
+def load_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_fixtures() -> list[dict]:
+    fixtures = []
+    for entry in load_json(MANIFEST_PATH):
+        with open(os.path.join(FIXTURE_DIR, entry["file"]), "rb") as f:
+            fixtures.append({**entry, "content": f.read()})
+    return fixtures
+
+
+def parse_fixture(fx: dict):
+    kind = fx["kind"]
+    if kind == "official_detail":
+        return crawl_official_cards.parse_card_detail_html(
+            fx["content"], fx["url"], fx["expansion"]
+        )
+    if kind == "official_listing":
+        soup = html_backend.make_soup(
+            fx["content"], crawl_official_cards.LISTING_RULES
+        )
+        return crawl_official_cards.parse_listing_page(soup)
+    if kind == "yuyutei_search":
+        text = fx["content"].decode("utf-8")
+        if fx.get("card_code"):
+            return crawl_yuyutei_prices.parse_card_list_from_search(
+                text, fx["card_code"], fx["mode"]
+            )
+        return crawl_yuyutei_prices.parse_card_lists_by_code(text, fx["mode"])
+    raise ValueError(f"未知的 fixture 種類：{kind}")
+
+
+def normalize(result):
+    """tuple / dict key 順序等差異不算，統一轉成 JSON 再比。"""
+    return json.loads(json.dumps(result, ensure_ascii=False, sort_keys=True))
+
+
+def bench_kind(fixtures: list[dict]) -> dict:
+    # 峰值記憶體：跑一輪
+    tracemalloc.start()
+    for fx in fixtures:
+        parse_fixture(fx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    pages = 0
+    started = time.perf_counter()
+    while True:
+        for fx in fixtures:
+            parse_fixture(fx)
+        pages += len(fixtures)
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_SECONDS:
+            break
+
+    return {
+        "pages": pages,
+        "seconds": round(elapsed, 4),
+        "pages_per_sec": round(pages / elapsed, 1),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def record(fixtures_manifest: list[dict]):
+    """依 manifest 下載每個頁面，並把 source / recorded_at 寫回 manifest。"""
+    recorded_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    for entry in fixtures_manifest:
+        resp = http_client.get(entry["url"], params=entry.get("params"))
+        with open(os.path.join(FIXTURE_DIR, entry["file"]), "wb") as f:
+            f.write(resp.content)
+        entry["source"] = "recorded"
+        entry["recorded_at"] = recorded_at
+        print(f"   已下載 {entry['file']}（{len(resp.content)} bytes）")
+
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(fixtures_manifest, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def update_golden(fixtures: list[dict]):
+    html_backend.PARSER = "bs4"
+    golden = {fx["file"]: normalize(parse_fixture(fx)) for fx in fixtures}
+    with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+        json.dump(golden, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+    print(f"   已更新 golden：{len(golden)} 個 fixture")
+
+
+def run_checks(fixtures: list[dict]) -> tuple[dict, list[str]]:
+    golden = load_json(GOLDEN_PATH)
+    thresholds = load_json(THRESHOLDS_PATH)
+    kinds = sorted({fx["kind"] for fx in fixtures})
+
+    results: dict[str, dict] = {}
+    failures: list[str] = []
+
+    for backend in BACKENDS:
+        html_backend.PARSER = backend
+        results[backend] = {}
+        print(f"🔧 {backend}：{html_backend.active_backend()}")
+
+        for fx in fixtures:
+            if normalize(parse_fixture(fx)) != golden.get(fx["file"]):
+                failures.append(f"{backend}: {fx['file']} 與 golden 不一致")
+
+        for kind in kinds:
+            stats = bench_kind([fx for fx in fixtures if fx["kind"] == kind])
+            results[backend][kind] = stats
+
+            limit = thresholds.get(kind, {}).get(backend, {})
+            min_pps = limit.get("min_pages_per_sec")
+            max_peak = limit.get("max_peak_kib")
+            if min_pps is not None and stats["pages_per_sec"] < min_pps:
+                failures.append(
+                    f"{backend}/{kind}: {stats['pages_per_sec']} pages/s 低於門檻 {min_pps}"
+                )
+            if max_peak is not None and stats["peak_kib"] > max_peak:
+                failures.append(
+                    f"{backend}/{kind}: 峰值 {stats['peak_kib']} KiB 超過門檻 {max_peak}"
+                )
+
+    return results, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析器 benchmark 與 golden 比對")
+    parser.add_argument("--record", action="store_true", help="依 manifest 重新下載 fixture")
+    parser.add_argument("--update-golden", action="store_true", help="用 bs4 後端重建 golden")
+    parser.add_argument("--json", help="把結果另外寫成 JSON 檔")
+    parser.add_argument(
+        "--require-recorded",
+        action="store_true",
+        help="還有依 CSV 重建的 fixture（source=synthetic）就失敗",
+    )
+    args = parser.parse_args()
+
+    if args.record:
+        record(load_json(MANIFEST_PATH))
+
+    fixtures = load_fixtures()
+    if args.update_golden or args.record:
+        update_golden(fixtures)
+
+    sources = Counter(fx.get("source", "synthetic") for fx in fixtures)
+    print("📄 fixture 來源：" + "，".join(f"{k} {v}" for k, v in sorted(sources.items())))
+    if sources["synthetic"]:
+        print("⚠ 有 fixture 是依 CSV 重建的頁面，golden 一致不代表實際頁面也一致")
+
+    results, failures = run_checks(fixtures)
+    if args.require_recorded and sources["synthetic"]:
+        failures.append(f"{sources['synthetic']} 個 fixture 不是實際錄製的頁面")
+
+    print(f"{'backend':<8} {'kind':<18} {'pages/s':>10} {'peak KiB':>10}")
+    for backend, kinds in results.items():
+        for kind, stats in kinds.items():
+            print(
+                f"{backend:<8} {kind:<18} {stats['pages_per_sec']:>10} {stats['peak_kib']:>10}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"results": results, "sources": dict(sources), "failures": failures},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+
+    if failures:
+        print("\n❌ 檢查失敗：")
+        for msg in failures:
+            print("  -", msg)
+        sys.exit(1)
+    print("\n✅ golden 一致，速度與記憶體都在門檻內")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+前端用的靜態資料 bundle（預設輸出到 bundle/）：
+
+  shards/{exp}.json   每個系列一份：卡號、名稱、圖、商品、各版本的 sell / buy 價
+  texts/{exp}.json    effect_text / qa_text，打開卡片細節時才需要下載
+  index.json          搜尋索引：卡號排序表（前綴搜尋）+ 名稱 / 卡號的 1、2-gram 反向索引
+  manifest.json       每個檔案的大小與 sha256，前端先讀它再決定要下載哪些 shard
+
+每個 JSON 旁邊都有預先壓縮好的 .gz（有裝 brotli 的話再加 .br）。
+內容沒變的檔案不會重寫，git 上不會每晚都有一堆 diff。
+MessagePack 沒有用：gzip 後的 JSON 已經夠小，前端也不用多載一個解碼器。
+
+用法：
+  python scripts/build_bundle.py [--output bundle]
+"""
+import argparse
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from card_codes import normalize_card_code, normalize_expansion
+from ngram import gram_set, normalize_text
+from print_index import print_key_for
+
+try:
+    import brotli
+except ImportError:  # brotli 是選用的，沒裝就只有 .gz
+    brotli = None
+
+BUNDLE_DIR = os.environ.get("HOCG_BUNDLE_DIR", "bundle")
+BUNDLE_VERSION = 1
+
+CARD_FIELDS = ["card_code", "name_ja", "image_url", "products", "release_dates", "prints"]
+PRINT_FIELDS = ["rarity", "is_parallel_name", "sell_price_jpy", "buy_price_jpy", "print_key"]
+INDEX_GRAM_SIZES = (1, 2)
+
+
+# ----------------- 共用小工具 ----------------- #
+
+def _int_or_none(value):
+    value = (value or "").strip()
+    return int(value) if value.lstrip("-").isdigit() else None
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def _write_if_changed(path: str, data: bytes) -> bool:
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+    return True
+
+
+def write_asset(out_dir: str, rel: str, obj) -> tuple[dict, int]:
+    """寫 JSON + 壓縮版；回傳 (manifest 項目, 實際重寫的檔案數)。"""
+    data = _dumps(obj)
+    path = os.path.join(out_dir, rel)
+    written = _write_if_changed(path, data)
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    written += _write_if_changed(path + ".gz", gz)
+    entry = {
+        "file": rel,
+        "bytes": len(data),
+        "gz_bytes": len(gz),
+        "sha256": hashlib.sha256(data).hexdigest(),
+    }
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        written += _write_if_changed(path + ".br", br)
+        entry["br_bytes"] = len(br)
+    return entry, written
+
+
+# ----------------- 讀 CSV ----------------- #
+
+def load_prints_by_card() -> dict[str, list[list]]:
+    """card_code -> 版本清單（同一版本出現在好幾個系列的價格 CSV 時只留一個）。"""
+    by_card: dict[str, dict[str, list]] = {}
+    for path in sorted(glob.glob("data/*_yuyutei_prices.csv")):
+        with open(path, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                if not r.get("rarity"):
+                    continue
+                code = normalize_card_code(r["card_code"])
+                parallel = int(r.get("is_parallel_name") or 0)
+                key = print_key_for({**r, "card_code": code, "is_parallel_name": parallel})
+                by_card.setdefault(code, {}).setdefault(
+                    key,
+                    [
+                        r["rarity"],
+                        parallel,
+                        _int_or_none(r.get("sell_price_jpy")),
+                        _int_or_none(r.get("buy_price_jpy")),
+                        key,
+                    ],
+                )
+    return {
+        code: sorted(prints.values(), key=lambda p: (p[1], p[0], p[4]))
+        for code, prints in by_card.items()
+    }
+
+
+def load_cards() -> dict[str, list[dict]]:
+    cards: dict[str, list[dict]] = {}
+    for path in sorted(glob.glob("data/*_cards_v2.csv")):
+        exp = normalize_expansion(os.path.basename(path)[: -len("_cards_v2.csv")])
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [r for r in csv.DictReader(f) if (r.get("card_code") or "").strip()]
+        rows.sort(key=lambda r: r["card_code"])
+        cards[exp] = rows
+    return cards
+
+
+# ----------------- 組 bundle ----------------- #
+
+def build_index(cards: dict[str, list[dict]]) -> dict:
+    entries = []
+    grams: dict[str, list[int]] = {}
+    seen = set()
+    for exp in sorted(cards):
+        for r in cards[exp]:
+            # 同一張卡的不同圖（OSR / OUR ...）在 CSV 裡是不同列，索引只留一筆
+            if (exp, r["card_code"]) in seen:
+                continue
+            seen.add((exp, r["card_code"]))
+            card_id = len(entries)
+            entries.append([exp, r["card_code"], r.get("name_ja") or ""])
+            keys = gram_set(r.get("name_ja") or "", INDEX_GRAM_SIZES)
+            keys |= gram_set(r["card_code"], INDEX_GRAM_SIZES)
+            for gram in keys:
+                grams.setdefault(gram, []).append(card_id)
+
+    codes = sorted((normalize_text(code), i) for i, (_, code, _) in enumerate(entries))
+    return {
+        "gram_sizes": list(INDEX_GRAM_SIZES),
+        "cards": entries,
+        "codes": [[code, i] for code, i in codes],
+        "grams": grams,
+    }
+
+
+def build(out_dir: str = BUNDLE_DIR) -> dict:
+    cards = load_cards()
+    prints = load_prints_by_card()
+
+    manifest = {"version": BUNDLE_VERSION, "card_fields": CARD_FIELDS, "print_fields": PRINT_FIELDS}
+    manifest["shards"], manifest["texts"] = {}, {}
+    written = 0
+
+    for exp, rows in cards.items():
+        shard = {
+            "expansion": exp,
+            "cards": [
+                [
+                    r["card_code"],
+                    r.get("name_ja") or "",
+                    r.get("image_url") or "",
+                    r.get("products") or "",
+                    r.get("release_dates") or "",
+                    prints.get(normalize_card_code(r["card_code"]), []),
+                ]
+                for r in rows
+            ],
+        }
+        entry, n = write_asset(out_dir, f"shards/{exp}.json", shard)
+        manifest["shards"][exp] = {**entry, "cards": len(rows)}
+        written += n
+
+        texts = {r["card_code"]: [r.get("effect_text") or "", r.get("qa_text") or ""] for r in rows}
+        entry, n = write_asset(out_dir, f"texts/{exp}.json", texts)
+        manifest["texts"][exp] = entry
+        written += n
+
+    manifest["index"], n = write_asset(out_dir, "index.json", build_index(cards))
+    written += n
+
+    # CSV 已經沒有的系列，把舊的 shard 刪掉
+    for sub in ("shards", "texts"):
+        for path in glob.glob(os.path.join(out_dir, sub, "*.json*")):
+            exp = os.path.basename(path).split(".json")[0]
+            if exp not in cards:
+                os.remove(path)
+                written += 1
+
+    written += _write_if_changed(
+        os.path.join(out_dir, "manifest.json"),
+        json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode("utf-8") + b"\n",
+    )
+    return {"expansions": len(cards), "written": written, "manifest": manifest}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生前端用的 JSON bundle 與搜尋索引")
+    parser.add_argument("--output", default=BUNDLE_DIR)
+    args = parser.parse_args()
+
+    result = build(args.output)
+    manifest = result["manifest"]
+    total = sum(e["bytes"] for e in manifest["shards"].values())
+    total_gz = sum(e["gz_bytes"] for e in manifest["shards"].values())
+    print(
+        f"✅ {result['expansions']} 個系列 → {args.output}/（更新 {result['written']} 個檔案）\n"
+        f"   shards {total / 1024:.0f} KiB（gzip {total_gz / 1024:.0f} KiB），"
+        f"index {manifest['index']['bytes'] / 1024:.0f} KiB（gzip {manifest['index']['gz_bytes'] / 1024:.0f} KiB）"
+        + ("" if brotli else "；沒有安裝 brotli，只產生 .gz")
+    )
+
+
+if __name__ == "__main__":
+    main()
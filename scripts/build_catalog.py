@@ -0,0 +1,340 @@
+"""
+把 data/ 底下的 CSV 編成一個有索引的 SQLite 目錄（預設 build/catalog.sqlite）：
+
+  cards        官網卡片資料（不含長文字），id 是 catalog 內的流水號
+  card_texts   qa_text / effect_text 另外放，查價格、卡號時不用讀到；
+               card_texts.card_id = cards.id（一對一）。同一系列裡卡號會重複
+               （不同版本），所以不要用 (expansion, card_code) join
+  prices       YUYU 販售 / 收購價
+  inventory    data/inventory_lots_v2.csv
+  sources      每個來源 CSV 的 sha256，用來判斷要不要重建
+
+只有 sha256 變了的 CSV 才會重建那個檔案的資料（每一列的 source 欄位記著
+來自哪個 CSV，HBP01 / hBP01 這種正規化後同系列的檔案互不影響）；CSV 刪掉的話，
+那個檔案的資料也會一起拿掉。索引：card_code、expansion、
+(card_code, rarity, is_parallel_name)。
+
+用法：
+  python scripts/build_catalog.py             # 增量更新
+  python scripts/build_catalog.py --rebuild   # 整個重建
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import os
+import sqlite3
+import time
+
+from card_codes import normalize_expansion
+
+CATALOG_PATH = os.environ.get("HOCG_CATALOG_PATH", "build/catalog.sqlite")
+DATA_DIR = "data"
+INVENTORY_CSV = os.path.join(DATA_DIR, "inventory_lots_v2.csv")
+
+# schema 有改就加一，舊的 catalog 會整個重建
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE sources (
+    path      TEXT PRIMARY KEY,
+    kind      TEXT NOT NULL,
+    expansion TEXT,
+    sha256    TEXT NOT NULL,
+    rows      INTEGER NOT NULL,
+    built_at  REAL NOT NULL
+);
+
+CREATE TABLE cards (
+    id               INTEGER PRIMARY KEY,
+    source           TEXT NOT NULL,
+    expansion        TEXT NOT NULL,
+    card_code        TEXT NOT NULL,
+    name_ja          TEXT,
+    card_page_url    TEXT,
+    image_url        TEXT,
+    release_dates    TEXT,
+    products         TEXT,
+    illustrator_name TEXT,
+    qa_count         INTEGER
+);
+CREATE INDEX idx_cards_card_code ON cards(card_code);
+CREATE INDEX idx_cards_expansion ON cards(expansion);
+CREATE INDEX idx_cards_source ON cards(source);
+
+CREATE TABLE card_texts (
+    card_id     INTEGER PRIMARY KEY REFERENCES cards(id),
+    source      TEXT NOT NULL,
+    qa_text     TEXT,
+    effect_text TEXT
+);
+CREATE INDEX idx_card_texts_source ON card_texts(source);
+
+CREATE TABLE prices (
+    source             TEXT NOT NULL,
+    expansion          TEXT NOT NULL,
+    card_code          TEXT NOT NULL,
+    rarity             TEXT,
+    is_parallel_name   INTEGER,
+    name_ja            TEXT,
+    sell_price_jpy     INTEGER,
+    buy_price_jpy      INTEGER,
+    raw_sell_price_text TEXT,
+    raw_buy_price_text TEXT,
+    sell_url           TEXT,
+    buy_url            TEXT,
+    is_suspicious      INTEGER,
+    error_message      TEXT
+);
+CREATE INDEX idx_prices_card_code ON prices(card_code);
+CREATE INDEX idx_prices_expansion ON prices(expansion);
+CREATE INDEX idx_prices_print ON prices(card_code, rarity, is_parallel_name);
+CREATE INDEX idx_prices_source ON prices(source);
+
+CREATE TABLE inventory (
+    source           TEXT NOT NULL,
+    line_no          INTEGER NOT NULL,
+    expansion        TEXT,
+    card_code        TEXT,
+    rarity           TEXT,
+    print_hint       TEXT,
+    print_id         TEXT,
+    acquisition_type TEXT,
+    source_name      TEXT,
+    acquired_qty     INTEGER,
+    unit_cost        REAL,
+    currency         TEXT,
+    acquired_at      TEXT,
+    note             TEXT
+);
+CREATE INDEX idx_inventory_card_code ON inventory(card_code);
+CREATE INDEX idx_inventory_expansion ON inventory(expansion);
+CREATE INDEX idx_inventory_print ON inventory(card_code, rarity);
+CREATE INDEX idx_inventory_source ON inventory(source);
+"""
+
+
+# ----------------- 共用小工具 ----------------- #
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def to_int(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def to_float(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def read_csv(path: str) -> list[dict]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+# ----------------- 各種來源 ----------------- #
+
+def load_cards(conn, source: str, expansion: str, rows: list[dict]):
+    # 先決定好 id，card_texts 才能用同一個 id 對回 cards
+    first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM cards").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                card_id,
+                source,
+                expansion,
+                r["card_code"],
+                r.get("name_ja"),
+                r.get("card_page_url"),
+                r.get("image_url"),
+                r.get("release_dates"),
+                r.get("products"),
+                r.get("illustrator_name"),
+                to_int(r.get("qa_count")),
+            )
+            for card_id, r in enumerate(rows, start=first_id)
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO card_texts VALUES (?, ?, ?, ?)",
+        [
+            (card_id, source, r.get("qa_text"), r.get("effect_text"))
+            for card_id, r in enumerate(rows, start=first_id)
+        ],
+    )
+
+
+def load_prices(conn, source: str, expansion: str, rows: list[dict]):
+    conn.executemany(
+        "INSERT INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                source,
+                expansion,
+                r["card_code"],
+                r.get("rarity"),
+                to_int(r.get("is_parallel_name")),
+                r.get("name_ja"),
+                to_int(r.get("sell_price_jpy")),
+                to_int(r.get("buy_price_jpy")),
+                r.get("raw_sell_price_text"),
+                r.get("raw_buy_price_text"),
+                r.get("sell_url"),
+                r.get("buy_url"),
+                to_int(r.get("is_suspicious")),
+                r.get("error_message"),
+            )
+            for r in rows
+        ],
+    )
+
+
+def load_inventory(conn, source: str, expansion, rows: list[dict]):
+    conn.executemany(
+        "INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                source,
+                i,
+                r.get("expansion"),
+                r.get("card_code"),
+                r.get("rarity"),
+                r.get("print_hint"),
+                r.get("print_id"),
+                r.get("acquisition_type"),
+                r.get("source_name"),
+                to_int(r.get("acquired_qty")),
+                to_float(r.get("unit_cost")),
+                r.get("currency"),
+                r.get("acquired_at"),
+                r.get("note"),
+            )
+            for i, r in enumerate(rows, start=2)  # 行號（含表頭）
+        ],
+    )
+
+
+# kind -> (要清掉的表, 載入函式)
+KINDS = {
+    "cards": (["card_texts", "cards"], load_cards),
+    "prices": (["prices"], load_prices),
+    "inventory": (["inventory"], load_inventory),
+}
+
+
+def discover_sources() -> dict[str, tuple[str, str | None]]:
+    """回傳 {path: (kind, expansion)}。"""
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*_cards_v2.csv"))):
+        exp = os.path.basename(path)[: -len("_cards_v2.csv")]
+        sources[path] = ("cards", normalize_expansion(exp))
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*_yuyutei_prices.csv"))):
+        exp = os.path.basename(path)[: -len("_yuyutei_prices.csv")]
+        sources[path] = ("prices", normalize_expansion(exp))
+    if os.path.exists(INVENTORY_CSV):
+        sources[INVENTORY_CSV] = ("inventory", None)
+    return sources
+
+
+def _clear_source(conn, kind: str, source: str):
+    """只清掉這個 CSV 載入的列；正規化後同系列的其他檔案不受影響。"""
+    for table in KINDS[kind][0]:
+        conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+
+
+# ----------------- 建置 ----------------- #
+
+def open_catalog(path: str, rebuild: bool = False) -> sqlite3.Connection:
+    if rebuild and os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != SCHEMA_VERSION:
+        conn.close()
+        if os.path.exists(path):
+            print(f"   catalog schema 版本 {version} ≠ {SCHEMA_VERSION}，整個重建")
+            os.remove(path)
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+
+def build(path: str = CATALOG_PATH, rebuild: bool = False) -> dict:
+    conn = open_catalog(path, rebuild)
+    known = {
+        row[0]: row[1:]
+        for row in conn.execute("SELECT path, kind, expansion, sha256 FROM sources")
+    }
+    sources = discover_sources()
+    stats = {"rebuilt": 0, "skipped": 0, "removed": 0}
+
+    for src, (kind, expansion, _) in known.items():
+        if src in sources:
+            continue
+        with conn:
+            _clear_source(conn, kind, src)
+            conn.execute("DELETE FROM sources WHERE path = ?", (src,))
+        stats["removed"] += 1
+        print(f"   🗑 {src} 已不存在，移除 {kind} / {expansion}")
+
+    for src, (kind, expansion) in sources.items():
+        digest = file_sha256(src)
+        if src in known and known[src][2] == digest:
+            stats["skipped"] += 1
+            continue
+
+        rows = read_csv(src)
+        with conn:
+            _clear_source(conn, kind, src)
+            KINDS[kind][1](conn, src, expansion, rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                (src, kind, expansion, digest, len(rows), time.time()),
+            )
+        stats["rebuilt"] += 1
+        print(f"   ✔ {src}：{len(rows)} 筆")
+
+    if stats["rebuilt"] or stats["removed"]:
+        conn.execute("ANALYZE")
+    conn.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 data/ 的 CSV 編成 SQLite 目錄")
+    parser.add_argument("--rebuild", action="store_true", help="忽略既有 catalog，整個重建")
+    parser.add_argument("--output", default=CATALOG_PATH, help="SQLite 檔案路徑")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    stats = build(args.output, rebuild=args.rebuild)
+    print(
+        f"catalog → {args.output}：重建 {stats['rebuilt']}、沿用 {stats['skipped']}、"
+        f"移除 {stats['removed']} 個來源（{time.monotonic() - started:.1f}s）"
+    )
+
+
+if __name__ == "__main__":
+    main()
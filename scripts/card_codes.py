@@ -0,0 +1,38 @@
+"""
+系列代號 / 卡號的正規化（純字串處理，不 import 任何第三方套件）。
+
+爬蟲、建 bundle / catalog、價格歷史、搜尋、庫存同步都從這裡 import，
+只是要正規化代號的腳本就不必載入 http_client / bs4 / lxml。
+
+  normalize_expansion ：HPR / hbp01 / HSD2025summer → hPR / hBP01 / hSD2025SUMMER
+  normalize_card_code ：hbp04-063 / HBP04-063 → hBP04-063
+"""
+
+
+def normalize_expansion(code: str) -> str | None:
+    """
+    接受 HPR / hbp01 / HSD2025summer 這種，統一轉成：
+      hPR / hBP01 / hSD2025SUMMER
+    """
+    if not code:
+        return None
+    c = code.strip().replace(" ", "")
+    if not c:
+        return None
+    c = c.lower()
+    if not c.startswith("h"):
+        c = "h" + c
+    head = c[1:3].upper()        # BP / PR / SD / YS / PC / CS...
+    tail = c[3:].upper()         # 01 / 2025SUMMER...
+    return "h" + head + tail
+
+
+def normalize_card_code(raw_code: str) -> str:
+    """
+    把卡號統一成「第一個字母小寫，其餘大寫」，
+    例如：hbp04-063、HBP04-063 都會變成 hBP04-063。
+    """
+    code = (raw_code or "").strip().replace(" ", "")
+    if len(code) >= 3:
+        return code[0].lower() + code[1:3].upper() + code[3:]
+    return code
@@ -0,0 +1,299 @@
+"""
+卡片效果 / Q&A 全文搜尋（effect_text、qa_text、name_ja）。
+
+日文不斷詞，索引用字元 2-gram + 3-gram 的反向索引（scripts/ngram.py）：
+  - 每個系列一個 segment（build/search/{exp}.pickle），CSV 的 sha256 沒變就不重建
+  - 查詢：空白分開的詞是 AND；"..." 包起來的是片語（整段要連在一起出現）
+  - 每個詞先用 gram 的 posting list 取交集縮小候選，再用子字串確認，
+    依出現次數排序
+
+用法：
+  python scripts/card_search.py build [--rebuild]
+  python scripts/card_search.py query 'ブルーム "手札を1枚"' [--exp hBP01] [--limit 20]
+  python scripts/card_search.py shell            # 載入一次，連續查詢
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import os
+import pickle
+import re
+import sys
+import tempfile
+import time
+
+from card_codes import normalize_expansion
+from ngram import ngrams, normalize_text
+
+INDEX_DIR = os.environ.get("HOCG_SEARCH_DIR", "build/search")
+META_PATH = os.path.join(INDEX_DIR, "meta.pickle")
+INDEX_VERSION = 1
+
+GRAM_SIZES = (2, 3)
+TEXT_FIELDS = ["name_ja", "effect_text", "qa_text"]
+SNIPPET_WIDTH = 30
+
+_QUERY_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+
+# ----------------- 共用小工具 ----------------- #
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _segment_path(exp: str) -> str:
+    return os.path.join(INDEX_DIR, f"{exp}.pickle")
+
+
+def _dump(path: str, obj):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _load(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_meta() -> dict:
+    try:
+        meta = _load(META_PATH)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        return {"version": INDEX_VERSION, "sources": {}}
+    if meta.get("version") != INDEX_VERSION:
+        return {"version": INDEX_VERSION, "sources": {}}
+    return meta
+
+
+# ----------------- 建索引 ----------------- #
+
+def build_segment(exp: str, csv_path: str) -> dict:
+    """
+    segment = {
+      "docs":  [(card_code, name_ja, {欄位: 正規化後的文字})],
+      "grams": {gram: [doc id, ...]}   # doc id 遞增
+    }
+    同一張卡不同稀有度的列文字相同，只留第一列。
+    """
+    docs = []
+    grams: dict[str, list[int]] = {}
+    seen = set()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            code = (r.get("card_code") or "").strip()
+            if not code or code in seen:
+                continue
+            seen.add(code)
+
+            doc_id = len(docs)
+            texts = {field: normalize_text(r.get(field)) for field in TEXT_FIELDS}
+            docs.append((code, r.get("name_ja") or "", texts))
+
+            doc_grams = set()
+            for text in texts.values():
+                for n in GRAM_SIZES:
+                    doc_grams.update(ngrams(text, n))
+            for gram in doc_grams:
+                grams.setdefault(gram, []).append(doc_id)
+
+    return {"expansion": exp, "docs": docs, "grams": grams}
+
+
+def discover_sources() -> dict[str, str]:
+    sources = {}
+    for path in sorted(glob.glob("data/*_cards_v2.csv")):
+        exp = normalize_expansion(os.path.basename(path)[: -len("_cards_v2.csv")])
+        sources[exp] = path
+    return sources
+
+
+def update_index(rebuild: bool = False, verbose: bool = True) -> dict:
+    meta = {"version": INDEX_VERSION, "sources": {}} if rebuild else load_meta()
+    known = meta["sources"]
+    sources = discover_sources()
+    stats = {"rebuilt": 0, "skipped": 0, "removed": 0}
+
+    for exp in list(known):
+        if exp not in sources:
+            if os.path.exists(_segment_path(exp)):
+                os.remove(_segment_path(exp))
+            del known[exp]
+            stats["removed"] += 1
+
+    for exp, path in sources.items():
+        digest = file_sha256(path)
+        if known.get(exp) == digest and os.path.exists(_segment_path(exp)):
+            stats["skipped"] += 1
+            continue
+        segment = build_segment(exp, path)
+        _dump(_segment_path(exp), segment)
+        known[exp] = digest
+        stats["rebuilt"] += 1
+        if verbose:
+            print(f"   ✔ {exp}：{len(segment['docs'])} 張卡、{len(segment['grams'])} 個 gram")
+
+    _dump(META_PATH, meta)
+    return stats
+
+
+# ----------------- 查詢 ----------------- #
+
+def parse_query(query: str) -> list[str]:
+    """回傳正規化後的詞；"..." 裡的內容整段當一個詞（片語）。"""
+    terms = []
+    for phrase, word in _QUERY_RE.findall(query):
+        term = normalize_text(phrase or word)
+        if term:
+            terms.append(term)
+    return terms
+
+
+def _term_candidates(segment: dict, term: str) -> set[int] | None:
+    """用 gram 交集縮小候選；詞太短（1 個字）時回傳 None 代表要全掃。"""
+    n = max(size for size in GRAM_SIZES if size <= len(term)) if len(term) >= min(GRAM_SIZES) else 0
+    if n == 0:
+        return None
+    result = None
+    for gram in set(ngrams(term, n)):
+        posting = segment["grams"].get(gram)
+        if not posting:
+            return set()
+        result = set(posting) if result is None else result.intersection(posting)
+        if not result:
+            return result
+    return result
+
+
+def _snippet(text: str, term: str) -> str:
+    pos = text.find(term)
+    if pos < 0:
+        return ""
+    start = max(0, pos - SNIPPET_WIDTH)
+    end = min(len(text), pos + len(term) + SNIPPET_WIDTH)
+    return ("…" if start else "") + text[start:end] + ("…" if end < len(text) else "")
+
+
+class SearchIndex:
+    def __init__(self, segments: dict[str, dict]):
+        self.segments = segments
+
+    @classmethod
+    def load(cls, expansions: list[str] | None = None) -> "SearchIndex":
+        meta = load_meta()
+        wanted = expansions or sorted(meta["sources"])
+        return cls({exp: _load(_segment_path(exp)) for exp in wanted if exp in meta["sources"]})
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        terms = parse_query(query)
+        if not terms:
+            return []
+
+        hits = []
+        for exp, segment in self.segments.items():
+            candidates = None
+            for term in terms:
+                found = _term_candidates(segment, term)
+                if found is None:
+                    continue
+                candidates = found if candidates is None else candidates & found
+                if not candidates:
+                    break
+            if candidates is None:
+                candidates = range(len(segment["docs"]))
+
+            for doc_id in candidates:
+                code, name, texts = segment["docs"][doc_id]
+                score = 0
+                fields = []
+                for term in terms:
+                    counts = {field: text.count(term) for field, text in texts.items()}
+                    total = sum(counts.values())
+                    if total == 0:
+                        break  # AND：有一個詞沒出現就不算
+                    score += total
+                    fields.extend(f for f, c in counts.items() if c)
+                else:
+                    best = max(texts, key=lambda f: texts[f].count(terms[0]))
+                    hits.append(
+                        {
+                            "expansion": exp,
+                            "card_code": code,
+                            "name_ja": name,
+                            "score": score,
+                            "fields": sorted(set(fields)),
+                            "snippet": _snippet(texts[best], terms[0]),
+                        }
+                    )
+
+        hits.sort(key=lambda h: (-h["score"], h["card_code"], h["expansion"]))
+        return hits[:limit]
+
+
+# ----------------- CLI ----------------- #
+
+def print_hits(hits: list[dict], elapsed: float):
+    for h in hits:
+        print(
+            f"{h['score']:>4}  {h['expansion']:<8} {h['card_code']:<12} {h['name_ja']}"
+            f"  [{', '.join(h['fields'])}]"
+        )
+        if h["snippet"]:
+            print(f"        {h['snippet']}")
+    print(f"（{len(hits)} 筆，{elapsed * 1000:.1f} ms）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="卡片效果 / Q&A 全文搜尋")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="建立 / 更新索引")
+    p.add_argument("--rebuild", action="store_true")
+
+    for name in ("query", "shell"):
+        p = sub.add_parser(name)
+        if name == "query":
+            p.add_argument("query")
+        p.add_argument("--exp", action="append", help="只查某些系列（可重複）")
+        p.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.monotonic()
+        stats = update_index(rebuild=args.rebuild)
+        print(
+            f"索引 → {INDEX_DIR}：重建 {stats['rebuilt']}、沿用 {stats['skipped']}、"
+            f"移除 {stats['removed']}（{time.monotonic() - started:.1f}s）"
+        )
+        return
+
+    update_index(verbose=False)
+    expansions = [normalize_expansion(e) for e in args.exp] if args.exp else None
+    index = SearchIndex.load(expansions)
+
+    if args.command == "query":
+        started = time.perf_counter()
+        hits = index.search(args.query, args.limit)
+        print_hits(hits, time.perf_counter() - started)
+        return
+
+    print("輸入查詢（空白 = AND，\"...\" = 片語），Ctrl-D 結束")
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        started = time.perf_counter()
+        hits = index.search(line, args.limit)
+        print_hits(hits, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+長時間爬蟲用的 checkpoint 工具：
+
+  - Journal：每個系列一個 write-ahead journal（JSON lines），
+    每完成一筆就 append + fsync，當機後可以用 --resume 接著跑
+  - atomic_write_csv / AtomicCsvWriter：先寫暫存檔再 os.replace，中途失敗不會弄壞上一版 CSV；
+    AtomicCsvWriter 可以一列一列串流寫入。輸出是決定性的（值正規化 + 依 key 排序），
+    內容跟現有檔案一樣就不重寫，有變動時把新增 / 刪除 / 變動的列寫進 changelog；
+    排序與比對都是串流的（external sort + merge join），記憶體不隨 CSV 大小成長
+
+用法（workflow 只 commit 這次真的有變的 CSV）：
+  python scripts/checkpoint.py changed-files | xargs -r git add
+  python scripts/checkpoint.py summary
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+
+JOURNAL_DIR = "data/.journal"
+# 每次執行的 CSV 變動記錄
+CHANGELOG_DIR = os.environ.get("HOCG_CHANGELOG_DIR", "build/changes")
+# commit() 排序時記憶體裡最多放幾列；超過就分段排序寫成暫存檔再合併
+SORT_CHUNK_ROWS = int(os.environ.get("HOCG_SORT_CHUNK_ROWS", "20000"))
+RUN_STAMP = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + f"-{os.getpid()}"
+_changelog_lock = threading.Lock()
+
+
+class Journal:
+    def __init__(self, name: str):
+        self.path = os.path.join(JOURNAL_DIR, f"{name}.jsonl")
+        self._lock = threading.Lock()
+        self._fh = None
+        self._finished = False
+
+    def load(self) -> dict:
+        """讀出已完成的 key -> value；最後一行寫到一半（當機）就忽略。"""
+        done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[entry["key"]] = entry["value"]
+        return done
+
+    def reset(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def append(self, key: str, value):
+        line = json.dumps({"key": key, "value": value}, ensure_ascii=False)
+        with self._lock:
+            if self._finished:
+                # 已經 remove() 了，晚到的寫入（例如 Future callback）直接丟掉
+                return
+            if self._fh is None:
+                os.makedirs(JOURNAL_DIR, exist_ok=True)
+                self._fh = open(self.path, "a", encoding="utf-8")
+            self._fh.write(line + "\n")
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def remove(self):
+        """整個系列都成功寫出後呼叫。"""
+        self.reset()
+        with self._lock:
+            self._finished = True
+
+
+def open_journal(name: str, resume: bool):
+    """回傳 (journal, 已完成的項目)；不是 resume 就先清掉舊 journal。"""
+    journal = Journal(name)
+    if resume:
+        done = journal.load()
+        if done:
+            print(f"   ↻ resume：{name} 已完成 {len(done)} 筆，略過")
+        return journal, done
+    journal.reset()
+    return journal, {}
+
+
+# ----------------- CSV 輸出 ----------------- #
+
+def normalize_value(value) -> str:
+    """None → ""、bool → 1/0、整數值的 float → 整數、\r\n → \n，讓同樣的資料寫出同樣的 bytes。"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).replace("\r\n", "\n")
+
+
+def _file_sha256(path: str) -> bytes | None:
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    except FileNotFoundError:
+        return None
+    return h.digest()
+
+
+def _iter_csv(path: str):
+    """一列一列讀；檔案不存在就是空的。"""
+    try:
+        f = open(path, newline="", encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        yield from csv.DictReader(f)
+
+
+def _write_rows(path: str, fieldnames: list[str], rows) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _row_values(row: dict) -> tuple:
+    return tuple(row.values())
+
+
+def external_sort(rows, key, directory: str):
+    """
+    依 key 穩定排序的 generator：每 SORT_CHUNK_ROWS 列排序一次寫成暫存檔（run），
+    最後用 heapq.merge 合併（同 key 時先出現的 run 在前，所以仍是穩定排序）。
+    只有一段時不寫暫存檔。記憶體裡最多一段的列數。
+    """
+    runs: list[str] = []
+    try:
+        chunk: list[dict] = []
+        fieldnames = None
+        for row in rows:
+            if fieldnames is None:
+                fieldnames = list(row)
+            chunk.append(row)
+            if len(chunk) >= SORT_CHUNK_ROWS:
+                chunk.sort(key=key)
+                fd, run_path = tempfile.mkstemp(suffix=".run", dir=directory)
+                os.close(fd)
+                runs.append(run_path)
+                _write_rows(run_path, fieldnames, chunk)
+                chunk = []
+        chunk.sort(key=key)
+        if not runs:
+            yield from chunk
+            return
+        yield from heapq.merge(*(_iter_csv(p) for p in runs), iter(chunk), key=key)
+    finally:
+        for run_path in runs:
+            if os.path.exists(run_path):
+                os.remove(run_path)
+
+
+def _numbered(rows, key):
+    """排好序的 rows → (唯一識別, row)；key 重複時加上出現序號。"""
+    prev, n = None, 0
+    for row in rows:
+        k = tuple(key(row))
+        n = n + 1 if k == prev else 0
+        prev = k
+        yield k + ((n,) if n else ()), row
+
+
+def diff_sorted_rows(old_rows, new_rows, key):
+    """
+    兩邊都已經依 key 排序時，一次走過兩邊（merge join），
+    依 key 順序 yield changelog 項目：added / removed / changed（changed 只列出有變的欄位）。
+    """
+    old_iter = _numbered(old_rows, key)
+    new_iter = _numbered(new_rows, key)
+    old = next(old_iter, None)
+    new = next(new_iter, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield {"op": "removed", "key": list(old[0]), "row": old[1]}
+            old = next(old_iter, None)
+        elif old is None or new[0] < old[0]:
+            yield {"op": "added", "key": list(new[0]), "row": new[1]}
+            new = next(new_iter, None)
+        else:
+            before, row = old[1], new[1]
+            if before != row:
+                fields = {f: [before.get(f, ""), v] for f, v in row.items() if before.get(f, "") != v}
+                yield {"op": "changed", "key": list(new[0]), "fields": fields}
+            old = next(old_iter, None)
+            new = next(new_iter, None)
+
+
+def write_changelog(path: str, entries, summary: dict) -> dict:
+    """
+    這次執行的變動記錄：CHANGELOG_DIR/<UTC 時間>-<pid>.jsonl。
+    entries 可以是 generator，邊產生邊寫；每個 CSV 的各列變動後面接一行 summary，
+    summary 會補上 added / removed / changed 的筆數，並回傳。
+    """
+    log_path = os.path.join(CHANGELOG_DIR, f"{RUN_STAMP}.jsonl")
+    counts = {"added": 0, "removed": 0, "changed": 0}
+    with _changelog_lock:
+        os.makedirs(CHANGELOG_DIR, exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                counts[entry["op"]] += 1
+                f.write(json.dumps({"file": path, **entry}, ensure_ascii=False) + "\n")
+            summary = {**summary, **counts}
+            f.write(json.dumps({"op": "summary", "file": path, **summary}, ensure_ascii=False) + "\n")
+    return summary
+
+
+class AtomicCsvWriter:
+    """
+    串流版的 atomic_write_csv：一列一列寫進同目錄的暫存檔（邊抓邊落地），
+    commit() 時才收尾：
+
+      - 值先經過 normalize_value；有給 key 的話依 key 穩定排序（external_sort，
+        記憶體最多 HOCG_SORT_CHUNK_ROWS 列）
+      - 跟現有檔案比 sha256（串流計算），一樣就不寫（mtime 不變，git 也看不到變動）
+      - 不一樣才 fsync + os.replace，並把新增 / 刪除 / 變動的列寫進 changelog
+        （舊檔也用同一個 key 排序後跟新檔 merge join，不會整份讀進記憶體）
+
+    中途失敗或 abort() 會刪掉暫存檔，舊 CSV 不動。
+
+        with AtomicCsvWriter(path, fieldnames, key=lambda r: (r["card_code"],)) as writer:
+            for row in rows:
+                writer.write(row)
+    """
+
+    def __init__(self, path: str, fieldnames: list[str], key=None):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.key = key
+        self.rows = 0
+        self.summary: dict | None = None
+        self.directory = os.path.dirname(path) or "."
+        self.tmp_path = self._mkstemp()
+        self._fh = open(self.tmp_path, "w", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._fh, fieldnames=fieldnames)
+        self._writer.writeheader()
+        self._sorted_path = None
+
+    def _mkstemp(self) -> str:
+        fd, path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(self.path)}.", suffix=".tmp", dir=self.directory
+        )
+        os.close(fd)
+        return path
+
+    def write(self, row: dict):
+        self._writer.writerow({f: normalize_value(row.get(f)) for f in self.fieldnames})
+        self._fh.flush()
+        self.rows += 1
+
+    def commit(self) -> dict:
+        """回傳 {"rewritten", "rows", "added", "removed", "changed"}。"""
+        if self._fh is None:
+            return self.summary
+        self._fh.close()
+        self._fh = None
+
+        output = self.tmp_path
+        if self.key:
+            self._sorted_path = output = self._mkstemp()
+            _write_rows(output, self.fieldnames, external_sort(_iter_csv(self.tmp_path), self.key, self.directory))
+            os.remove(self.tmp_path)
+
+        if _file_sha256(self.path) == _file_sha256(output):
+            os.remove(output)
+            self.summary = write_changelog(self.path, [], {"rewritten": False, "rows": self.rows})
+            return self.summary
+
+        # 新檔已經依 key 排好；沒有 key 時兩邊都用整列的值排序來比
+        diff_key = self.key or _row_values
+        new_rows = _iter_csv(output) if self.key else external_sort(_iter_csv(output), diff_key, self.directory)
+        old_rows = external_sort(_iter_csv(self.path), diff_key, self.directory)
+        self.summary = write_changelog(
+            self.path,
+            diff_sorted_rows(old_rows, new_rows, diff_key),
+            {"rewritten": True, "rows": self.rows},
+        )
+
+        with open(output, "rb") as f:
+            os.fsync(f.fileno())
+        # mkstemp 建出來是 0600，改回一般檔案權限
+        os.chmod(output, 0o644)
+        os.replace(output, self.path)
+        return self.summary
+
+    def abort(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        for path in (self.tmp_path, self._sorted_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+def atomic_write_csv(path: str, fieldnames: list[str], rows, key=None) -> dict:
+    with AtomicCsvWriter(path, fieldnames, key) as writer:
+        for row in rows:
+            writer.write(row)
+    return writer.summary
+
+
+def format_summary(summary: dict) -> str:
+    if not summary["rewritten"]:
+        return "內容沒變，沒有重寫"
+    return f"新增 {summary['added']}、刪除 {summary['removed']}、變動 {summary['changed']}"
+
+
+# ----------------- CLI ----------------- #
+
+def changed_files(directory: str = CHANGELOG_DIR) -> list[str]:
+    """changelog 裡有重寫過的 CSV（workflow 只 git add 這些）。"""
+    files = []
+    for log_path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["op"] == "summary" and entry["rewritten"] and entry["file"] not in files:
+                    files.append(entry["file"])
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看這次執行的 CSV changelog")
+    parser.add_argument("command", choices=["changed-files", "summary"])
+    parser.add_argument("--dir", default=CHANGELOG_DIR)
+    args = parser.parse_args()
+
+    if args.command == "changed-files":
+        for path in changed_files(args.dir):
+            print(path)
+        return
+
+    for log_path in sorted(glob.glob(os.path.join(args.dir, "*.jsonl"))):
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["op"] == "summary":
+                    print(f"{entry['file']}：{format_summary(entry)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+爬蟲的計時與統計，跑完寫成 JSON 報告，方便比較每晚的 throughput。
+
+記錄的東西：
+  - 每個 host / endpoint（路徑前兩段）：請求數、嘗試次數、重試、例外、
+    狀態碼分布、下載 bytes、延遲 histogram、快取命中
+  - 等待時間：rate_limiter 排隊（throttle）與重試退避（backoff）各花了多久
+  - 解析：每種解析函式（parse_pool.submit 的 fn）花的時間與頁面大小
+
+報告：HOCG_METRICS_DIR（預設 build/metrics）底下的 run-<UTC 時間>.json，
+另外複製一份 latest.json。HOCG_METRICS_LOG=路徑 時，每個請求 / 解析再寫一行
+JSON（structured log）。HOCG_METRICS=0 完全關閉。
+
+報告會當成公開的 artifact 上傳，所以 "env" 只記 REPORT_ENV 列出的調校用變數；
+URL、路徑、proxy、金鑰之類的環境變數一律不寫進去。
+"""
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import rate_limiter
+
+ENABLED = os.environ.get("HOCG_METRICS", "1") != "0"
+METRICS_DIR = os.environ.get("HOCG_METRICS_DIR", "build/metrics")
+LOG_PATH = os.environ.get("HOCG_METRICS_LOG")
+
+# 延遲 histogram 的上界（秒）；最後一格是 +Inf
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0]
+PARSE_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0]
+
+_lock = threading.Lock()
+_started_at = time.time()
+_endpoints: dict[tuple[str, str], dict] = {}
+_parse: dict[str, dict] = {}
+_log_fh = None
+
+
+# ----------------- 共用小工具 ----------------- #
+
+class Histogram:
+    def __init__(self, buckets: list[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float | None:
+        """用 bucket 上界估計分位數（跟 Prometheus 的做法一樣粗略）。"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{b:g}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "min": None if self.min is None else round(self.min, 4),
+            "max": None if self.max is None else round(self.max, 4),
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+def endpoint_of(url: str) -> tuple[str, str]:
+    parts = urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    return parts.netloc, "/" + "/".join(segments[:2])
+
+
+def _endpoint_stats(url: str) -> dict:
+    key = endpoint_of(url)
+    stats = _endpoints.get(key)
+    if stats is None:
+        stats = _endpoints[key] = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "exceptions": 0,
+            "cache_hits": 0,
+            "bytes": 0,
+            "statuses": {},
+            "throttle_seconds": 0.0,
+            "backoff_seconds": 0.0,
+            "latency": Histogram(LATENCY_BUCKETS),
+        }
+    return stats
+
+
+def _log(event: dict):
+    global _log_fh
+    if not LOG_PATH:
+        return
+    if _log_fh is None:
+        os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+        _log_fh = open(LOG_PATH, "a", encoding="utf-8")
+    _log_fh.write(json.dumps({"ts": round(time.time(), 3), **event}, ensure_ascii=False) + "\n")
+
+
+# ----------------- 記錄 ----------------- #
+
+def record_attempt(
+    method: str,
+    url: str,
+    status: int | None,
+    latency: float,
+    size: int = 0,
+    attempt: int = 0,
+    error: str | None = None,
+):
+    """http_client 每送出一次（包含重試）呼叫一次；status=None 代表連線例外。"""
+    if not ENABLED:
+        return
+    with _lock:
+        stats = _endpoint_stats(url)
+        stats["attempts"] += 1
+        if attempt == 0:
+            stats["requests"] += 1
+        else:
+            stats["retries"] += 1
+        if status is None:
+            stats["exceptions"] += 1
+        else:
+            key = str(status)
+            stats["statuses"][key] = stats["statuses"].get(key, 0) + 1
+        stats["bytes"] += size
+        stats["latency"].observe(latency)
+        _log(
+            {
+                "event": "http",
+                "method": method,
+                "url": url,
+                "status": status,
+                "latency": round(latency, 4),
+                "bytes": size,
+                "attempt": attempt,
+                "error": error,
+            }
+        )
+
+
+def record_cache_hit(url: str):
+    if not ENABLED:
+        return
+    with _lock:
+        stats = _endpoint_stats(url)
+        stats["requests"] += 1
+        stats["cache_hits"] += 1
+        _log({"event": "cache_hit", "url": url})
+
+
+def record_wait(url: str, kind: str, seconds: float):
+    """kind = throttle（rate_limiter 排隊）或 backoff（重試前的等待）。"""
+    if not ENABLED or seconds <= 0:
+        return
+    with _lock:
+        _endpoint_stats(url)[f"{kind}_seconds"] += seconds
+
+
+def record_parse(kind: str, seconds: float, size: int = 0):
+    if not ENABLED:
+        return
+    with _lock:
+        stats = _parse.get(kind)
+        if stats is None:
+            stats = _parse[kind] = {"pages": 0, "bytes": 0, "time": Histogram(PARSE_BUCKETS)}
+        stats["pages"] += 1
+        stats["bytes"] += size
+        stats["time"].observe(seconds)
+        _log({"event": "parse", "kind": kind, "seconds": round(seconds, 5), "bytes": size})
+
+
+# ----------------- 報告 ----------------- #
+
+# 寫進報告的環境變數（白名單）：只放影響 throughput 的調校參數，新的參數要加在這裡
+REPORT_ENV = [
+    "HOCG_EXPANSIONS",
+    "HOCG_CRAWL_MODE",
+    "HOCG_CRAWL_PLAN",
+    "HOCG_REQUEST_BUDGET",
+    "HOCG_FETCH_MODE",
+    "HOCG_FETCH_CONCURRENCY",
+    "HOCG_LISTING_MODE",
+    "HOCG_LISTING_WINDOW",
+    "HOCG_LISTING_MAX_WINDOW",
+    "HOCG_REVALIDATE_SAMPLE",
+    "HOCG_OFFICIAL_WORKERS",
+    "HOCG_OFFICIAL_MAX_IN_FLIGHT",
+    "HOCG_PARSE_WORKERS",
+    "HOCG_PIPELINE_BUFFER",
+    "HOCG_HTML_PARSER",
+    "HOCG_RESUME",
+    "YUYU_FETCH_MODE",
+    "YUYU_BULK_VERIFY",
+    "YUYU_BULK_MAX_PAGES",
+    "YUYU_WORKERS",
+    "YUYU_MAX_IN_FLIGHT",
+    "HTTP_RATE_LIMIT",
+    "HTTP_MAX_RETRIES",
+    "HTTP_BACKOFF_BASE",
+    "HTTP_BACKOFF_MAX",
+    "HTTP_MAX_CONN_PER_HOST",
+    "HTTP_CACHE",
+    "HTTP_OFFLINE",
+]
+
+
+def build_report() -> dict:
+    finished = time.time()
+    with _lock:
+        hosts: dict[str, dict] = {}
+        for (host, endpoint), stats in sorted(_endpoints.items()):
+            hosts.setdefault(host, {})[endpoint] = {
+                **{k: v for k, v in stats.items() if k != "latency"},
+                "throttle_seconds": round(stats["throttle_seconds"], 3),
+                "backoff_seconds": round(stats["backoff_seconds"], 3),
+                "latency": stats["latency"].to_dict(),
+            }
+        parse = {
+            kind: {"pages": s["pages"], "bytes": s["bytes"], "time": s["time"].to_dict()}
+            for kind, s in sorted(_parse.items())
+        }
+
+    endpoints = [e for eps in hosts.values() for e in eps.values()]
+    duration = finished - _started_at
+    requests_total = sum(e["requests"] for e in endpoints)
+    return {
+        "started_at": datetime.fromtimestamp(_started_at, timezone.utc).isoformat(),
+        "finished_at": datetime.fromtimestamp(finished, timezone.utc).isoformat(),
+        "duration_seconds": round(duration, 3),
+        "argv": sys.argv,
+        "env": {k: os.environ[k] for k in REPORT_ENV if k in os.environ},
+        "totals": {
+            "requests": requests_total,
+            "attempts": sum(e["attempts"] for e in endpoints),
+            "retries": sum(e["retries"] for e in endpoints),
+            "bytes": sum(e["bytes"] for e in endpoints),
+            "network_seconds": round(sum(e["latency"]["sum"] for e in endpoints), 3),
+            "throttle_seconds": round(sum(e["throttle_seconds"] for e in endpoints), 3),
+            "backoff_seconds": round(sum(e["backoff_seconds"] for e in endpoints), 3),
+            "parse_seconds": round(sum(p["time"]["sum"] for p in parse.values()), 3),
+            "requests_per_second": round(requests_total / duration, 3) if duration else None,
+        },
+        "hosts": hosts,
+        "parse": parse,
+        "rate_limiter": rate_limiter.snapshot_all(),
+    }
+
+
+def write_report(extra: dict | None = None, report: dict | None = None) -> str | None:
+    if not ENABLED:
+        return None
+    report = build_report() if report is None else report
+    if extra:
+        report.update(extra)
+
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(METRICS_DIR, f"run-{stamp}.json")
+    data = json.dumps(report, ensure_ascii=False, indent=2)
+    for target in (path, os.path.join(METRICS_DIR, "latest.json")):
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(data + "\n")
+    if _log_fh is not None:
+        _log_fh.flush()
+    return path
+
+
+def finish(extra: dict | None = None):
+    """各支爬蟲 main() 結束時呼叫：印出摘要、寫報告並關掉 structured log。"""
+    global _log_fh
+    if not ENABLED:
+        return
+    report = build_report()
+    path = write_report(extra, report)
+    with _lock:
+        if _log_fh is not None:
+            _log_fh.close()
+            _log_fh = None
+    totals = report["totals"]
+    print(
+        f"   📊 {totals['requests']} 個請求（重試 {totals['retries']}），"
+        f"{totals['bytes'] / 1024 / 1024:.1f} MB；網路 {totals['network_seconds']}s、"
+        f"限速等待 {totals['throttle_seconds']}s、退避 {totals['backoff_seconds']}s、"
+        f"解析 {totals['parse_seconds']}s → {path}"
+    )
@@ -1,91 +1,225 @@
-import requests
-from bs4 import BeautifulSoup
+import threading
 import time
 import os
+import argparse
 import csv
-
-API_URL = "https://hololive-official-cardgame.com/cardlist/cardsearch_ex"
-BASE_URL = "https://hololive-official-cardgame.com"
-
-
-def get_soup(url, params=None):
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/123.0.0.0 Safari/537.36"
-        )
-    }
+import hashlib
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import http_client
+import crawl_metrics
+import parse_pool
+from pipeline import ordered_map
+from html_backend import TagRule, make_soup
+import rate_limiter
+from card_codes import normalize_expansion
+from checkpoint import AtomicCsvWriter, format_summary, open_journal
+
+# HOCG_BASE_URL 可以指到本機的測試伺服器
+BASE_URL = os.environ.get(
+    "HOCG_BASE_URL", "https://hololive-official-cardgame.com"
+).rstrip("/")
+API_URL = f"{BASE_URL}/cardlist/cardsearch_ex"
+
+# 詳細頁抓取模式：sync（一張一張抓）/ concurrent（thread 視窗，同時抓 HOCG_FETCH_CONCURRENCY 張）。
+# 舊的設定值 async 視同 concurrent（一開始是 asyncio，後來改成 thread 視窗）
+FETCH_MODE = os.environ.get("HOCG_FETCH_MODE", "sync").strip().lower()
+if FETCH_MODE == "async":
+    FETCH_MODE = "concurrent"
+# concurrent 模式下同時進行的請求數
+FETCH_CONCURRENCY = int(os.environ.get("HOCG_FETCH_CONCURRENCY", "4"))
+
+# 清單頁翻頁模式：sequential（一頁一頁）/ speculative（一次送出一個視窗的頁數）
+LISTING_MODE = os.environ.get("HOCG_LISTING_MODE", "sequential").strip().lower()
+# speculative 沒有上次頁數紀錄時的視窗大小，以及視窗上限
+LISTING_WINDOW = int(os.environ.get("HOCG_LISTING_WINDOW", "4"))
+LISTING_MAX_WINDOW = int(os.environ.get("HOCG_LISTING_MAX_WINDOW", "8"))
+
+# full：每張卡都重抓 / incremental：只抓新卡 + 輪替抽樣的舊卡
+CRAWL_MODE = os.environ.get("HOCG_CRAWL_MODE", "full").strip().lower()
+# incremental 模式每次最多重新驗證幾張舊卡
+REVALIDATE_SAMPLE = int(os.environ.get("HOCG_REVALIDATE_SAMPLE", "20"))
+
+# fast 解析後端只建出這些標籤（與其子樹）
+LISTING_RULES = [TagRule("a")]
+DETAIL_RULES = [
+    TagRule("h1", classes=["name"]),
+    TagRule("p", classes=["number"]),
+    TagRule("img", attr_contains={"src": "/cardlist/"}),
+    TagRule("div", classes=["illustrator"]),
+    TagRule("div", classes=["cardlist-Detail_Products"]),
+    TagRule("div", classes=["qa-List_Item"]),
+    TagRule("div", classes=["txt-Inner"]),
+]
+
+FIELDNAMES = [
+    "expansion",
+    "card_code",
+    "name_ja",
+    "card_page_url",
+    "image_url",
+    "release_dates",
+    "products",
+    "illustrator_name",
+    "qa_count",
+    "qa_text",
+    "effect_text",
+]
+
+
+def get_response(url, params=None, extra_headers=None):
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=10)
-        resp.raise_for_status()
+        resp = http_client.get(url, params=params, headers=extra_headers, timeout=10)
     except Exception as e:
         print(f"   ❌ 連線錯誤: {e}")
         return None
-    return BeautifulSoup(resp.content, "html.parser")
+    return resp
+
+
+def get_soup(url, params=None, rules=None):
+    resp = get_response(url, params)
+    if resp is None:
+        return None
+    return make_soup(resp.content, rules)
 
 
-def normalize_expansion(code: str) -> str | None:
+def parse_listing_page(soup):
     """
-    接受 HPR / hbp01 / HSD2025summer 這種，統一轉成：
-      hPR / hBP01 / hSD2025SUMMER
+    cardsearch_ex 清單頁 → 卡片詳細頁 URL（依出現順序）。
+    頁面上完全沒有連結（超過最後一頁）時回傳 None。
     """
-    if not code:
+    links = soup.find_all("a")
+    if not links:
         return None
-    c = code.strip().replace(" ", "")
-    if not c:
-        return None
-    c = c.lower()
-    if not c.startswith("h"):
-        c = "h" + c
-    head = c[1:3].upper()        # BP / PR / SD / YS / PC / CS...
-    tail = c[3:].upper()         # 01 / 2025SUMMER...
-    return "h" + head + tail
+    urls = []
+    for link in links:
+        href = link.get("href")
+        if href and "/cardlist/?id=" in href:
+            urls.append(BASE_URL + href)
+    return urls
 
 
-def fetch_card_urls(expansion: str):
-    all_card_urls = []
-    page = 1
+def fetch_listing_page(expansion: str, page: int):
+    """
+    回傳 (ok, urls)：ok=False 是連線失敗；urls=None 代表超過最後一頁。
+    """
+    params = {
+        "expansion": expansion,
+        "view": "image",
+        "page": page,
+        "t": int(time.time() * 1000),
+    }
+    soup = get_soup(API_URL, params, LISTING_RULES)
+    if not soup:
+        return False, None
+    return True, parse_listing_page(soup)
 
-    print(f"1. 利用 API 收集 {expansion} 卡片 URL 中...")
 
+def iter_listing_pages_sequential(expansion: str):
+    page = 1
     while True:
-        print(f"   讀取第 {page} 頁...", end="\r")
+        yield page, fetch_listing_page(expansion, page)
+        page += 1
+
+
+def listing_window(expansion: str) -> int:
+    """上次有幾頁，這次第一個視窗就一起送出（多一頁用來確認結尾）。"""
+    last = load_state(expansion).get("listing_pages")
+    if not last:
+        return max(1, LISTING_WINDOW)
+    return max(2, min(last + 1, LISTING_MAX_WINDOW))
+
+
+def iter_listing_pages_speculative(expansion: str, window: int):
+    """
+    同時抓 window 頁，依頁碼順序 yield (page, (ok, urls))。
+    任何一頁回來是空的（超過最後一頁 / 連線失敗）或跟相鄰頁一模一樣，
+    就不再送出更後面的頁；已經送出、超過結尾的結果由呼叫端丟掉。
+    """
+    results: dict[int, tuple] = {}
+    end = [float("inf")]  # 第一個「結尾頁」的頁碼
+    lock = threading.Lock()
+
+    def fetch(page):
+        ok, urls = fetch_listing_page(expansion, page)
+        with lock:
+            results[page] = (ok, urls)
+            if not ok or urls is None:
+                end[0] = min(end[0], page)
+            for other in (page - 1, page + 1):
+                if other >= 1 and urls and results.get(other, (True, None))[1] == urls:
+                    end[0] = min(end[0], max(page, other))
+        return ok, urls
+
+    pool = ThreadPoolExecutor(window, thread_name_prefix="listing")
+    futures: dict[int, Future] = {}
+    next_page = 1
+    try:
+        page = 1
+        while page <= end[0]:
+            while next_page <= end[0] and next_page < page + window:
+                futures[next_page] = pool.submit(fetch, next_page)
+                next_page += 1
+            yield page, futures.pop(page).result()
+            page += 1
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def iter_card_urls(expansion: str):
+    """
+    一頁一頁讀清單 API，依出現順序 yield 卡片 URL（重複的略過）。
+    generator：第一頁讀完就能開始抓詳細頁，不用等所有清單頁。
+    HOCG_LISTING_MODE=speculative 時一次送出一個視窗的頁數（見 iter_listing_pages_speculative）。
+    """
+    seen: dict[str, None] = {}  # 有順序的 set
+    last_page = 0
+
+    print(f"1. 利用 API 收集 {expansion} 卡片 URL 中...")
 
-        params = {
-            "expansion": expansion,
-            "view": "image",
-            "page": page,
-            "t": int(time.time() * 1000),
-        }
+    if LISTING_MODE == "speculative":
+        window = listing_window(expansion)
+        print(f"   speculative 翻頁，視窗 {window} 頁")
+        pages = iter_listing_pages_speculative(expansion, window)
+    else:
+        pages = iter_listing_pages_sequential(expansion)
 
-        soup = get_soup(API_URL, params)
-        if not soup:
+    for page, (ok, page_urls) in pages:
+        print(f"   讀取第 {page} 頁...", end="\r")
+        if not ok:
             break
 
-        links = soup.find_all("a")
-        if not links:
+        if page_urls is None:
             print(f"\n   ✅ 第 {page-1} 頁是最後一頁。")
+            last_page = page - 1
             break
 
         new_links_found = False
-        for link in links:
-            href = link.get("href")
-            if href and "/cardlist/?id=" in href:
-                full_url = BASE_URL + href
-                if full_url not in all_card_urls:
-                    all_card_urls.append(full_url)
-                    new_links_found = True
+        for full_url in page_urls:
+            if full_url not in seen:
+                seen[full_url] = None
+                new_links_found = True
+                yield full_url
 
         if not new_links_found and page > 1:
             print("\n   ⚠️ 偵測到重複內容，停止翻頁。")
+            last_page = page - 1
             break
+    pages.close()
 
-        page += 1
-        time.sleep(0.5)
+    if last_page:
+        state = load_state(expansion)
+        if state.get("listing_pages") != last_page:
+            state["listing_pages"] = last_page
+            save_state(expansion, state)
 
-    print(f"📊 {expansion} 總共找到 {len(all_card_urls)} 個卡片 URL")
-    return all_card_urls
+    print(f"📊 {expansion} 總共找到 {len(seen)} 個卡片 URL")
+
+
+def fetch_card_urls(expansion: str) -> list[str]:
+    return list(iter_card_urls(expansion))
 
 
 def parse_products_and_dates(soup):
@@ -117,10 +251,30 @@ def parse_products_and_dates(soup):
 
 
 def fetch_card_detail(url: str, expansion: str):
-    soup = get_soup(url)
+    soup = get_soup(url, rules=DETAIL_RULES)
     if not soup:
         return None
+    return parse_card_detail(soup, url, expansion)
+
+
+def parse_card_detail_html(content: bytes, url: str, expansion: str):
+    """parse pool 用：直接吃回應內容（可以 pickle）。"""
+    soup = make_soup(content, DETAIL_RULES)
+    return parse_card_detail(soup, url, expansion)
+
+
+def submit_card_detail(url: str, expansion: str):
+    """
+    抓詳細頁，解析交給 parse_pool；回傳解析結果的 Future，連線失敗回傳 None。
+    抓取的 thread 不用等解析完成就能去抓下一頁。
+    """
+    resp = get_response(url)
+    if resp is None:
+        return None
+    return parse_pool.submit(parse_card_detail_html, resp.content, url, expansion)
+
 
+def parse_card_detail(soup, url: str, expansion: str):
     name_tag = soup.find("h1", class_="name")
     card_name = name_tag.get_text(strip=True) if name_tag else ""
 
@@ -172,52 +326,286 @@ def fetch_card_detail(url: str, expansion: str):
     }
 
 
-def run_for_expansion(expansion: str):
-    os.makedirs("data", exist_ok=True)
+def iter_fetch(urls, fn):
+    """
+    依 urls 的順序 yield (url, fn(url) 的結果)；urls 可以是 generator。
+    sync 一次抓一張，concurrent 用 thread 同時抓 FETCH_CONCURRENCY 張；
+    fn 回傳 parse_pool 的 Future 時 yield 的是解析完的結果。
+    per-host 的速率由 http_client 裡的 rate_limiter 控制。
+    scripts/sim_official_crawl.py 用本機的假官網檢查同時請求數與順序。
+    """
+    workers = FETCH_CONCURRENCY if FETCH_MODE == "concurrent" else 1
+    count = 0
+    lock = threading.Lock()
+
+    def run(url):
+        nonlocal count
+        # concurrent 時 run 在 worker thread 上跑，計數要加鎖
+        with lock:
+            count += 1
+            n = count
+        print(f"[{n}] 取得 {url}", end="\r")
+        return fn(url)
+
+    yield from ordered_map(run, urls, workers)
+
+
+# ----------------- incremental 模式 ----------------- #
+def card_id_from_url(url: str) -> str:
+    ids = parse_qs(urlsplit(url).query).get("id")
+    return ids[0] if ids else url
+
+
+def csv_row_key(row: dict) -> tuple:
+    """
+    CSV 的排序 / changelog 識別：卡號 + 官網的卡片 id（補零讓數字順序正確）。
+    寫出的 CSV 依這個 key 排序，不是清單頁的順序；sync / concurrent 寫出的檔案相同。
+    """
+    return row["card_code"], card_id_from_url(row["card_page_url"]).zfill(10)
+
+
+def state_path(expansion: str) -> str:
+    return f"data/{expansion}_cards_state.json"
 
-    print(f"🚀 啟動官網爬蟲 v2，目標系列：{expansion}")
 
-    card_urls = fetch_card_urls(expansion)
-    print("\n2. 開始抓取每張卡的詳細內容...\n")
+def load_state(expansion: str) -> dict:
+    """
+    每張卡上次抓到的 ETag / Last-Modified / 內容 hash，與清單有幾頁，格式：
+      {"revalidate_cursor": 0, "listing_pages": 3, "pages": {"143": {"etag": ..., ...}}}
+    """
+    path = state_path(expansion)
+    if not os.path.exists(path):
+        return {"revalidate_cursor": 0, "pages": {}}
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("revalidate_cursor", 0)
+    state.setdefault("pages", {})
+    return state
+
+
+def save_state(expansion: str, state: dict):
+    with open(state_path(expansion), "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+
+
+def load_existing_rows(path: str) -> dict[str, dict]:
+    """讀取上一次的 CSV，回傳 card id -> row。"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {card_id_from_url(r["card_page_url"]): r for r in csv.DictReader(f)}
+
+
+def pick_revalidate_sample(old_ids: list[str], cursor: int, cap: int):
+    """從舊卡裡輪替取出最多 cap 張，回傳 (sample, 新的 cursor)。"""
+    if not old_ids or cap <= 0:
+        return [], cursor
+    n = min(cap, len(old_ids))
+    start = cursor % len(old_ids)
+    sample = [old_ids[(start + k) % len(old_ids)] for k in range(n)]
+    return sample, (start + n) % len(old_ids)
+
+
+def fetch_card_detail_conditional(url: str, expansion: str, validators: dict):
+    """
+    帶 If-None-Match / If-Modified-Since 的條件式 GET。
+    回傳 (status, row, validators)，status 為 unchanged / fetched；
+    連線失敗回傳 None。伺服器不支援 304 時，用內容 hash 判斷頁面有沒有變。
+    """
+    extra = {}
+    if validators.get("etag"):
+        extra["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        extra["If-Modified-Since"] = validators["last_modified"]
+
+    resp = get_response(url, extra_headers=extra)
+    if resp is None:
+        return None
+    if resp.status_code == 304:
+        return "unchanged", None, validators
+
+    new_validators = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "sha256": hashlib.sha256(resp.content).hexdigest(),
+    }
+    if new_validators["sha256"] == validators.get("sha256"):
+        return "unchanged", None, new_validators
+
+    return parse_pool.submit(
+        _parse_conditional, resp.content, url, expansion, new_validators
+    )
+
+
+def _parse_conditional(content: bytes, url: str, expansion: str, validators: dict):
+    return "fetched", parse_card_detail_html(content, url, expansion), validators
+
+
+def iter_with_journal(urls, fn, journal, done: dict):
+    """
+    依 urls 的順序 yield (url, 結果)。journal 裡已完成的 URL 直接沿用，
+    其餘呼叫 fn(url)（可以回傳 parse_pool 的 Future）；
+    成功的結果一完成就寫進 journal（不用等前面的卡），失敗（None）不記，
+    下次 resume 會重抓。
+    """
+
+    def on_parsed(url, future):
+        if future.exception() is None and future.result() is not None:
+            journal.append(url, future.result())
+
+    def run(url):
+        if url in done:
+            return done.pop(url)
+        result = fn(url)
+        if isinstance(result, Future):
+            result.add_done_callback(lambda f: on_parsed(url, f))
+        elif result is not None:
+            journal.append(url, result)
+        return result
+
+    yield from iter_fetch(urls, run)
+
+
+def iter_incremental_rows(
+    expansion: str, card_urls: list[str], output_file: str, journal, done: dict
+):
+    """
+    只抓新卡與輪替抽樣的舊卡，其他沿用上一次 CSV 的資料。
+    依 card_urls 的順序 yield 合併後的 rows（抽樣要看整份清單，所以 URL 要先收齊）。
+    """
+    existing = load_existing_rows(output_file)
+    state = load_state(expansion)
+    pages = state["pages"]
+
+    url_by_id = {card_id_from_url(u): u for u in card_urls}
+    new_ids = [cid for cid in url_by_id if cid not in existing]
+    old_ids = [cid for cid in url_by_id if cid in existing]
+    sample_ids, state["revalidate_cursor"] = pick_revalidate_sample(
+        old_ids, state["revalidate_cursor"], REVALIDATE_SAMPLE
+    )
+
+    print(
+        f"   incremental：新卡 {len(new_ids)} 張，"
+        f"重新驗證舊卡 {len(sample_ids)} / {len(old_ids)} 張"
+    )
+
+    # 依清單順序抓，結果才能跟沿用的舊資料一起依序串流出去
+    fetch_ids = set(new_ids) | set(sample_ids)
+
+    def fetch(url):
+        cid = card_id_from_url(url)
+        # CSV 裡沒有的卡一定要拿到內容，不帶舊的驗證資訊（不然 304 會變成空列）
+        validators = pages.get(cid, {}) if cid in existing else {}
+        return fetch_card_detail_conditional(url, expansion, validators)
 
-    rows = []
-    for i, url in enumerate(card_urls):
-        print(f"[{i+1}/{len(card_urls)}] 取得 {url}", end="\r")
-        data = fetch_card_detail(url, expansion)
+    fetched = iter_with_journal(
+        (url for cid, url in url_by_id.items() if cid in fetch_ids),
+        fetch,
+        journal,
+        done,
+    )
+
+    changed = 0
+    for cid, url in url_by_id.items():
+        row = None
+        if cid in fetch_ids:
+            _, result = next(fetched)
+            if result is None:
+                print(f"\n   ⚠️ 解析失敗，略過：{url}")
+            else:
+                status, fetched_row, validators = result
+                pages[cid] = validators
+                if status == "fetched":
+                    old = existing.get(cid)
+                    if old is None or any(
+                        str(fetched_row[k]) != old.get(k, "") for k in FIELDNAMES
+                    ):
+                        changed += 1
+                    row = fetched_row
+        if row is None and cid in existing:
+            row = {**existing[cid], "card_page_url": url}
+        if row is not None:
+            yield row
+
+    # 已經不在清單上的卡，驗證資訊也一併清掉
+    state["pages"] = {cid: v for cid, v in pages.items() if cid in url_by_id}
+    save_state(expansion, state)
+
+    print(f"\n   incremental：{changed} 張卡有新增或變動")
+
+
+def iter_full_rows(expansion: str, journal, done: dict):
+    """清單頁 → 詳細頁 → 解析，整條串流；第一頁清單讀完就開始抓詳細頁。"""
+    for url, data in iter_with_journal(
+        iter_card_urls(expansion),
+        lambda url: submit_card_detail(url, expansion),
+        journal,
+        done,
+    ):
         if data is None:
             print(f"\n   ⚠️ 解析失敗，略過：{url}")
             continue
-        rows.append(data)
-        time.sleep(0.2)
+        yield data
+
+
+def run_for_expansion(expansion: str, resume: bool = False, mode: str | None = None):
+    """
+    mode 沒給就用 HOCG_CRAWL_MODE；crawl_planner 會依系列指定 full / incremental。
+    每解析完一張就寫進暫存 CSV，記憶體用量不隨系列大小成長；全部成功才換掉舊檔。
+    """
+    os.makedirs("data", exist_ok=True)
+    mode = mode or CRAWL_MODE
 
-    if not rows:
+    print(f"🚀 啟動官網爬蟲 v2，目標系列：{expansion}")
+
+    output_file = f"data/{expansion}_cards_v2.csv"
+
+    # 每抓完一張就寫進 journal，當機後 --resume 可以接著跑
+    journal, done = open_journal(f"{expansion}_cards", resume)
+
+    if mode == "incremental" and os.path.exists(output_file):
+        card_urls = fetch_card_urls(expansion)
+        print("\n2. 開始抓取每張卡的詳細內容...\n")
+        rows = iter_incremental_rows(expansion, card_urls, output_file, journal, done)
+    else:
+        print("2. 清單與詳細內容邊讀邊抓...\n")
+        rows = iter_full_rows(expansion, journal, done)
+
+    writer = AtomicCsvWriter(output_file, FIELDNAMES, key=csv_row_key)
+    try:
+        for row in rows:
+            writer.write(row)
+    except BaseException:
+        writer.abort()
+        raise
+
+    if not writer.rows:
+        writer.abort()
         print(f"⚠️ {expansion} 沒有任何卡片資料，停止。")
+        journal.close()
         return
 
-    output_file = f"data/{expansion}_cards_v2.csv"
-    fieldnames = [
-        "expansion",
-        "card_code",
-        "name_ja",
-        "card_page_url",
-        "image_url",
-        "release_dates",
-        "products",
-        "illustrator_name",
-        "qa_count",
-        "qa_text",
-        "effect_text",
-    ]
-
-    with open(output_file, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-
-    print(f"\n🎉 完成！{expansion} 共輸出 {len(rows)} 筆資料 → {output_file}")
+    summary = writer.commit()
+    journal.remove()
+
+    print(
+        f"\n🎉 完成！{expansion} 共輸出 {writer.rows} 筆資料 → {output_file}"
+        f"（{format_summary(summary)}）"
+    )
+    return writer.rows
 
 
 def main():
+    parser = argparse.ArgumentParser(description="HOCG 官網卡片爬蟲")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=os.environ.get("HOCG_RESUME") == "1",
+        help="沿用上次中斷時的 journal，略過已完成的卡片",
+    )
+    args = parser.parse_args()
+
     raw = os.environ.get(
         "HOCG_EXPANSIONS",
         "HBP01",
@@ -231,8 +619,13 @@ def main():
 
     print("本次將處理的系列：", ", ".join(expansions))
 
+    rows = {}
     for exp in expansions:
-        run_for_expansion(exp)
+        rows[exp] = run_for_expansion(exp, resume=args.resume)
+
+    parse_pool.shutdown()
+    rate_limiter.print_summary()
+    crawl_metrics.finish({"site": "official", "rows": rows})
 
 
 if __name__ == "__main__":
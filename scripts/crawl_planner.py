@@ -0,0 +1,309 @@
+"""
+每晚的爬取計畫：依「多久沒抓」與「多常變動」決定每個系列要抓多深，
+總請求數控制在 HOCG_REQUEST_BUDGET 以內。
+
+每個系列在 data/crawl_state.json 記錄：
+  official：上次抓取時間、卡片數、變動率（每天有多少比例的卡會變，EWMA）
+  yuyu    ：上次抓取時間、版本數、價格變動率（同上）、平均價格變動幅度
+  first_seen：第一次抓到的時間（第一次記錄時已經有 CSV 的舊系列是 null）
+
+排法：
+  - 新系列（沒有 CSV 或出現不到 HOCG_PLAN_NEW_DAYS 天）：官網 full + 價格，一定排
+  - 超過 HOCG_PLAN_MAX_STALE_DAYS 天沒抓：至少 sample，一定排
+  - 其他依「預期變動筆數 / 請求數」由高到低塞進剩下的預算；
+    預期變動比例 ≥ HOCG_PLAN_FULL_RATIO 的官網用 full，否則 sample
+    （incremental 模式 + 輪替抽樣 HOCG_REVALIDATE_SAMPLE 張）
+  - 塞不下的略過，下次 staleness 變大自然會排上
+
+預期變動比例用 Poisson 模型：1 - exp(-變動率 × 距上次天數)。
+
+用法：
+  python scripts/crawl_planner.py [--sites official,yuyu] [--budget 3000]   # 只印計畫
+  python scripts/crawl_scheduler.py --plan                                   # 依計畫爬
+"""
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import crawl_official_cards
+import crawl_yuyutei_prices
+from print_index import print_key_for
+
+STATE_PATH = os.environ.get("HOCG_CRAWL_STATE", "data/crawl_state.json")
+REQUEST_BUDGET = int(os.environ.get("HOCG_REQUEST_BUDGET", "3000"))
+NEW_DAYS = float(os.environ.get("HOCG_PLAN_NEW_DAYS", "30"))
+MAX_STALE_DAYS = float(os.environ.get("HOCG_PLAN_MAX_STALE_DAYS", "14"))
+FULL_RATIO = float(os.environ.get("HOCG_PLAN_FULL_RATIO", "0.25"))
+# EWMA 的權重：新觀測值佔多少
+ALPHA = float(os.environ.get("HOCG_PLAN_ALPHA", "0.3"))
+
+# 沒有歷史時的變動率（每天）與卡片數
+PRIOR_RATE = 0.1
+DEFAULT_CARDS = 100
+# 官網清單 API 每頁大約幾張（估請求數用）
+LISTING_PAGE_SIZE = 40
+
+FULL = "full"
+SAMPLE = "sample"
+CRAWL = "crawl"
+SKIP = "skip"
+
+
+# ----------------- 共用小工具 ----------------- #
+
+def _now() -> float:
+    return time.time()
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="seconds")
+
+
+def _parse_iso(value: str | None) -> float | None:
+    if not value:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _days_since(value: str | None, now: float) -> float | None:
+    ts = _parse_iso(value)
+    return None if ts is None else max(0.0, (now - ts) / 86400)
+
+
+def load_state(path: str = STATE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"version": 1, "expansions": {}}
+    with open(path, encoding="utf-8") as f:
+        state = json.load(f)
+    state.setdefault("expansions", {})
+    return state
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+        f.write("\n")
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+# ----------------- CSV 快照（比較前後的變動） ----------------- #
+
+def snapshot_official(expansion: str) -> dict[str, str]:
+    """card id -> 整列內容的 hash。"""
+    path = f"data/{expansion}_cards_v2.csv"
+    if not os.path.exists(path):
+        return {}
+    out = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            cid = crawl_official_cards.card_id_from_url(r.get("card_page_url") or "")
+            body = "\x1f".join(r.get(k) or "" for k in crawl_official_cards.FIELDNAMES)
+            out[cid] = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    return out
+
+
+def snapshot_yuyu(expansion: str) -> dict[str, tuple]:
+    """print_key -> (sell, buy)。"""
+    path = f"data/{expansion}_yuyutei_prices.csv"
+    if not os.path.exists(path):
+        return {}
+    out = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            if r.get("rarity"):
+                out[print_key_for(r)] = (r.get("sell_price_jpy") or "", r.get("buy_price_jpy") or "")
+    return out
+
+
+def snapshot(expansion: str, site: str):
+    return snapshot_official(expansion) if site == "official" else snapshot_yuyu(expansion)
+
+
+def _price_move(before: dict, after: dict) -> float | None:
+    """有對到的版本 sell 價的平均相對變動（|新 - 舊| / 舊）。"""
+    moves = []
+    for key, (sell, _) in after.items():
+        old = before.get(key, ("", ""))[0]
+        if old.isdigit() and sell.isdigit() and int(old) > 0:
+            moves.append(abs(int(sell) - int(old)) / int(old))
+    return sum(moves) / len(moves) if moves else None
+
+
+# ----------------- 狀態更新 ----------------- #
+
+def observe(state: dict, expansion: str, site: str, before: dict, after: dict, depth: str, now=None):
+    """
+    一次爬取結束後更新變動率。sample 只重新驗證了一部分的卡，
+    分母用實際檢查過的張數（新卡 + 抽樣數）。
+    """
+    now = _now() if now is None else now
+    entry = state["expansions"].setdefault(expansion, {})
+    # 之前就有 CSV 的系列不知道什麼時候出的，當成舊系列
+    entry.setdefault("first_seen", None if before else _iso(now))
+    info = entry.setdefault(site, {})
+
+    changed = sum(1 for k, v in after.items() if before.get(k) != v)
+    checked = len(after)
+    if site == "official" and depth == SAMPLE:
+        new = sum(1 for k in after if k not in before)
+        checked = min(len(after), new + crawl_official_cards.REVALIDATE_SAMPLE)
+
+    elapsed = _days_since(info.get("last_crawled"), now)
+    if before and checked and elapsed:
+        fraction = min(changed / checked, 0.95)
+        rate = max(0.0, -math.log(1 - fraction) / max(elapsed, 1 / 24))
+        old = info.get("change_rate")
+        info["change_rate"] = round(rate if old is None else (1 - ALPHA) * old + ALPHA * rate, 5)
+
+    if site == "yuyu":
+        move = _price_move(before, after)
+        if move is not None:
+            old = info.get("price_move")
+            info["price_move"] = round(move if old is None else (1 - ALPHA) * old + ALPHA * move, 5)
+
+    info["last_crawled"] = _iso(now)
+    info["last_changed"] = changed
+    info["rows"] = len(after)
+    info["runs"] = info.get("runs", 0) + 1
+
+
+# ----------------- 排計畫 ----------------- #
+
+def estimate_cost(site: str, depth: str, cards: int) -> int:
+    if depth == SKIP:
+        return 0
+    if site == "official":
+        listing = math.ceil(cards / LISTING_PAGE_SIZE) + 1
+        if depth == FULL:
+            return listing + cards
+        return listing + min(cards, crawl_official_cards.REVALIDATE_SAMPLE)
+    if crawl_yuyutei_prices.FETCH_MODE == "bulk":
+        return 4
+    return 2 * cards
+
+
+def _known_cards(expansion: str) -> int | None:
+    snap = snapshot_official(expansion)
+    return len(snap) or None
+
+
+def plan(
+    expansions: list[str],
+    sites: set[str],
+    budget: int = REQUEST_BUDGET,
+    state: dict | None = None,
+    now: float | None = None,
+) -> list[dict]:
+    """
+    回傳 [{expansion, site, depth, cost, score, reason}]，依 expansions 的順序；
+    depth：official 是 full / sample / skip，yuyu 是 crawl / skip。
+    """
+    state = load_state() if state is None else state
+    now = _now() if now is None else now
+
+    items = []
+    for exp in expansions:
+        entry = state["expansions"].get(exp, {})
+        cards = _known_cards(exp)
+        first_seen = _days_since(entry.get("first_seen"), now)
+        is_new = cards is None or (first_seen is not None and first_seen < NEW_DAYS)
+        cards = cards or DEFAULT_CARDS
+
+        for site in ("official", "yuyu"):
+            if site not in sites:
+                continue
+            info = entry.get(site, {})
+            item = {"expansion": exp, "site": site, "cards": cards}
+            stale = _days_since(info.get("last_crawled"), now)
+            rate = info.get("change_rate", PRIOR_RATE)
+
+            if is_new:
+                item["depth"] = FULL if site == "official" else CRAWL
+                item["forced"] = True
+                item["score"] = None
+                item["reason"] = "新系列" if first_seen is None else f"新系列（{first_seen:.0f} 天前出現）"
+            elif stale is None or stale >= MAX_STALE_DAYS:
+                item["depth"] = SAMPLE if site == "official" else CRAWL
+                item["forced"] = True
+                item["score"] = None
+                item["reason"] = "沒有抓取紀錄" if stale is None else f"{stale:.1f} 天沒抓（上限 {MAX_STALE_DAYS:g}）"
+            else:
+                ratio = 1 - math.exp(-rate * stale)
+                if site == "official":
+                    item["depth"] = FULL if ratio >= FULL_RATIO else SAMPLE
+                else:
+                    item["depth"] = CRAWL
+                    # 價格動得越大，同樣的變動比例越值得抓
+                    ratio *= 1 + min(info.get("price_move", 0.0) * 10, 2.0)
+                item["forced"] = False
+                item["expected"] = cards * ratio
+                item["reason"] = (
+                    f"距上次 {stale:.1f} 天、變動率 {rate:.3f}/天，預期 {cards * ratio:.1f} 筆變動"
+                )
+            item["cost"] = estimate_cost(site, item["depth"], cards)
+            if not item["forced"]:
+                item["score"] = item["expected"] / max(item["cost"], 1)
+            items.append(item)
+
+    remaining = budget
+    for item in sorted(items, key=lambda i: (not i["forced"], -(i["score"] or 0))):
+        if item["forced"]:
+            remaining -= item["cost"]
+            continue
+        if item["cost"] > remaining and item["depth"] == FULL:
+            # full 塞不下就退一步用 sample
+            sample_cost = estimate_cost(item["site"], SAMPLE, item["cards"])
+            if sample_cost <= remaining:
+                item["depth"], item["cost"] = SAMPLE, sample_cost
+                item["reason"] += "；預算不夠 full，改 sample"
+        if item["cost"] <= remaining:
+            remaining -= item["cost"]
+        else:
+            item["depth"], item["cost"] = SKIP, 0
+            item["reason"] += "；預算不足，略過"
+
+    if remaining < 0:
+        print(f"⚠ 必排項目已超出預算 {-remaining} 個請求（預算 {budget}）")
+    return items
+
+
+def print_plan(items: list[dict], budget: int = REQUEST_BUDGET):
+    print("\n===== 今晚的爬取計畫 =====")
+    for item in items:
+        print(
+            f"  {item['expansion']:<16} {item['site']:<8} {item['depth']:<6} "
+            f"~{item['cost']:>5} req  {item['reason']}"
+        )
+    used = sum(i["cost"] for i in items)
+    skipped = sum(1 for i in items if i["depth"] == SKIP)
+    print(f"  預估 {used} / {budget} 個請求，略過 {skipped} 項\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="印出今晚的爬取計畫（不會真的爬）")
+    parser.add_argument("--sites", default="official,yuyu")
+    parser.add_argument("--budget", type=int, default=REQUEST_BUDGET)
+    args = parser.parse_args()
+
+    raw = os.environ.get("HOCG_EXPANSIONS", "HBP01")
+    expansions = []
+    for r in raw.split(","):
+        norm = crawl_official_cards.normalize_expansion(r)
+        if norm and norm not in expansions:
+            expansions.append(norm)
+
+    sites = {s.strip() for s in args.sites.split(",") if s.strip()}
+    print_plan(plan(expansions, sites, args.budget), args.budget)
+
+
+if __name__ == "__main__":
+    main()
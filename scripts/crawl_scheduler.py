@@ -0,0 +1,219 @@
+"""
+多系列並行排程：官網爬蟲與 YUYU 價格爬蟲各自一個 worker pool。
+
+  - 卡片數最多的系列先跑（沒有舊 CSV 的新系列排最前面）
+  - 某個系列的官網資料抓完，立刻把同系列的價格爬蟲排進 YUYU pool
+  - 每個站台一個共用的請求名額（http_client.set_site_budget）：不管同時跑幾個系列、
+    每個系列開幾個 thread，送出中的請求最多 HOCG_OFFICIAL_MAX_IN_FLIGHT /
+    YUYU_MAX_IN_FLIGHT 個；速率另外由 rate_limiter 在整個 process 內共用，
+    所以同時跑的系列不會讓對同一個 host 的速率或並行數疊加
+  - 最後印出每個系列花的時間
+  - --plan：先用 crawl_planner 依 staleness / 變動率排出今晚的計畫（在請求預算內），
+    每個系列照計畫決定 full / sample / 略過，跑完更新 data/crawl_state.json
+
+用法：
+  HOCG_EXPANSIONS=HBP01,HBP02 python scripts/crawl_scheduler.py [--sites official,yuyu] [--resume] [--plan]
+"""
+import argparse
+import csv
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from urllib.parse import urlsplit
+
+import crawl_official_cards
+import crawl_yuyutei_prices
+import crawl_metrics
+import crawl_planner
+import html_backend
+import http_client
+import parse_pool
+import rate_limiter
+
+OFFICIAL_WORKERS = int(os.environ.get("HOCG_OFFICIAL_WORKERS", "3"))
+YUYU_WORKERS = int(os.environ.get("YUYU_WORKERS", "2"))
+
+# 每個站台同時送出中的請求上限（所有系列合計）
+OFFICIAL_MAX_IN_FLIGHT = int(os.environ.get("HOCG_OFFICIAL_MAX_IN_FLIGHT", "4"))
+YUYU_MAX_IN_FLIGHT = int(os.environ.get("YUYU_MAX_IN_FLIGHT", "2"))
+
+
+def configure_site_budgets() -> dict[str, int]:
+    budgets = {
+        urlsplit(crawl_official_cards.BASE_URL).netloc: OFFICIAL_MAX_IN_FLIGHT,
+        urlsplit(crawl_yuyutei_prices.YUYU_BASE_URL).netloc: YUYU_MAX_IN_FLIGHT,
+    }
+    for host, limit in budgets.items():
+        http_client.set_site_budget(host, limit)
+    return budgets
+
+
+def known_card_count(expansion: str) -> int | None:
+    path = f"data/{expansion}_cards_v2.csv"
+    if not os.path.exists(path):
+        return None
+    with open(path, newline="", encoding="utf-8") as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+def order_by_size(expansions: list[str]) -> list[str]:
+    """卡多的先跑；不知道張數的新系列放最前面。"""
+    counts = {exp: known_card_count(exp) for exp in expansions}
+    return sorted(
+        expansions,
+        key=lambda exp: (counts[exp] is not None, -(counts[exp] or 0)),
+    )
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.monotonic()
+    try:
+        result = fn(*args, **kwargs)
+        error = None
+    except Exception as e:
+        result = None
+        error = str(e)
+    return {
+        "seconds": time.monotonic() - started,
+        "rows": result or 0,
+        "error": error,
+    }
+
+
+# 計畫的 depth → crawl_official_cards 的 mode
+PLAN_MODES = {crawl_planner.FULL: "full", crawl_planner.SAMPLE: "incremental"}
+
+
+def run(
+    expansions: list[str],
+    sites: set[str],
+    resume: bool = False,
+    plan: list[dict] | None = None,
+    state: dict | None = None,
+) -> dict:
+    """
+    plan 是 crawl_planner.plan() 的結果；有給的話只跑計畫裡沒略過的項目，
+    並把每次爬取前後的變動記進 state。
+    """
+    ordered = order_by_size(expansions)
+    print("排程順序（卡多的先跑）：", ", ".join(ordered))
+    budgets = configure_site_budgets()
+    print("每個站台同時請求上限：", "、".join(f"{h} {n}" for h, n in budgets.items()))
+    print("HTML 解析：", html_backend.active_backend())
+
+    depths = {(i["expansion"], i["site"]): i["depth"] for i in plan} if plan else {}
+
+    def planned(exp, site):
+        if site not in sites:
+            return False
+        return not plan or depths.get((exp, site), crawl_planner.SKIP) != crawl_planner.SKIP
+
+    summary: dict[str, dict] = {exp: {} for exp in ordered}
+    official_pool = ThreadPoolExecutor(OFFICIAL_WORKERS, thread_name_prefix="official")
+    yuyu_pool = ThreadPoolExecutor(YUYU_WORKERS, thread_name_prefix="yuyu")
+    yuyu_futures = []
+    state_lock = threading.Lock()
+
+    def crawl(exp, site, fn, **kwargs):
+        before = crawl_planner.snapshot(exp, site) if state is not None else None
+        summary[exp][site] = _timed(fn, exp, resume=resume, **kwargs)
+        if state is not None and not summary[exp][site]["error"]:
+            after = crawl_planner.snapshot(exp, site)
+            with state_lock:
+                crawl_planner.observe(state, exp, site, before, after, depths.get((exp, site)))
+
+    def run_yuyu(exp):
+        crawl(exp, "yuyu", crawl_yuyutei_prices.run_for_expansion)
+
+    def run_official(exp):
+        crawl(
+            exp,
+            "official",
+            crawl_official_cards.run_for_expansion,
+            mode=PLAN_MODES.get(depths.get((exp, "official"))),
+        )
+        if planned(exp, "yuyu"):
+            yuyu_futures.append(yuyu_pool.submit(run_yuyu, exp))
+
+    try:
+        official = [exp for exp in ordered if planned(exp, "official")]
+        wait([official_pool.submit(run_official, exp) for exp in official])
+        yuyu_futures.extend(
+            yuyu_pool.submit(run_yuyu, exp)
+            for exp in ordered
+            if exp not in official and planned(exp, "yuyu")
+        )
+        wait(yuyu_futures)
+    finally:
+        official_pool.shutdown()
+        yuyu_pool.shutdown()
+
+    return summary
+
+
+def print_summary(summary: dict, total_seconds: float):
+    print("\n===== 各系列耗時 =====")
+    for exp, parts in summary.items():
+        cells = []
+        for site in ("official", "yuyu"):
+            info = parts.get(site)
+            if not info:
+                continue
+            cell = f"{site} {info['seconds']:.1f}s / {info['rows']} 筆"
+            if info["error"]:
+                cell += f"（錯誤：{info['error']}）"
+            cells.append(cell)
+        print(f"  {exp:<16} " + "  |  ".join(cells))
+    print(f"  總耗時 {total_seconds:.1f}s")
+    rate_limiter.print_summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多系列並行爬蟲排程")
+    parser.add_argument(
+        "--sites",
+        default="official,yuyu",
+        help="要跑的站台，逗號分隔：official,yuyu",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=os.environ.get("HOCG_RESUME") == "1",
+        help="沿用上次中斷時的 journal",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        default=os.environ.get("HOCG_CRAWL_PLAN") == "1",
+        help="依 crawl_planner 的計畫決定每個系列抓多深（預算 HOCG_REQUEST_BUDGET）",
+    )
+    args = parser.parse_args()
+
+    raw = os.environ.get("HOCG_EXPANSIONS", "HBP01")
+    expansions = []
+    for r in raw.split(","):
+        norm = crawl_official_cards.normalize_expansion(r)
+        if norm and norm not in expansions:
+            expansions.append(norm)
+
+    sites = {s.strip() for s in args.sites.split(",") if s.strip()}
+
+    plan = state = None
+    if args.plan:
+        state = crawl_planner.load_state()
+        plan = crawl_planner.plan(expansions, sites, state=state)
+        crawl_planner.print_plan(plan)
+
+    started = time.monotonic()
+    summary = run(expansions, sites, resume=args.resume, plan=plan, state=state)
+    parse_pool.shutdown()
+    if state is not None:
+        crawl_planner.save_state(state)
+    print_summary(summary, time.monotonic() - started)
+    crawl_metrics.finish({"site": ",".join(sorted(sites)), "expansions": summary, "plan": plan})
+
+
+if __name__ == "__main__":
+    main()
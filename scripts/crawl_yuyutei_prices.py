@@ -1,65 +1,71 @@
+import argparse
 import csv
-import time
 import re
 import os
-import requests
-from bs4 import BeautifulSoup
-
-BASE_SELL_SEARCH = "https://yuyu-tei.jp/sell/hocg/s/search"
-BASE_BUY_SEARCH = "https://yuyu-tei.jp/buy/hocg/s/search"
-
-HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    )
-}
+import http_client
+from html_backend import TagRule, make_soup
+import crawl_metrics
+import parse_pool
+import price_history
+import rate_limiter
+from card_codes import normalize_expansion
+from checkpoint import atomic_write_csv, format_summary, open_journal
+
+# YUYU_BASE_URL 可以指到本機的測試伺服器
+YUYU_BASE_URL = os.environ.get("YUYU_BASE_URL", "https://yuyu-tei.jp").rstrip("/")
+BASE_SELL_SEARCH = f"{YUYU_BASE_URL}/sell/hocg/s/search"
+BASE_BUY_SEARCH = f"{YUYU_BASE_URL}/buy/hocg/s/search"
+MARKET_SEARCH = {"sell": BASE_SELL_SEARCH, "buy": BASE_BUY_SEARCH}
 
 REQUEST_TIMEOUT = 15
-SLEEP_BETWEEN_REQUESTS = 1.2
 
-
-def normalize_expansion(code: str) -> str | None:
-    """
-    跟官網爬蟲同一邏輯，讓 HPR/HBP01/HSD2025summer 都變成
-      hPR / hBP01 / hSD2025SUMMER
-    """
-    if not code:
-        return None
-    c = code.strip().replace(" ", "")
-    if not c:
-        return None
-    c = c.lower()
-    if not c.startswith("h"):
-        c = "h" + c
-    head = c[1:3].upper()
-    tail = c[3:].upper()
-    return "h" + head + tail
+# per_code：每張卡 sell / buy 各搜尋一次
+# bulk：每個系列每個市場只搜尋一次（跟著分頁抓完），解析後依卡號分組；
+#       某個市場的清單上找不到的卡號，只有那個市場退回逐卡搜尋。
+#       注意：bulk 的結果不保證跟 per_code 相同。只出現在逐卡搜尋裡的版本
+#       （掛在別的系列 search_word 底下的再錄、部分符合）在卡號有出現在 bulk 清單時會漏掉，
+#       要確認差異請用 --verify（YUYU_BULK_VERIFY=1）
+FETCH_MODE = os.environ.get("YUYU_FETCH_MODE", "per_code").strip().lower()
+# bulk 模式下，bulk 已經找到的卡號再逐卡搜尋一次，比對版本集合；
+# 不一致時印出差異並改用逐卡搜尋的結果（請求數跟 per_code 一樣多，檢查用）
+BULK_VERIFY = os.environ.get("YUYU_BULK_VERIFY") == "1"
+# bulk 搜尋最多跟幾頁；超過就當成結果不完整，整個市場改逐卡搜尋
+BULK_MAX_PAGES = int(os.environ.get("YUYU_BULK_MAX_PAGES", "30"))
+
+# fast 解析後端只建出卡片清單區塊
+SEARCH_RULES = [TagRule("div", classes=["py-4", "cards-list"])]
+
+
+def csv_row_key(row: dict) -> tuple:
+    """CSV 的排序 / changelog 識別：一個版本一列。"""
+    return (
+        row["card_code"],
+        row["rarity"],
+        row["is_parallel_name"],
+        row["sell_url"],
+        row["buy_url"],
+    )
 
 
 # ----------------- 共用小工具 ----------------- #
 def http_get(url: str, params=None) -> str:
-    last_err = None
-    for attempt in range(3):
-        try:
-            resp = requests.get(
-                url, params=params, headers=HEADERS, timeout=REQUEST_TIMEOUT
-            )
-            resp.raise_for_status()
-            return resp.text
-        except Exception as e:
-            last_err = e
-            wait = 2**attempt
-            print(f"    !! HTTP 失敗，{wait} 秒後重試（{attempt + 1}/3）: {e}")
-            time.sleep(wait)
-    raise last_err
+    # 重試 / 退避交給共用的 http_client
+    resp = http_client.get(url, params=params, timeout=REQUEST_TIMEOUT)
+    return resp.text
 
 
 def _normalize_code(code: str) -> str:
     return (code or "").replace("　", " ").replace(" ", "").lower()
 
 
+_PAGE_PARAM_RE = re.compile(r"[?&](?:amp;)?page=(\d+)")
+
+
+def parse_last_page(html: str) -> int:
+    """搜尋結果分頁連結裡最大的頁碼；沒有分頁就是 1。"""
+    return max((int(n) for n in _PAGE_PARAM_RE.findall(html)), default=1)
+
+
 def _extract_code_from_alt(alt_text: str):
     if not alt_text:
         return None
@@ -69,12 +75,12 @@ def _extract_code_from_alt(alt_text: str):
     return None
 
 
-def parse_card_list_from_search(html: str, card_code: str, mode: str):
-    soup = BeautifulSoup(html, "html.parser")
-    results = []
-
-    target_norm = _normalize_code(card_code)
-
+def _iter_card_products(soup, mode: str):
+    """
+    逐一走過搜尋頁上的 div.card-product，產出
+      (正規化卡號, 正規化 alt 卡號, 資料)
+    資料裡不含 card_code，由呼叫端決定要填哪個卡號。
+    """
     for cards_block in soup.select("div.py-4.cards-list"):
         h3 = cards_block.select_one("h3")
         if not h3:
@@ -102,9 +108,6 @@ def parse_card_list_from_search(html: str, card_code: str, mode: str):
                 alt_code = _extract_code_from_alt(alt_text)
             norm_alt = _normalize_code(alt_code) if alt_code else None
 
-            if norm_code != target_norm and norm_alt != target_norm:
-                continue
-
             name_el = product.select_one("h4")
             name_ja = name_el.get_text(strip=True) if name_el else None
             is_parallel_name = 1 if (name_ja and "パラレル" in name_ja) else 0
@@ -126,43 +129,49 @@ def parse_card_list_from_search(html: str, card_code: str, mode: str):
             if card_url and card_url.startswith("/"):
                 card_url = "https://yuyu-tei.jp" + card_url
 
-            results.append(
-                {
-                    "card_code": card_code,
-                    "rarity": rarity,
-                    "name_ja": name_ja,
-                    "is_parallel_name": is_parallel_name,
-                    "price_jpy": price_jpy,
-                    "raw_price_text": raw_price_text,
-                    "url": card_url,
-                }
-            )
+            yield norm_code, norm_alt, {
+                "rarity": rarity,
+                "name_ja": name_ja,
+                "is_parallel_name": is_parallel_name,
+                "price_jpy": price_jpy,
+                "raw_price_text": raw_price_text,
+                "url": card_url,
+            }
+
+
+def parse_card_list_from_search(html: str, card_code: str, mode: str):
+    soup = make_soup(html, SEARCH_RULES)
+    results = []
+
+    target_norm = _normalize_code(card_code)
+
+    for norm_code, norm_alt, item in _iter_card_products(soup, mode):
+        if norm_code != target_norm and norm_alt != target_norm:
+            continue
+        results.append({"card_code": card_code, **item})
 
     return results
 
 
-def fetch_yuyutei_for_code(card_code: str):
-    error_message = None
+def parse_card_lists_by_code(html: str, mode: str) -> dict[str, list[dict]]:
+    """
+    bulk 模式用：一次解析整頁，依正規化卡號分組。
+    跟 parse_card_list_from_search 一樣，卡號或 alt 卡號任一個符合就算。
+    """
+    soup = make_soup(html, SEARCH_RULES)
+    by_code: dict[str, list[dict]] = {}
 
-    try:
-        sell_html = http_get(BASE_SELL_SEARCH, params={"search_word": card_code})
-        sell_rows_raw = parse_card_list_from_search(sell_html, card_code, mode="sell")
-    except Exception as e:
-        sell_rows_raw = []
-        error_message = f"sell search error: {e}"
+    for norm_code, norm_alt, item in _iter_card_products(soup, mode):
+        for key in {norm_code, norm_alt}:
+            if key:
+                by_code.setdefault(key, []).append(item)
 
-    time.sleep(SLEEP_BETWEEN_REQUESTS)
+    return by_code
 
-    try:
-        buy_html = http_get(BASE_BUY_SEARCH, params={"search_word": card_code})
-        buy_rows_raw = parse_card_list_from_search(buy_html, card_code, mode="buy")
-    except Exception as e:
-        buy_rows_raw = []
-        if error_message:
-            error_message = f"{error_message} | buy search error: {e}"
-        else:
-            error_message = f"buy search error: {e}"
 
+def merge_sell_buy_rows(
+    card_code: str, sell_rows_raw: list, buy_rows_raw: list, error_message=None
+):
     sell_by_key = {}
     for row in sell_rows_raw:
         key = ((row["rarity"] or "?"), row["is_parallel_name"])
@@ -235,8 +244,116 @@ def fetch_yuyutei_for_code(card_code: str):
     return merged_rows
 
 
-def run_for_expansion(exp: str):
+def submit_market_search(card_code: str, mode: str):
+    """逐卡搜尋一個市場（sell / buy），回傳 parse_pool 的 Future。"""
+    html = http_get(MARKET_SEARCH[mode], params={"search_word": card_code})
+    return parse_pool.submit(parse_card_list_from_search, html, card_code, mode)
+
+
+def fetch_yuyutei_for_code(card_code: str, known: dict | None = None):
+    """
+    known：bulk 已經找到的市場 {"sell": rows, "buy": rows}，這些市場不再搜尋。
+    sell 頁的解析丟給 parse_pool，同時去抓 buy 頁。
+    """
+    known = known or {}
+    futures = {}
+    errors = {}
+    for mode in ("sell", "buy"):
+        if mode in known:
+            continue
+        try:
+            futures[mode] = submit_market_search(card_code, mode)
+        except Exception as e:
+            errors[mode] = f"{mode} search error: {e}"
+
+    found = dict(known)
+    for mode, future in futures.items():
+        try:
+            found[mode] = future.result()
+        except Exception as e:
+            errors[mode] = f"{mode} search error: {e}"
+
+    error_message = " | ".join(errors[m] for m in ("sell", "buy") if m in errors) or None
+    return merge_sell_buy_rows(
+        card_code, found.get("sell", []), found.get("buy", []), error_message
+    )
+
+
+def fetch_bulk_market(exp: str, mode: str) -> dict[str, list[dict]] | None:
+    """
+    用系列代號搜尋一個市場，跟著分頁抓完再合併；
+    失敗或超過 BULK_MAX_PAGES 頁（結果可能不完整）回傳 None。
+    每頁的解析丟給 parse_pool，跟下一頁的抓取重疊。
+    """
+    base = MARKET_SEARCH[mode]
+    futures = []
+    try:
+        page, last = 1, 1
+        while page <= last:
+            params = {"search_word": exp}
+            if page > 1:
+                params["page"] = page
+            html = http_get(base, params=params)
+            futures.append(parse_pool.submit(parse_card_lists_by_code, html, mode))
+            last = max(last, parse_last_page(html))
+            if last > BULK_MAX_PAGES:
+                print(f"[{exp}]   !! bulk {mode} 搜尋超過 {BULK_MAX_PAGES} 頁，改用逐卡搜尋")
+                return None
+            page += 1
+
+        by_code: dict[str, list[dict]] = {}
+        for future in futures:
+            for code, items in future.result().items():
+                by_code.setdefault(code, []).extend(items)
+    except Exception as e:
+        print(f"[{exp}]   !! bulk {mode} 搜尋失敗，改用逐卡搜尋：{e}")
+        return None
+    if len(futures) > 1:
+        print(f"[{exp}]   bulk {mode}：{len(futures)} 頁")
+    return by_code
+
+
+def fetch_yuyutei_bulk(exp: str):
+    """
+    bulk 模式：每個市場（sell / buy）只用系列代號搜尋一次，回傳
+      (sell_by_code, buy_by_code)
+    失敗的市場是 None，呼叫端對那個市場退回逐卡搜尋。
+    """
+    return fetch_bulk_market(exp, "sell"), fetch_bulk_market(exp, "buy")
+
+
+def print_set(rows: list[dict]) -> set[tuple]:
+    """比對 bulk / 逐卡結果用：每個版本的 (稀有度, パラレル, sell_url, buy_url)。"""
+    return {
+        (r["rarity"], r["is_parallel_name"], r["sell_url"], r["buy_url"])
+        for r in rows
+        if r["rarity"] is not None
+    }
+
+
+def verify_bulk_rows(exp: str, code: str, bulk_rows: list[dict]) -> list[dict]:
+    """逐卡搜尋一次跟 bulk 的結果比對；不一致就回傳逐卡的結果。"""
+    per_code = fetch_yuyutei_for_code(code)
+    if any(r["error_message"] and "search error" in r["error_message"] for r in per_code):
+        print(f"[{exp}]   !! verify {code}：逐卡搜尋失敗，沿用 bulk")
+        return bulk_rows
+    only_bulk = print_set(bulk_rows) - print_set(per_code)
+    only_code = print_set(per_code) - print_set(bulk_rows)
+    if not only_bulk and not only_code:
+        return bulk_rows
+    for label, diff in (("只在逐卡", only_code), ("只在 bulk", only_bulk)):
+        for rarity, parallel, sell_url, buy_url in sorted(diff, key=str):
+            print(
+                f"[{exp}]   ≠ verify {code} {label}：{rarity}"
+                f"{'（パラレル）' if parallel else ''} {sell_url or buy_url or ''}"
+            )
+    return per_code
+
+
+def run_for_expansion(exp: str, resume: bool = False, verify: bool | None = None):
+    """verify 沒給就用 YUYU_BULK_VERIFY；只在 bulk 模式有作用。"""
     os.makedirs("data", exist_ok=True)
+    verify = BULK_VERIFY if verify is None else verify
 
     candidates = [
         f"data/{exp}_cards_v2.csv",
@@ -286,40 +403,97 @@ def run_for_expansion(exp: str):
         "error_message",
     ]
 
-    with open(output_csv, "w", newline="", encoding="utf-8") as f_out:
-        writer = csv.DictWriter(f_out, fieldnames=fieldnames)
-        writer.writeheader()
+    # 每張卡處理完就寫進 journal；最後才一次換掉舊的 CSV
+    journal, done = open_journal(f"{exp}_yuyutei", resume)
+    pending = [code for code in card_codes if code not in done]
+
+    bulk = fetch_yuyutei_bulk(exp) if FETCH_MODE == "bulk" and pending else None
+    verified = mismatched = 0
+
+    for idx, code in enumerate(card_codes, 1):
+        if code in done:
+            continue
 
-        for idx, code in enumerate(card_codes, 1):
+        known = {}
+        if bulk:
+            norm = _normalize_code(code)
+            for mode, by_code in zip(("sell", "buy"), bulk):
+                if by_code is not None and norm in by_code:
+                    known[mode] = [{"card_code": code, **r} for r in by_code[norm]]
+            if len(known) == 2:
+                print(f"[{exp}] [{idx}/{total}]  - {code}（bulk）")
+                rows = merge_sell_buy_rows(code, known["sell"], known["buy"])
+                if verify:
+                    checked = verify_bulk_rows(exp, code, rows)
+                    verified += 1
+                    mismatched += checked is not rows
+                    rows = checked
+                journal.append(code, rows)
+                done[code] = rows
+                continue
+
+        if known:
+            missing = "sell" if "buy" in known else "buy"
+            print(f"[{exp}] [{idx}/{total}]  - 抓取 {code}（bulk 沒有 {missing}，逐卡補抓）...")
+        else:
             print(f"[{exp}] [{idx}/{total}]  - 抓取 {code} ...")
-            try:
-                rows = fetch_yuyutei_for_code(code)
-                for row in rows:
-                    writer.writerow(row)
-            except Exception as e:
-                print(f"[{exp}]   !! 全卡錯誤：{e}")
-                writer.writerow(
-                    {
-                        "card_code": code,
-                        "rarity": None,
-                        "is_parallel_name": 0,
-                        "name_ja": None,
-                        "sell_price_jpy": None,
-                        "buy_price_jpy": None,
-                        "raw_sell_price_text": None,
-                        "raw_buy_price_text": None,
-                        "sell_url": None,
-                        "buy_url": None,
-                        "is_suspicious": 1,
-                        "error_message": f"fatal: {e}",
-                    }
-                )
-            time.sleep(SLEEP_BETWEEN_REQUESTS)
-
-    print(f"[{exp}] 完成，輸出：{output_csv}")
+        try:
+            rows = fetch_yuyutei_for_code(code, known)
+        except Exception as e:
+            print(f"[{exp}]   !! 全卡錯誤：{e}")
+            rows = [
+                {
+                    "card_code": code,
+                    "rarity": None,
+                    "is_parallel_name": 0,
+                    "name_ja": None,
+                    "sell_price_jpy": None,
+                    "buy_price_jpy": None,
+                    "raw_sell_price_text": None,
+                    "raw_buy_price_text": None,
+                    "sell_url": None,
+                    "buy_url": None,
+                    "is_suspicious": 1,
+                    "error_message": f"fatal: {e}",
+                }
+            ]
+            # 整張卡失敗不記進 journal，--resume 時會再試一次
+            done[code] = rows
+            continue
+        journal.append(code, rows)
+        done[code] = rows
+
+    if verified:
+        print(
+            f"[{exp}] verify：bulk 找到的 {verified} 張卡裡，{mismatched} 張跟逐卡搜尋不一致"
+            + ("（已改用逐卡結果）" if mismatched else "")
+        )
+
+    out_rows = [row for code in card_codes for row in done[code]]
+    summary = atomic_write_csv(output_csv, fieldnames, out_rows, key=csv_row_key)
+    journal.remove()
+    price_history.record(exp, out_rows)
+
+    print(f"[{exp}] 完成，輸出：{output_csv}（{format_summary(summary)}）")
+    return len(out_rows)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="YUYU 價格爬蟲")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=os.environ.get("HOCG_RESUME") == "1",
+        help="沿用上次中斷時的 journal，略過已完成的卡號",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        default=BULK_VERIFY,
+        help="bulk 模式：每張卡再逐卡搜尋一次，比對版本集合（不一致時用逐卡結果）",
+    )
+    args = parser.parse_args()
+
     raw = os.environ.get(
         "HOCG_EXPANSIONS",
         "HBP01",
@@ -333,8 +507,13 @@ def main():
 
     print("YUYU 價格爬蟲將處理系列：", ", ".join(expansions))
 
+    rows = {}
     for exp in expansions:
-        run_for_expansion(exp)
+        rows[exp] = run_for_expansion(exp, resume=args.resume, verify=args.verify)
+
+    parse_pool.shutdown()
+    rate_limiter.print_summary()
+    crawl_metrics.finish({"site": "yuyu", "rows": rows})
 
 
 if __name__ == "__main__":
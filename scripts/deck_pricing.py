@@ -0,0 +1,267 @@
+"""
+Decklog 牌組估價：所有 *_yuyutei_prices.csv 只讀一次，建成記憶體裡的價格索引，
+之後一次估幾千副牌組，每副只是幾十次 dict 查詢（微秒等級）。
+
+每副牌組算兩種總價，各有販售價（sell，買齊要花多少）與收購價（buy，賣掉拿多少）：
+  cheapest：每張卡都用販售價最便宜的版本
+  chosen  ：牌組指定的版本；沒指定或對不到就用普通版（非パラレル）裡最便宜的
+
+牌組 JSON 跟前端（main.js 的 buildDeckRequirementMap）接受的格式相同：
+  書籤 summary 版：{"main": {卡號: 張數}, "sub": {...}, "partner": {...}}
+  Decklog 原始版 ：{"list": [...], "sub_list": [...], "p_list": [...]}，
+                  每項的卡號是 card_number / card_code，張數是 num / _num / count；
+                  有 rarity / print_key 欄位時當成指定版本
+指定版本的別名跟 print_index 一樣：稀有度（不分大小寫）或 print_key（例如 hbp01/10124）。
+
+用法：
+  python scripts/deck_pricing.py deck.json [more.json ...]   # 每個檔案可以是一副牌組或牌組陣列
+  python scripts/deck_pricing.py --jsonl decks.jsonl --json out.json
+  python scripts/deck_pricing.py deck.json --repeat 10000      # 測速度
+"""
+import argparse
+import json
+import sys
+import time
+
+from build_bundle import load_prints_by_card
+from card_codes import normalize_card_code
+
+# 版本 tuple 的欄位（跟 build_bundle.PRINT_FIELDS 同順序）
+P_RARITY, P_PARALLEL, P_SELL, P_BUY, P_KEY = range(5)
+
+
+# ----------------- 牌組 JSON ----------------- #
+
+def _count(value) -> int:
+    if type(value) is int:
+        return value if value > 0 else 0
+    try:
+        n = float(value or 0)
+    except (TypeError, ValueError):
+        return 0
+    return int(n) if n > 0 else 0
+
+
+# 原始卡號 → 正規化卡號；同一批牌組裡卡號重複率很高
+_code_cache: dict[str, str] = {}
+
+
+def _normalize(code) -> str:
+    code = str(code or "")
+    norm = _code_cache.get(code)
+    if norm is None:
+        norm = _code_cache[code] = normalize_card_code(code)
+    return norm
+
+
+def deck_requirements(deck: dict) -> list[tuple[str, int, str]]:
+    """牌組 JSON → [(正規化卡號, 張數, 指定版本)]，同卡號同版本合併。"""
+    need: dict[tuple[str, str], int] = {}
+    if not isinstance(deck, dict):
+        return []
+
+    if deck.get("main") or deck.get("sub") or deck.get("partner"):
+        entries = [
+            (code, n, "")
+            for part in ("main", "sub", "partner")
+            for code, n in (deck.get(part) or {}).items()
+        ]
+    else:
+        entries = []
+        for part in ("list", "sub_list", "p_list"):
+            for item in deck.get(part) or []:
+                if not isinstance(item, dict):
+                    continue
+                n = item.get("num")
+                if n is None:
+                    n = item.get("_num")
+                if n is None:
+                    n = item.get("count")
+                hint = item.get("print_key") or item.get("rarity") or ""
+                entries.append((item.get("card_number") or item.get("card_code"), n, hint))
+
+    for code, n, hint in entries:
+        code = _normalize(code)
+        n = _count(n)
+        if code and n:
+            key = (code, str(hint).strip()) if hint else (code, "")
+            need[key] = need.get(key, 0) + n
+
+    return [(code, n, hint) for (code, hint), n in need.items()]
+
+
+def deck_name(deck: dict, default: str) -> str:
+    for key in ("title", "name", "deck_id", "id"):
+        if isinstance(deck, dict) and deck.get(key):
+            return str(deck[key])
+    return default
+
+
+# ----------------- 價格索引 ----------------- #
+
+class DeckPriceIndex:
+    """
+    card_code -> (cheapest, default, {別名: 版本})，版本是
+    (rarity, is_parallel_name, sell, buy, print_key) 的 tuple；
+    cheapest / default 事先算好，估價時不用再比價。
+    """
+
+    def __init__(self, prints_by_card: dict[str, list[list]]):
+        self.cards: dict[str, tuple] = {}
+        for code, prints in prints_by_card.items():
+            prints = [tuple(p) for p in prints]
+            priced = [p for p in prints if p[P_SELL] is not None]
+            cheapest = min(priced, key=lambda p: p[P_SELL]) if priced else None
+            normal = [p for p in priced if not p[P_PARALLEL]]
+            default = min(normal, key=lambda p: p[P_SELL]) if normal else cheapest
+
+            aliases: dict[str, tuple] = {}
+            # prints 已經是普通版在前：同一個稀有度有好幾版時別名指向普通版
+            for p in prints:
+                aliases.setdefault(p[P_RARITY].upper(), p)
+                aliases[p[P_KEY].lower()] = p
+            self.cards[code] = (cheapest, default, aliases)
+
+    @classmethod
+    def load(cls) -> "DeckPriceIndex":
+        return cls(load_prints_by_card())
+
+    def price(self, requirements: list[tuple[str, int, str]], detail: bool = False) -> dict:
+        cheapest_sell = cheapest_buy = chosen_sell = chosen_buy = 0
+        cards = 0
+        missing = []
+        unpriced = []
+        unmatched = []
+        lines = [] if detail else None
+
+        for code, n, hint in requirements:
+            cards += n
+            entry = self.cards.get(code)
+            if entry is None:
+                missing.append(code)
+                continue
+            cheapest, chosen, aliases = entry
+            if hint:
+                picked = aliases.get(hint.lower()) or aliases.get(hint.upper())
+                if picked is None:
+                    unmatched.append(code)
+                else:
+                    chosen = picked
+
+            if cheapest is not None:
+                cheapest_sell += n * cheapest[P_SELL]
+                cheapest_buy += n * (cheapest[P_BUY] or 0)
+            if chosen is not None and chosen[P_SELL] is not None:
+                chosen_sell += n * chosen[P_SELL]
+                chosen_buy += n * (chosen[P_BUY] or 0)
+            else:
+                unpriced.append(code)
+
+            if detail:
+                lines.append(
+                    {
+                        "card_code": code,
+                        "qty": n,
+                        "hint": hint,
+                        "cheapest": None if cheapest is None else cheapest[P_KEY],
+                        "chosen": None if chosen is None else chosen[P_KEY],
+                        "chosen_rarity": None if chosen is None else chosen[P_RARITY],
+                        "sell": None if chosen is None else chosen[P_SELL],
+                        "buy": None if chosen is None else chosen[P_BUY],
+                    }
+                )
+
+        result = {
+            "cards": cards,
+            "cheapest": {"sell": cheapest_sell, "buy": cheapest_buy},
+            "chosen": {"sell": chosen_sell, "buy": chosen_buy},
+            "missing": missing,
+            "unpriced": unpriced,
+            "unmatched_hints": unmatched,
+        }
+        if detail:
+            result["lines"] = lines
+        return result
+
+    def price_many(self, decks: list[dict], detail: bool = False) -> list[dict]:
+        """一次估多副牌組；回傳順序跟 decks 相同。"""
+        return [self.price(deck_requirements(deck), detail) for deck in decks]
+
+
+# ----------------- CLI ----------------- #
+
+def load_decks(paths: list[str], jsonl: list[str]) -> list[tuple[str, dict]]:
+    decks = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        items = data if isinstance(data, list) else [data]
+        for i, deck in enumerate(items, 1):
+            decks.append((deck_name(deck, path if len(items) == 1 else f"{path}#{i}"), deck))
+    for path in jsonl:
+        with open(path, encoding="utf-8") as f:
+            for i, line in enumerate(f, 1):
+                if line.strip():
+                    deck = json.loads(line)
+                    decks.append((deck_name(deck, f"{path}:{i}"), deck))
+    return decks
+
+
+def print_results(names: list[str], results: list[dict]):
+    print(f"{'牌組':<28}{'張數':>5}{'最便宜 sell':>13}{'buy':>9}{'指定版 sell':>13}{'buy':>9}")
+    for name, r in zip(names, results):
+        print(
+            f"{name[:28]:<28}{r['cards']:>5}"
+            f"{r['cheapest']['sell']:>13,}{r['cheapest']['buy']:>9,}"
+            f"{r['chosen']['sell']:>13,}{r['chosen']['buy']:>9,}"
+        )
+        if r["missing"]:
+            print(f"    ⚠ 找不到價格：{', '.join(r['missing'])}")
+        if r["unpriced"]:
+            print(f"    ⚠ 指定版本沒有販售價：{', '.join(r['unpriced'])}")
+        if r["unmatched_hints"]:
+            print(f"    ⚠ 指定的版本對不到，改用普通版：{', '.join(r['unmatched_hints'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decklog 牌組估價（YUYU 價格）")
+    parser.add_argument("decks", nargs="*", help="牌組 JSON（一副或陣列）")
+    parser.add_argument("--jsonl", action="append", default=[], help="一行一副牌組的 JSON lines")
+    parser.add_argument("--json", help="結果另存 JSON（含每張卡用了哪個版本）")
+    parser.add_argument("--repeat", type=int, default=1, help="整批重複估 N 次，測速度用")
+    args = parser.parse_args()
+
+    decks = load_decks(args.decks, args.jsonl)
+    if not decks:
+        parser.error("請給至少一個牌組 JSON")
+
+    started = time.perf_counter()
+    index = DeckPriceIndex.load()
+    load_seconds = time.perf_counter() - started
+    names = [name for name, _ in decks]
+    bodies = [deck for _, deck in decks]
+
+    started = time.perf_counter()
+    for _ in range(max(1, args.repeat)):
+        results = index.price_many(bodies)
+    elapsed = time.perf_counter() - started
+
+    print_results(names, results)
+    total = len(bodies) * max(1, args.repeat)
+    print(
+        f"\n{len(index.cards)} 張卡的價格索引（載入 {load_seconds * 1000:.0f} ms），"
+        f"估 {total} 副牌組 {elapsed * 1000:.1f} ms，平均 {elapsed / total * 1e6:.1f} µs / 副",
+        file=sys.stderr,
+    )
+
+    if args.json:
+        detailed = index.price_many(bodies, detail=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                [{"name": name, **r} for name, r in zip(names, detailed)],
+                f, ensure_ascii=False, indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+HTML 解析後端切換（HOCG_HTML_PARSER）：
+
+  bs4（預設）：BeautifulSoup + html.parser，整頁建樹
+  fast       ：BeautifulSoup + lxml，而且只建出需要的子樹
+
+fast 模式下，頁面上不符合任何規則的標籤都不會建成 Tag；
+符合規則的標籤底下整棵子樹照常保留，所以原本的 find / select 不用改。
+兩種後端產出的紀錄必須一模一樣，改動後請跑 scripts/bench_parsers.py 比對 golden；
+只有 bench/fixtures 是實際錄製的頁面（manifest 的 source=recorded）時，這個比對才算數。
+
+只建子樹要靠 bs4 4.13 起的 ElementFilter（requirements.txt 已固定 >=4.13）；
+版本太舊時 fast 只換成 lxml、整頁建樹，active_backend() 與匯入時的警告會講明。
+"""
+import os
+
+import bs4
+from bs4 import BeautifulSoup
+
+try:
+    from bs4.filter import ElementFilter
+except ImportError:  # bs4 < 4.13 沒有 ElementFilter，fast 模式就只換成 lxml
+    ElementFilter = None
+
+PARSER = os.environ.get("HOCG_HTML_PARSER", "bs4").strip().lower()
+
+
+class TagRule:
+    """標籤名稱 + 必須有的 class + 屬性條件（例如 src 包含某字串）。"""
+
+    def __init__(self, name: str, classes=(), attr_contains: dict | None = None):
+        self.name = name
+        self.classes = set(classes)
+        self.attr_contains = attr_contains or {}
+
+    def matches(self, name: str, attrs) -> bool:
+        if name != self.name:
+            return False
+        attrs = attrs or {}
+        if self.classes:
+            value = attrs.get("class") or ""
+            tag_classes = set(value.split() if isinstance(value, str) else value)
+            if not self.classes <= tag_classes:
+                return False
+        for key, needle in self.attr_contains.items():
+            if needle not in (attrs.get(key) or ""):
+                return False
+        return True
+
+
+if ElementFilter is not None:
+
+    class SubtreeStrainer(ElementFilter):
+        """只讓符合規則的最外層標籤（連同子樹）進到解析樹。"""
+
+        def __init__(self, rules: list[TagRule]):
+            self.rules = rules
+
+        def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+            return any(rule.matches(name, attrs) for rule in self.rules)
+
+        def allow_string_creation(self, string) -> bool:
+            return False
+
+else:
+    SubtreeStrainer = None
+
+
+def active_backend() -> str:
+    """目前實際使用的解析方式，給 log / 報告用。"""
+    if PARSER != "fast":
+        return "bs4（html.parser，整頁建樹）"
+    if SubtreeStrainer is None:
+        return f"fast（lxml，整頁建樹：bs4 {bs4.__version__} 沒有 ElementFilter）"
+    return "fast（lxml + SubtreeStrainer，只建需要的子樹）"
+
+
+if PARSER == "fast" and SubtreeStrainer is None:
+    print(f"⚠ HOCG_HTML_PARSER=fast，但 bs4 {bs4.__version__} < 4.13：只換成 lxml，不會只建子樹")
+
+
+def make_soup(markup, rules: list[TagRule] | None = None):
+    if PARSER != "fast":
+        return BeautifulSoup(markup, "html.parser")
+    if rules and SubtreeStrainer is not None:
+        return BeautifulSoup(markup, "lxml", parse_only=SubtreeStrainer(rules))
+    return BeautifulSoup(markup, "lxml")
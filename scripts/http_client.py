@@ -0,0 +1,213 @@
+"""
+三支腳本共用的 HTTP client：
+
+  - 每個 host 一個 requests.Session（連線池 + HTTP keep-alive）
+  - gzip / br 壓縮協商（br 需要裝了 brotli 才會宣告）
+  - 429 / 5xx / 連線錯誤時，用加 jitter 的指數退避重試，並遵守 Retry-After；
+    預設只重試冪等的 method（GET / PUT / DELETE ...），POST 要呼叫端確定
+    重送不會重複寫入（例如 on_conflict upsert）才傳 retries
+  - 每個 host 的最大連線數可以設定（HTTP_MAX_CONN_PER_HOST 或 set_host_limit）
+  - 每個站台同時進行的請求數上限（set_site_budget）：整個 process 共用一個 semaphore，
+    不管幾個系列 / thread 同時在跑，送出中的請求都不會超過這個數；重試前的等待不佔名額
+  - 送出前經過 rate_limiter 的 per-host 自適應限速
+  - GET 可以走 response_cache 的磁碟快取 / 離線重播（HTTP_CACHE / HTTP_OFFLINE）；
+    每次都要讀到最新狀態的呼叫（例如 Supabase）傳 cache=False
+  - 每次嘗試的延遲、狀態碼、bytes、重試與等待時間都記進 crawl_metrics
+"""
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import crawl_metrics
+import rate_limiter
+import response_cache
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/123.0.0.0 Safari/537.36"
+)
+
+DEFAULT_TIMEOUT = 15
+MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", "60"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 重送不會多做一次事的 method；其他 method 預設不重試
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+DEFAULT_HOST_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONN_PER_HOST", "4"))
+# host -> 最大連線數；要在該 host 第一次連線前設定才有效
+HOST_CONNECTION_LIMITS: dict[str, int] = {}
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# host -> 同時進行的請求數上限；沒設定的 host 不限制
+_site_budgets: dict[str, threading.BoundedSemaphore] = {}
+_site_budgets_lock = threading.Lock()
+
+
+def _accept_encoding() -> str:
+    # urllib3 只有在裝了 brotli / brotlicffi 時才會解 br
+    for mod in ("brotli", "brotlicffi"):
+        try:
+            __import__(mod)
+            return "gzip, deflate, br"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+
+def set_host_limit(host: str, max_connections: int):
+    HOST_CONNECTION_LIMITS[host] = max(1, int(max_connections))
+
+
+def set_site_budget(host: str, max_in_flight: int):
+    """要在該 host 第一次請求前設定；之後再設定會換成新的 semaphore。"""
+    with _site_budgets_lock:
+        _site_budgets[host] = threading.BoundedSemaphore(max(1, int(max_in_flight)))
+
+
+def get_site_budget(url: str) -> threading.BoundedSemaphore | None:
+    with _site_budgets_lock:
+        return _site_budgets.get(urlsplit(url).netloc)
+
+
+def get_session(url: str) -> requests.Session:
+    """取得該 URL 所屬 host 的共用 Session。"""
+    parts = urlsplit(url)
+    host = parts.netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            limit = HOST_CONNECTION_LIMITS.get(host, DEFAULT_HOST_CONNECTIONS)
+            # pool_block=True：超過連線上限時排隊等，而不是另開連線
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=limit, pool_block=True
+            )
+            session = requests.Session()
+            session.mount(f"{parts.scheme}://{host}", adapter)
+            session.headers.update(
+                {
+                    "User-Agent": USER_AGENT,
+                    "Accept-Encoding": _accept_encoding(),
+                    "Connection": "keep-alive",
+                }
+            )
+            _sessions[host] = session
+    return session
+
+
+def retry_after_seconds(resp) -> float | None:
+    """解析 Retry-After（秒數或 HTTP 日期），沒有就回傳 None。"""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """第 attempt 次（從 0 開始）重試前要等幾秒：full jitter 指數退避。"""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    params=None,
+    headers=None,
+    json=None,
+    timeout=DEFAULT_TIMEOUT,
+    retries: int | None = None,
+    raise_for_status: bool = True,
+    cache: bool = True,
+):
+    """
+    retries 沒給時：冪等的 method 重試 HTTP_MAX_RETRIES 次，其他不重試。
+    cache=False：不讀也不寫 response_cache，HTTP_OFFLINE 時照樣送出請求。
+    """
+    if retries is None:
+        retries = MAX_RETRIES if method.upper() in IDEMPOTENT_METHODS else 0
+    use_cache = cache and method == "GET" and response_cache.ENABLED
+    if use_cache:
+        cached = response_cache.lookup(url, params)
+        if cached is not None:
+            crawl_metrics.record_cache_hit(url)
+            return cached
+        if response_cache.OFFLINE:
+            raise response_cache.CacheMiss(f"離線模式，快取裡沒有：{url}")
+
+    session = get_session(url)
+    limiter = rate_limiter.get_limiter(url)
+    budget = get_site_budget(url)
+
+    for attempt in range(retries + 1):
+        queued = time.monotonic()
+        try:
+            # 站台名額只在送出與讀回應時佔用，重試前的等待會先放掉
+            with budget or nullcontext():
+                if limiter:
+                    limiter.acquire()
+                crawl_metrics.record_wait(url, "throttle", time.monotonic() - queued)
+                started = time.monotonic()
+                resp = session.request(
+                    method, url, params=params, headers=headers, json=json, timeout=timeout
+                )
+                resp.content  # body 也在名額內讀完
+        except (requests.ConnectionError, requests.Timeout) as e:
+            latency = time.monotonic() - started
+            if limiter:
+                limiter.record(None, latency)
+            crawl_metrics.record_attempt(method, url, None, latency, attempt=attempt, error=repr(e))
+            if attempt >= retries:
+                raise
+            wait = backoff_delay(attempt)
+            print(f"    !! HTTP 失敗，{wait:.1f} 秒後重試（{attempt + 1}/{retries}）: {e}")
+            time.sleep(wait)
+            crawl_metrics.record_wait(url, "backoff", wait)
+            continue
+
+        latency = time.monotonic() - started
+        retry_after = retry_after_seconds(resp)
+        if limiter:
+            limiter.record(resp.status_code, latency, retry_after)
+        crawl_metrics.record_attempt(
+            method, url, resp.status_code, latency, len(resp.content), attempt=attempt
+        )
+
+        if resp.status_code in RETRY_STATUSES and attempt < retries:
+            wait = backoff_delay(attempt, retry_after)
+            print(
+                f"    !! HTTP {resp.status_code}，{wait:.1f} 秒後重試"
+                f"（{attempt + 1}/{retries}）: {url}"
+            )
+            time.sleep(wait)
+            crawl_metrics.record_wait(url, "backoff", wait)
+            continue
+
+        if raise_for_status:
+            resp.raise_for_status()
+        if use_cache:
+            response_cache.store(url, params, resp)
+        return resp
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
@@ -0,0 +1,274 @@
+"""
+把 *_cards_v2.csv 裡的官網卡圖鏡像到本機，前端改讀小張的縮圖。
+
+  - 多條 thread 同時下載（共用 http_client 的連線池與限速），
+    帶 If-None-Match / If-Modified-Since，304 就跳過
+  - 原圖依 sha256 存放（images/orig/ab/<sha256>.png），內容相同只存一份；
+    原圖只是本機工作檔（.gitignore），要發佈的是縮圖與 manifest
+  - 縮圖（WebP，寬度 HOCG_THUMB_SIZES）在 process pool 裡產生；
+    縮圖也以 sha256 命名，已經存在就不重做。Pillow 在 requirements.txt 裡；
+    本機沒裝的話就只鏡像原圖
+  - images/manifest.json：image_url → 原圖、縮圖路徑與 ETag 等資訊，
+    main.js 會用它把 image_url 換成本機縮圖
+
+每晚的 crawl_hocg workflow 在爬完官網後跑 --only-new，把縮圖與 manifest commit 回來。
+
+用法：
+  python scripts/mirror_images.py              # 全部重新驗證（沒變的會是 304）
+  python scripts/mirror_images.py --only-new   # 已經在 manifest 裡的不連線
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import http_client
+
+try:
+    from PIL import Image
+except ImportError:  # 本機沒裝 Pillow 就不做縮圖（CI 依 requirements.txt 會裝）
+    Image = None
+
+IMAGE_DIR = os.environ.get("HOCG_IMAGE_DIR", "images")
+MANIFEST_PATH = os.path.join(IMAGE_DIR, "manifest.json")
+DOWNLOAD_WORKERS = int(os.environ.get("HOCG_IMAGE_WORKERS", "4"))
+THUMB_WORKERS = int(os.environ.get("HOCG_THUMB_WORKERS", str(os.cpu_count() or 1)))
+THUMB_SIZES = [
+    int(s) for s in os.environ.get("HOCG_THUMB_SIZES", "160,320").split(",") if s.strip()
+]
+THUMB_QUALITY = 80
+
+MANIFEST_VERSION = 1
+
+
+# ----------------- 共用小工具 ----------------- #
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def original_path(digest: str, ext: str) -> str:
+    return os.path.join(IMAGE_DIR, "orig", digest[:2], f"{digest}{ext}")
+
+
+def thumb_path(digest: str, width: int) -> str:
+    return os.path.join(IMAGE_DIR, "thumb", str(width), digest[:2], f"{digest}.webp")
+
+
+def _web_path(path: str) -> str:
+    """manifest 裡的路徑一律用 /，前端直接拿來當相對 URL。"""
+    return path.replace(os.sep, "/")
+
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "sizes": THUMB_SIZES, "images": {}}
+    manifest["sizes"] = THUMB_SIZES
+    return manifest
+
+
+def save_manifest(manifest: dict):
+    data = json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True) + "\n"
+    _atomic_write(MANIFEST_PATH, data.encode("utf-8"))
+
+
+def has_local_copy(entry: dict | None) -> bool:
+    """原圖還在，或所有尺寸的縮圖都在（原圖不進 git，CI 上通常只有縮圖）。"""
+    if not entry:
+        return False
+    if os.path.exists(entry["original"]):
+        return True
+    thumbs = entry.get("thumbs") or {}
+    return all(os.path.exists(thumbs.get(str(w), "")) for w in THUMB_SIZES)
+
+
+def collect_image_urls() -> list[str]:
+    urls = set()
+    for path in sorted(glob.glob("data/*_cards_v2.csv")):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                url = (row.get("image_url") or "").strip()
+                if url:
+                    urls.add(url)
+    return sorted(urls)
+
+
+# ----------------- 下載 ----------------- #
+
+def download(url: str, entry: dict | None) -> tuple[str, dict | None]:
+    """
+    回傳 (狀態, 新的 manifest 項目)：
+      unchanged：304，或內容 sha256 跟上次一樣
+      stored   ：新內容，已寫入 orig/
+      error    ：連線或 HTTP 錯誤（沿用舊的項目）
+    """
+    headers = {}
+    if has_local_copy(entry):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        resp = http_client.get(url, headers=headers, raise_for_status=False)
+    except Exception as e:
+        print(f"   ❌ {url}：{e}")
+        return "error", entry
+
+    if resp.status_code == 304 and entry:
+        return "unchanged", entry
+    if resp.status_code != 200:
+        print(f"   ❌ {url}：HTTP {resp.status_code}")
+        return "error", entry
+
+    body = resp.content
+    digest = hashlib.sha256(body).hexdigest()
+    ext = os.path.splitext(url.split("?")[0])[1].lower() or ".png"
+    path = original_path(digest, ext)
+    if not os.path.exists(path):
+        _atomic_write(path, body)
+
+    same = bool(entry) and entry.get("sha256") == digest
+    new_entry = {
+        "sha256": digest,
+        "original": _web_path(path),
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "bytes": len(body),
+        "thumbs": entry.get("thumbs", {}) if same else {},
+    }
+    return ("unchanged" if same else "stored"), new_entry
+
+
+# ----------------- 縮圖（process pool） ----------------- #
+
+def make_thumbnails(src: str, digest: str, sizes: list[int]) -> dict[str, str]:
+    """在子 process 裡執行；回傳 {寬度: 路徑}。"""
+    out = {}
+    with Image.open(src) as im:
+        im.load()
+        for width in sizes:
+            dest = thumb_path(digest, width)
+            if not os.path.exists(dest):
+                height = max(1, round(im.height * width / im.width))
+                thumb = im.convert("RGBA").resize((width, height), Image.LANCZOS)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix=".tmp")
+                os.close(fd)
+                thumb.save(tmp, "WEBP", quality=THUMB_QUALITY, method=6)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, dest)
+            out[str(width)] = _web_path(dest)
+    return out
+
+
+def build_thumbnails(manifest: dict) -> int:
+    if Image is None:
+        print("⚠ 沒有安裝 Pillow，略過縮圖（pip install Pillow）")
+        return 0
+
+    # 同一份內容只做一次
+    todo: dict[str, list[str]] = {}
+    for url, entry in manifest["images"].items():
+        thumbs = entry.get("thumbs") or {}
+        missing = [
+            w for w in THUMB_SIZES
+            if str(w) not in thumbs or not os.path.exists(thumbs[str(w)])
+        ]
+        if missing:
+            todo.setdefault(entry["sha256"], []).append(url)
+    if not todo:
+        return 0
+
+    made = 0
+    with ProcessPoolExecutor(max_workers=max(1, THUMB_WORKERS)) as pool:
+        futures = {}
+        for digest, urls in todo.items():
+            src = manifest["images"][urls[0]]["original"]
+            futures[pool.submit(make_thumbnails, src, digest, THUMB_SIZES)] = urls
+        for future in as_completed(futures):
+            urls = futures[future]
+            try:
+                thumbs = future.result()
+            except Exception as e:
+                print(f"   ❌ 縮圖失敗 {urls[0]}：{e}")
+                continue
+            for url in urls:
+                manifest["images"][url]["thumbs"] = thumbs
+            made += 1
+    return made
+
+
+# ----------------- 主流程 ----------------- #
+
+def mirror(only_new: bool = False) -> dict:
+    manifest = load_manifest()
+    images = manifest["images"]
+    urls = collect_image_urls()
+
+    targets = []
+    for url in urls:
+        entry = images.get(url)
+        if only_new and has_local_copy(entry):
+            continue
+        targets.append(url)
+
+    stats = {"total": len(urls), "checked": len(targets), "stored": 0, "unchanged": 0, "error": 0}
+    print(f"共有 {len(urls)} 張卡圖，這次檢查 {len(targets)} 張")
+
+    with ThreadPoolExecutor(DOWNLOAD_WORKERS, thread_name_prefix="image") as pool:
+        futures = {pool.submit(download, url, images.get(url)): url for url in targets}
+        for i, future in enumerate(as_completed(futures), 1):
+            url = futures[future]
+            status, entry = future.result()
+            stats[status] += 1
+            if entry:
+                images[url] = entry
+            if i % 100 == 0:
+                # 中途存一次，當掉也不用全部重抓
+                save_manifest(manifest)
+                print(f"   ... {i}/{len(targets)}")
+
+    # CSV 已經沒有的圖從 manifest 拿掉（檔案留著，可能還有別的 URL 指到同一份內容）
+    wanted = set(urls)
+    for url in list(images):
+        if url not in wanted:
+            del images[url]
+
+    stats["thumbnails"] = build_thumbnails(manifest)
+    stats["unique"] = len({entry["sha256"] for entry in images.values()})
+    save_manifest(manifest)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="官網卡圖鏡像 + 縮圖")
+    parser.add_argument(
+        "--only-new", action="store_true", help="manifest 裡已經有的圖不再連線驗證"
+    )
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    stats = mirror(only_new=args.only_new)
+    print(
+        f"✅ 完成：新內容 {stats['stored']}、沒變 {stats['unchanged']}、錯誤 {stats['error']}；"
+        f"{stats['unique']} 份不重複的圖，新做縮圖 {stats['thumbnails']} 份"
+        f"（{time.monotonic() - started:.1f}s）"
+    )
+
+
+if __name__ == "__main__":
+    main()
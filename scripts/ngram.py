@@ -0,0 +1,33 @@
+"""
+日文搜尋用的 n-gram 小工具（前端 bundle 的索引與 card_search 共用）。
+
+日文沒有空白斷詞，所以直接切字元 n-gram：
+  normalize_text：NFKC（全形英數 → 半形、半形片假名 → 全形）+ 小寫 + 去掉空白
+  ngrams        ：切出長度 n 的片段；字串比 n 短時整串當一個 gram
+"""
+import re
+import unicodedata
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _SPACE_RE.sub("", text)
+
+
+def ngrams(text: str, n: int) -> list[str]:
+    """text 要先 normalize；回傳依出現順序的 gram（可能重複）。"""
+    if not text:
+        return []
+    if len(text) <= n:
+        return [text]
+    return [text[i : i + n] for i in range(len(text) - n + 1)]
+
+
+def gram_set(text: str, sizes=(2,)) -> set[str]:
+    norm = normalize_text(text)
+    out: set[str] = set()
+    for n in sizes:
+        out.update(ngrams(norm, n))
+    return out
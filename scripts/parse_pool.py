@@ -0,0 +1,80 @@
+"""
+把 HTML 解析（BeautifulSoup，吃 CPU）從抓取流程移到 process pool。
+
+HOCG_PARSE_WORKERS=N（N > 0）時，submit() 會把解析丟給共用的
+ProcessPoolExecutor，抓取的 thread 可以馬上去抓下一頁；
+N = 0（預設）時直接在目前的 thread 解析，回傳已完成的 Future，
+呼叫端不用分兩種寫法。
+
+丟進來的函式與參數都要能 pickle（模組層級函式 + bytes / str）。
+
+解析時間在執行解析的地方量（worker process 裡），結果回到主程序後
+才記進 crawl_metrics，所以開不開 process pool 統計都一樣。
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import crawl_metrics
+
+PARSE_WORKERS = int(os.environ.get("HOCG_PARSE_WORKERS", "0"))
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor | None:
+    global _pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+    return _pool
+
+
+def _timed_call(fn, args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _page_size(args) -> int:
+    return len(args[0]) if args and isinstance(args[0], (bytes, str)) else 0
+
+
+def submit(fn, *args) -> Future:
+    kind = getattr(fn, "__name__", str(fn))
+    future = Future()
+
+    pool = get_pool()
+    if pool is not None:
+        def _done(inner: Future):
+            try:
+                result, seconds = inner.result()
+            except Exception as e:
+                future.set_exception(e)
+                return
+            crawl_metrics.record_parse(kind, seconds, _page_size(args))
+            future.set_result(result)
+
+        pool.submit(_timed_call, fn, args).add_done_callback(_done)
+        return future
+
+    try:
+        result, seconds = _timed_call(fn, args)
+    except Exception as e:
+        future.set_exception(e)
+        return future
+    crawl_metrics.record_parse(kind, seconds, _page_size(args))
+    future.set_result(result)
+    return future
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
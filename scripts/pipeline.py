@@ -0,0 +1,46 @@
+"""
+串流式的抓取流程用的小工具：每一段都是 generator，
+段與段之間用有上限的視窗（bounded queue）接起來。
+
+  ordered_map：依輸入順序 yield (item, fn(item))，同時處理中的最多 buffer 個，
+               下游還沒消化時上游就停下來等（背壓），記憶體不會隨系列大小成長。
+               fn 回傳 parse_pool 的 Future 時，會等解析完成再 yield，
+               所以抓取與解析還是重疊的。
+
+HOCG_PIPELINE_BUFFER 可以調整視窗大小（預設 32）。
+"""
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+PIPELINE_BUFFER = int(os.environ.get("HOCG_PIPELINE_BUFFER", "32"))
+
+
+def _resolve(item):
+    if isinstance(item, Future):
+        item = item.result()
+    if isinstance(item, Future):
+        item = item.result()
+    return item
+
+
+def ordered_map(fn, items, workers: int = 1, buffer: int = PIPELINE_BUFFER):
+    """
+    workers <= 1 時在目前的 thread 呼叫 fn（回傳的 Future 一樣先排著）；
+    否則交給 workers 個 thread。items 可以是 generator，會邊消化邊往前拉。
+    """
+    buffer = max(1, buffer)
+    pending: deque = deque()
+    executor = ThreadPoolExecutor(workers, thread_name_prefix="pipeline") if workers > 1 else None
+    try:
+        for item in items:
+            pending.append((item, executor.submit(fn, item) if executor else fn(item)))
+            while len(pending) >= buffer:
+                item, result = pending.popleft()
+                yield item, _resolve(result)
+        while pending:
+            item, result = pending.popleft()
+            yield item, _resolve(result)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
@@ -0,0 +1,325 @@
+"""
+YUYU 價格的 append-only 歷史紀錄（每個系列一個檔案，data/price_history/{exp}.hph）。
+
+每次 crawl_yuyutei_prices.run_for_expansion 跑完都會呼叫 record()，
+只把 sell_price_jpy / buy_price_jpy 有變動的 (card_code, rarity, is_parallel_name)
+寫進去；CSV 裡消失的 key 寫一筆 tombstone。搜尋失敗的卡號整張略過，
+不會被當成「價格變成空白」。
+
+檔案格式（little endian）：
+  b"HPH1"
+  之後是一連串 record：1 byte 種類 + uint32 長度 + 內容
+    K：新 key，內容是 "card_code\\trarity\\tis_parallel_name"（UTF-8），
+       key id 依出現順序從 0 開始
+    F：一次爬蟲的變動，int64 時間戳（秒）+ N 組 (uint32 key id, int32 sell, int32 buy)
+       價格 -1 = 沒有價格，sell / buy 都是 -2 = 這個 key 已經不在清單上
+  每次追加都一次寫完再 fsync；最後一筆寫到一半（當機）讀的時候會忽略，
+  下次追加前會先截掉。
+
+用法：
+  python scripts/price_history.py series HBP01 hBP01-001 OSR 0
+  python scripts/price_history.py snapshot HBP01 [--at 2026-01-31T00:00]
+  python scripts/price_history.py backfill HBP01     # 從 git 歷史補建
+系列名稱跟爬蟲一樣先正規化（HBP01 / hbp01 都是 hBP01.hph）。
+"""
+import argparse
+import bisect
+import csv
+import io
+import os
+import struct
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from card_codes import normalize_expansion
+
+HISTORY_DIR = os.environ.get("YUYU_HISTORY_DIR", "data/price_history")
+ENABLED = os.environ.get("YUYU_PRICE_HISTORY", "1") != "0"
+
+MAGIC = b"HPH1"
+_RECORD_HEAD = struct.Struct("<cI")
+_FRAME_HEAD = struct.Struct("<q")
+_ENTRY = struct.Struct("<Iii")
+
+NO_PRICE = -1
+TOMBSTONE = -2
+
+# error_message 有這些字樣代表整張卡搜尋失敗，資料不可信
+FAILED_MARKERS = ("fatal:", "search error")
+
+
+def history_path(exp: str) -> str:
+    return os.path.join(HISTORY_DIR, f"{exp}.hph")
+
+
+def _price(value) -> int:
+    if value is None or value == "":
+        return NO_PRICE
+    return int(value)
+
+
+def _unprice(value: int):
+    return None if value == NO_PRICE else value
+
+
+def row_key(row: dict) -> tuple[str, str, int]:
+    return (row["card_code"], row["rarity"] or "", int(row["is_parallel_name"] or 0))
+
+
+class PriceHistory:
+    """讀進記憶體後的歷史：每個 key 一條依時間排序的 (ts, sell, buy)。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.keys: list[tuple[str, str, int]] = []
+        self.key_ids: dict[tuple[str, str, int], int] = {}
+        self.frame_times: list[int] = []
+        self._times: list[list[int]] = []     # key id -> 時間戳
+        self._values: list[list[tuple]] = []  # key id -> (sell, buy)
+        self._good_size = 0
+        self._load()
+
+    # ----------------- 讀檔 ----------------- #
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} 不是價格歷史檔")
+
+        pos = len(MAGIC)
+        while pos + _RECORD_HEAD.size <= len(data):
+            kind, length = _RECORD_HEAD.unpack_from(data, pos)
+            start = pos + _RECORD_HEAD.size
+            if start + length > len(data):
+                break  # 寫到一半的最後一筆
+            payload = data[start : start + length]
+            if kind == b"K":
+                self._add_key(payload.decode("utf-8"))
+            elif kind == b"F":
+                self._add_frame(payload)
+            pos = start + length
+        self._good_size = pos
+
+    def _add_key(self, text: str):
+        code, rarity, parallel = text.split("\t")
+        key = (code, rarity, int(parallel))
+        self.key_ids[key] = len(self.keys)
+        self.keys.append(key)
+        self._times.append([])
+        self._values.append([])
+
+    def _add_frame(self, payload: bytes):
+        (ts,) = _FRAME_HEAD.unpack_from(payload, 0)
+        self.frame_times.append(ts)
+        for kid, sell, buy in _ENTRY.iter_unpack(payload[_FRAME_HEAD.size :]):
+            self._times[kid].append(ts)
+            self._values[kid].append((sell, buy))
+
+    # ----------------- 查詢 ----------------- #
+
+    def series(self, key: tuple[str, str, int]) -> list[tuple[int, int | None, int | None]]:
+        """某個 key 每次變動的 (時間戳, sell, buy)；下架的那一筆 sell / buy 都是 None。"""
+        kid = self.key_ids.get(key)
+        if kid is None:
+            return []
+        out = []
+        for ts, (sell, buy) in zip(self._times[kid], self._values[kid]):
+            if sell == TOMBSTONE:
+                out.append((ts, None, None))
+            else:
+                out.append((ts, _unprice(sell), _unprice(buy)))
+        return out
+
+    def snapshot(self, at: int | None = None) -> dict[tuple[str, str, int], tuple]:
+        """at 這個時間點（含）每個 key 的 (sell, buy)；at=None 就是最新狀態。"""
+        out = {}
+        for kid, key in enumerate(self.keys):
+            times = self._times[kid]
+            idx = len(times) if at is None else bisect.bisect_right(times, at)
+            if idx == 0:
+                continue
+            sell, buy = self._values[kid][idx - 1]
+            if sell != TOMBSTONE:
+                out[key] = (_unprice(sell), _unprice(buy))
+        return out
+
+    def _latest_raw(self) -> dict[int, tuple[int, int]]:
+        return {
+            kid: values[-1]
+            for kid, values in enumerate(self._values)
+            if values and values[-1][0] != TOMBSTONE
+        }
+
+    # ----------------- 追加 ----------------- #
+
+    def append(self, rows: list[dict], ts: int | None = None) -> int:
+        """把這次爬到的 rows 跟最新狀態比對，只追加有變動的部分；回傳變動筆數。"""
+        ts = int(time.time()) if ts is None else int(ts)
+        if self.frame_times and ts < self.frame_times[-1]:
+            raise ValueError(f"時間戳 {ts} 比最後一筆 {self.frame_times[-1]} 還早")
+
+        failed_codes = set()
+        current: dict[tuple[str, str, int], tuple[int, int]] = {}
+        for row in rows:
+            error = row.get("error_message") or ""
+            if any(marker in error for marker in FAILED_MARKERS):
+                failed_codes.add(row["card_code"])
+                continue
+            if not row.get("rarity"):
+                continue  # 這張卡在 YUYU 上沒有任何商品
+            current[row_key(row)] = (
+                _price(row.get("sell_price_jpy")),
+                _price(row.get("buy_price_jpy")),
+            )
+
+        latest = self._latest_raw()
+        new_keys: list[tuple[str, str, int]] = []
+        entries: list[tuple[int, int, int]] = []
+
+        for key, prices in current.items():
+            kid = self.key_ids.get(key)
+            if kid is None:
+                kid = len(self.keys) + len(new_keys)
+                new_keys.append(key)
+            elif latest.get(kid) == prices:
+                continue
+            entries.append((kid, *prices))
+
+        for kid in latest:
+            key = self.keys[kid]
+            if key not in current and key[0] not in failed_codes:
+                entries.append((kid, TOMBSTONE, TOMBSTONE))
+
+        if not entries:
+            return 0
+
+        buf = io.BytesIO()
+        for key in new_keys:
+            text = "\t".join(str(part) for part in key).encode("utf-8")
+            buf.write(_RECORD_HEAD.pack(b"K", len(text)) + text)
+        payload = _FRAME_HEAD.pack(ts) + b"".join(_ENTRY.pack(*e) for e in entries)
+        buf.write(_RECORD_HEAD.pack(b"F", len(payload)) + payload)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            if f.tell() == 0:
+                f.write(MAGIC)
+                self._good_size = len(MAGIC)
+            elif f.tell() != self._good_size:
+                f.truncate(self._good_size)
+            f.write(buf.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+        self._good_size += len(buf.getvalue())
+
+        for key in new_keys:
+            self._add_key("\t".join(str(part) for part in key))
+        self._add_frame(payload)
+        return len(entries)
+
+
+def load(exp: str) -> PriceHistory:
+    return PriceHistory(history_path(exp))
+
+
+def record(exp: str, rows: list[dict], ts: int | None = None) -> int:
+    """crawl_yuyutei_prices 每跑完一個系列呼叫一次。"""
+    if not ENABLED:
+        return 0
+    changed = load(exp).append(rows, ts)
+    print(f"[{exp}] 價格歷史：{changed} 個 key 有變動")
+    return changed
+
+
+# ----------------- CLI ----------------- #
+
+def _parse_time(text: str) -> int:
+    dt = datetime.fromisoformat(text)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _fmt_time(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def backfill(exp: str):
+    """
+    把 git 裡 data/{exp}_yuyutei_prices.csv 的每個版本依 commit 順序補進空的歷史檔。
+
+    commit 時間不一定遞增（rebase、cherry-pick、時鐘不準），順序以 git log 為準：
+    比前一版還早的時間戳會拉到前一版的時間，讓 append 的時間順序檢查成立。
+    """
+    history = load(exp)
+    if history.frame_times:
+        print(f"{history.path} 已經有資料，不做補建")
+        return
+    csv_path = f"data/{exp}_yuyutei_prices.csv"
+    log = subprocess.run(
+        ["git", "log", "--reverse", "--format=%H %ct", "--", csv_path],
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    last_ts = None
+    for commit, raw_ts in zip(log[::2], log[1::2]):
+        ts = int(raw_ts)
+        note = ""
+        if last_ts is not None and ts < last_ts:
+            note = f"（commit 時間 {_fmt_time(ts)} 比前一版早，改用 {_fmt_time(last_ts)}）"
+            ts = last_ts
+        last_ts = ts
+        text = subprocess.run(
+            ["git", "show", f"{commit}:{csv_path}"],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        changed = history.append(list(csv.DictReader(io.StringIO(text))), ts)
+        print(f"   {commit[:8]} {_fmt_time(ts)}：{changed} 個 key 有變動{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="YUYU 價格歷史查詢")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("series", help="某張卡某個版本的價格變化")
+    p.add_argument("exp")
+    p.add_argument("card_code")
+    p.add_argument("rarity")
+    p.add_argument("is_parallel_name", type=int, nargs="?", default=0)
+
+    p = sub.add_parser("snapshot", help="某個時間點整個系列的價格")
+    p.add_argument("exp")
+    p.add_argument("--at", help="ISO 時間，例如 2026-01-31T00:00（UTC）")
+
+    p = sub.add_parser("backfill", help="從 git 歷史補建")
+    p.add_argument("exp")
+
+    args = parser.parse_args()
+    exp = normalize_expansion(args.exp)
+    if not exp:
+        parser.error(f"系列名稱不正確：{args.exp!r}")
+
+    if args.command == "backfill":
+        backfill(exp)
+        return
+
+    history = load(exp)
+    if args.command == "series":
+        key = (args.card_code, args.rarity, args.is_parallel_name)
+        for ts, sell, buy in history.series(key):
+            print(f"{_fmt_time(ts)}  sell={sell}  buy={buy}")
+        return
+
+    at = _parse_time(args.at) if args.at else None
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["card_code", "rarity", "is_parallel_name", "sell_price_jpy", "buy_price_jpy"])
+    for key, (sell, buy) in sorted(history.snapshot(at).items()):
+        writer.writerow([*key, sell, buy])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+本機的「版本（print）」對照表：上傳前就把每筆 lot 的 print_hint 對到唯一的版本，
+不用等伺服器那邊 join 完才知道哪些對不到。
+
+版本的識別（print_key）用 YUYU 商品頁的路徑，例如 hbp01/10124
+（https://yuyu-tei.jp/sell/hocg/card/hbp01/10124）。同一張卡出現在好幾個系列的
+價格 CSV 裡時，路徑相同就視為同一個版本。
+
+查表的 key：
+  (card_code, rarity, is_parallel_name)  → print_key（精確）
+  (card_code, 別名)                      → print_key 清單
+
+rarity 欄位：當成別名（不分大小寫），普通版與パラレル都算候選。
+非數字的 print_hint：只認兩種，其他一律當成對不到
+  - print_key 本身（hbp01/10124）
+  - HINT_VARIANTS 明列的提示（C、P、C+P ...），各自對到一個 (rarity, is_parallel_name)，
+    用精確查表找版本；rarity 欄位有填又跟提示的 rarity 不同時也當成對不到
+純數字的 print_hint 是伺服器端的 print_id，照舊交給伺服器；價格 CSV 裡沒有 print_id，
+所以從 inventory 裡「數字 print_hint + rarity 對到唯一版本」的 lot 學起來
+（print_id → print_key），rarity 空白、只有 print_id 的 lot 也能對到版本。
+同一個 print_id 對到不同版本時不採用。
+
+用法：
+  python scripts/print_index.py          # 解析 inventory，更新兩份報表
+  python scripts/print_index.py --check  # 有 print_hint 沒對到唯一版本就 exit code 1
+報表（寫在 build/，不會動到 data/ 底下從伺服器匯出的檔案）：
+  build/print_index/inventory_missing_prints.csv      對不到任何版本
+  build/print_index/inventory_ambiguous_prints.csv    對到不只一個版本（列出候選）
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+import time
+
+from card_codes import normalize_card_code
+
+PRICE_GLOB = "data/*_yuyutei_prices.csv"
+INVENTORY_CSV = "data/inventory_lots_v2.csv"
+REPORT_DIR = "build/print_index"
+MISSING_CSV = os.path.join(REPORT_DIR, "inventory_missing_prints.csv")
+AMBIGUOUS_CSV = os.path.join(REPORT_DIR, "inventory_ambiguous_prints.csv")
+
+# 非數字 print_hint → (rarity, is_parallel_name)。
+# 「+P」是パラレル；SR / UR / OUR / HR / SEC 在 YUYU 上都是パラレル名稱，
+# 所以不加 +P 也對到 is_parallel_name=1。新的提示要加在這裡，沒列的都算對不到。
+HINT_VARIANTS = {
+    "C": ("C", 0),
+    "C+P": ("C", 1),
+    "U": ("U", 0),
+    "U+P": ("U", 1),
+    "R": ("R", 0),
+    "RR": ("RR", 0),
+    "S": ("S", 0),
+    "S+P": ("S", 1),
+    "P": ("P", 0),
+    "P+P": ("P", 1),
+    "OC": ("OC", 0),
+    "SY": ("SY", 0),
+    "OSR": ("OSR", 0),
+    "SR": ("SR", 1),
+    "UR": ("UR", 1),
+    "OUR": ("OUR", 1),
+    "HR": ("HR", 1),
+    "SEC": ("SEC", 1),
+}
+
+MISSING_FIELDS = [
+    "card_code",
+    "print_hint",
+    "acquisition_type",
+    "source_name",
+    "acquired_qty",
+    "unit_cost",
+    "currency",
+    "acquired_at",
+    "note",
+]
+AMBIGUOUS_FIELDS = ["line_no", "card_code", "rarity", "print_hint", "acquired_qty", "candidates"]
+
+_CARD_PATH_RE = re.compile(r"/card/([^?#]+)")
+
+# resolve() 的結果
+RESOLVED = "resolved"
+AMBIGUOUS = "ambiguous"
+MISSING = "missing"
+SERVER_PRINT_ID = "print_id"
+
+
+def print_key_for(row: dict) -> str:
+    for field in ("sell_url", "buy_url"):
+        m = _CARD_PATH_RE.search(row.get(field) or "")
+        if m:
+            return m.group(1).strip("/")
+    # 沒有商品頁的列，用卡號 + 稀有度 + 是否パラレル 當識別
+    return f"{row['card_code']}/{row['rarity']}/{row['is_parallel_name']}"
+
+
+class PrintIndex:
+    def __init__(self):
+        self.prints: dict[str, dict] = {}
+        self.exact: dict[tuple[str, str, int], str] = {}
+        self.aliases: dict[tuple[str, str], list[str]] = {}
+        # 伺服器 print_id -> print_key；None = 學到互相矛盾的版本
+        self.by_id: dict[str, str | None] = {}
+
+    def add(self, row: dict):
+        rarity = (row.get("rarity") or "").strip()
+        if not rarity:
+            return
+        code = normalize_card_code(row["card_code"])
+        parallel = int(row.get("is_parallel_name") or 0)
+        key = print_key_for({**row, "card_code": code, "is_parallel_name": parallel})
+        if key in self.prints:
+            return
+
+        self.prints[key] = {
+            "print_key": key,
+            "card_code": code,
+            "rarity": rarity,
+            "is_parallel_name": parallel,
+            "name_ja": row.get("name_ja") or "",
+        }
+        self.exact.setdefault((code, rarity, parallel), key)
+        for alias in (rarity.upper(), key.upper()):
+            self.aliases.setdefault((code, alias), []).append(key)
+
+    def candidates(self, card_code: str, hint: str) -> list[str]:
+        """依別名找候選版本；普通版排前面，再依 print_key 排序。"""
+        keys = self.aliases.get((normalize_card_code(card_code), hint.strip().upper()), [])
+        return sorted(keys, key=lambda k: (self.prints[k]["is_parallel_name"], k))
+
+    def lookup(self, card_code: str, rarity: str, is_parallel_name: int) -> str | None:
+        return self.exact.get((normalize_card_code(card_code), rarity, int(is_parallel_name)))
+
+    def by_hint(self, card_code: str, rarity: str, hint: str) -> list[str]:
+        """非數字的 print_hint：print_key 本身，或 HINT_VARIANTS 明列的版本。"""
+        keys = self.aliases.get((normalize_card_code(card_code), hint.upper()), [])
+        exact = [k for k in keys if k.upper() == hint.upper()]
+        if exact:
+            return exact
+        variant = HINT_VARIANTS.get(hint.upper())
+        if variant is None or (rarity and rarity != variant[0]):
+            return []
+        key = self.lookup(card_code, *variant)
+        return [key] if key else []
+
+    def learn_print_ids(self, rows: list[dict]):
+        """從有 rarity 又有數字 print_hint 的 lot 學 print_id → print_key。"""
+        for r in rows:
+            hint = (r.get("print_hint") or "").strip()
+            rarity = (r.get("rarity") or "").strip()
+            if not (hint.isdigit() and rarity):
+                continue
+            found = self.candidates(r["card_code"], rarity)
+            if len(found) != 1:
+                continue
+            if self.by_id.setdefault(hint, found[0]) != found[0]:
+                self.by_id[hint] = None
+
+    def by_print_id(self, card_code: str, print_id: str) -> str | None:
+        key = self.by_id.get(print_id)
+        if key and self.prints[key]["card_code"] == normalize_card_code(card_code):
+            return key
+        return None
+
+    def resolve(self, card_code: str, rarity: str, print_hint: str) -> tuple[str, list[str]]:
+        """
+        回傳 (狀態, 候選 print_key)：
+          非數字的 print_hint 用 by_hint 精確查（print_key 或 HINT_VARIANTS），
+          沒有 print_hint 才用 rarity 當別名；
+          print_hint 是數字（伺服器的 print_id）時一律回傳 SERVER_PRINT_ID，
+          候選是學到的 print_id 對應的版本（沒學到就用 rarity 找）。
+        """
+        rarity = (rarity or "").strip()
+        hint = (print_hint or "").strip()
+
+        if hint and not hint.isdigit():
+            found = self.by_hint(card_code, rarity, hint)
+        else:
+            found = self.candidates(card_code, rarity) if rarity else []
+
+        if hint.isdigit():
+            # 已經指定伺服器的 print_id；候選仍然回傳給估價之類的本機用途
+            key = self.by_print_id(card_code, hint)
+            return SERVER_PRINT_ID, [key] if key else found
+        if len(found) == 1:
+            return RESOLVED, found
+        if found:
+            return AMBIGUOUS, found
+        return MISSING, []
+
+
+def build_index(pattern: str = PRICE_GLOB) -> PrintIndex:
+    index = PrintIndex()
+    for path in sorted(glob.glob(pattern)):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                index.add(row)
+    return index
+
+
+def resolve_lots(index: PrintIndex, rows: list[dict]) -> list[tuple[str, list[str]]]:
+    """每筆 lot 查一次表（O(n)），回傳跟 rows 同順序的 (狀態, 候選)。"""
+    index.learn_print_ids(rows)
+    return [index.resolve(r["card_code"], r.get("rarity"), r.get("print_hint")) for r in rows]
+
+
+def _write_csv(path: str, fieldnames: list[str], rows: list[dict]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_reports(rows: list[dict], results: list[tuple[str, list[str]]]) -> dict[str, int]:
+    """rows 是 CSV 讀進來的原始欄位（line_no = CSV 行號）。"""
+    missing, ambiguous = [], []
+    counts = {RESOLVED: 0, AMBIGUOUS: 0, MISSING: 0, SERVER_PRINT_ID: 0}
+    for r, (status, found) in zip(rows, results):
+        counts[status] += 1
+        if status == MISSING:
+            missing.append(r)
+        elif status == AMBIGUOUS:
+            ambiguous.append({**r, "candidates": " | ".join(found)})
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    _write_csv(MISSING_CSV, MISSING_FIELDS, missing)
+    _write_csv(AMBIGUOUS_CSV, AMBIGUOUS_FIELDS, ambiguous)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把 inventory 的 print_hint 對到版本")
+    parser.add_argument("--inventory", default=INVENTORY_CSV)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="有非數字 print_hint 沒對到唯一版本（沒列在 HINT_VARIANTS、或該版本不存在）就失敗",
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build_index()
+    rows = []
+    with open(args.inventory, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for r in reader:
+            if (r.get("card_code") or "").strip():
+                rows.append({**r, "line_no": reader.line_num})
+    results = resolve_lots(index, rows)
+    counts = write_reports(rows, results)
+
+    print(
+        f"版本索引：{len(index.prints)} 個版本；inventory {len(rows)} 筆 → "
+        f"對到 {counts[RESOLVED]}、多個候選 {counts[AMBIGUOUS]}、"
+        f"對不到 {counts[MISSING]}、交給伺服器 print_id {counts[SERVER_PRINT_ID]}"
+        f"（{(time.perf_counter() - started) * 1000:.0f} ms）"
+    )
+    if counts[AMBIGUOUS]:
+        print(f"   多個候選的清單：{AMBIGUOUS_CSV}")
+    if counts[MISSING]:
+        print(f"   對不到的清單：{MISSING_CSV}")
+
+    if args.check:
+        unresolved = [
+            f"第 {r['line_no']} 行 {r['card_code']} print_hint={r['print_hint']}：{status}"
+            for r, (status, _) in zip(rows, results)
+            if (r.get("print_hint") or "").strip()
+            and not r["print_hint"].strip().isdigit()
+            and status != RESOLVED
+        ]
+        if unresolved:
+            print(f"❌ {len(unresolved)} 筆 print_hint 沒對到唯一版本：")
+            for line in unresolved:
+                print(f"   {line}")
+            sys.exit(1)
+        print("✅ 所有非數字 print_hint 都對到唯一版本")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+per-host 的自適應限速器（token bucket + AIMD），取代爬蟲裡寫死的 sleep。
+
+  - 回應正常且延遲沒有明顯變慢：每次成功把速率加一點（additive increase）；
+    低於初始速率時一次補回差距的 RECOVERY_FRACTION，被擋過之後很快回到原本的速度
+  - 429 / 5xx / 連線錯誤，或延遲超過基準的 LATENCY_FACTOR 倍：速率打折（multiplicative decrease）；
+    上次打折後、以新速率送出一個請求的時間內再收到的錯誤不重複打折
+    （同一波限流同時回來的好幾個 429 只算一次）
+  - 有 Retry-After 時，在那之前整個 host 都暫停；暫停結束後下一個請求可以馬上送
+
+scripts/sim_rate_limiter.py 用會回 429 + Retry-After 的假 host 檢查以上行為。
+
+http_client 每次送出請求前呼叫 acquire()，拿到回應後呼叫 record()。
+snapshot_all() / print_summary() 可以看到每個 host 目前的實際速率。
+"""
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+ENABLED = os.environ.get("HTTP_RATE_LIMIT", "1") != "0"
+
+ADDITIVE_INCREASE = 0.05  # 每次成功增加的 req/s
+DECREASE_FACTOR = 0.5     # 錯誤時速率乘上的倍數
+SLOW_DECREASE_FACTOR = 0.8  # 延遲升高時速率乘上的倍數
+RECOVERY_FRACTION = 0.25  # 低於初始速率時，每次成功補回差距的比例
+LATENCY_FACTOR = 2.0      # 短期延遲超過基準幾倍算「變慢」
+EWMA_ALPHA = 0.2          # 短期延遲的平滑係數
+BASELINE_ALPHA = 0.02     # 基準延遲（長期）的平滑係數
+
+# host -> (初始, 最低, 最高) req/s；舊版固定 sleep 大約對應到初始值
+HOST_RATES: dict[str, tuple[float, float, float]] = {
+    "hololive-official-cardgame.com": (3.0, 0.5, 10.0),
+    "yuyu-tei.jp": (0.8, 0.2, 3.0),
+}
+DEFAULT_RATE = (2.0, 0.2, 10.0)
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float = 1.0):
+        self.rate = rate
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.tokens = burst
+        self.ewma_latency = None
+        self.baseline_latency = None
+        self.successes = 0
+        self.errors = 0
+        self.slowdowns = 0
+        self.wait_seconds = 0.0
+        self._blocked_until = 0.0
+        self._decreased_at = float("-inf")
+        self._last_refill = time.monotonic()
+        self._recent = deque()  # 最近 60 秒內送出的時間點
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def _decrease(self, now: float, factor: float):
+        # 打折後至少隔一個請求的時間才再打折，避免同一波錯誤把速率連續砍到最低
+        if now - self._decreased_at < 1 / self.rate:
+            return
+        self._decreased_at = now
+        self.rate = max(self.min_rate, self.rate * factor)
+
+    def _increase(self):
+        step = ADDITIVE_INCREASE
+        if self.rate < self.initial_rate:
+            step = max(step, (self.initial_rate - self.rate) * RECOVERY_FRACTION)
+        self.rate = min(self.max_rate, self.rate + step)
+
+    def acquire(self):
+        """拿一個 token，不夠就睡到夠為止。"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self._recent.append(now)
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                self.wait_seconds += wait
+            time.sleep(wait)
+
+    def record(self, status: int | None, latency: float, retry_after: float | None = None):
+        """回報一次請求結果；status 為 None 代表連線錯誤。"""
+        with self._lock:
+            now = time.monotonic()
+            if status is None or status == 429 or status >= 500:
+                self.errors += 1
+                self._decrease(now, DECREASE_FACTOR)
+                if retry_after:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+                    # 暫停本身就是間隔：暫停結束時至少補滿一個 token，不用再多等一輪
+                    self.tokens = max(self.tokens, 1 - retry_after * self.rate)
+                return
+
+            self.successes += 1
+            if self.ewma_latency is None:
+                self.ewma_latency = latency
+                self.baseline_latency = latency
+            else:
+                self.ewma_latency += EWMA_ALPHA * (latency - self.ewma_latency)
+                self.baseline_latency += BASELINE_ALPHA * (
+                    latency - self.baseline_latency
+                )
+
+            if self.ewma_latency > self.baseline_latency * LATENCY_FACTOR:
+                self.slowdowns += 1
+                self._decrease(now, SLOW_DECREASE_FACTOR)
+            else:
+                self._increase()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            window = min(60.0, now - self._recent[0]) if self._recent else 0.0
+            return {
+                "rate": round(self.rate, 3),
+                "effective_rps": round(len(self._recent) / window, 3) if window > 0 else 0.0,
+                "tokens": round(self.tokens, 3),
+                "ewma_latency": round(self.ewma_latency or 0.0, 4),
+                "baseline_latency": round(self.baseline_latency or 0.0, 4),
+                "successes": self.successes,
+                "errors": self.errors,
+                "slowdowns": self.slowdowns,
+                "wait_seconds": round(self.wait_seconds, 2),
+            }
+
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_host(host: str, rate: float, min_rate: float, max_rate: float):
+    """要在該 host 第一次請求前設定才有效。"""
+    HOST_RATES[host] = (rate, min_rate, max_rate)
+
+
+def get_limiter(url: str) -> AdaptiveRateLimiter | None:
+    if not ENABLED:
+        return None
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            rate, min_rate, max_rate = HOST_RATES.get(host, DEFAULT_RATE)
+            limiter = AdaptiveRateLimiter(rate, min_rate, max_rate)
+            _limiters[host] = limiter
+    return limiter
+
+
+def snapshot_all() -> dict[str, dict]:
+    with _limiters_lock:
+        items = list(_limiters.items())
+    return {host: limiter.snapshot() for host, limiter in items}
+
+
+def print_summary():
+    for host, snap in snapshot_all().items():
+        print(
+            f"   ⏱ {host}: 速率 {snap['rate']} req/s（實際 {snap['effective_rps']}），"
+            f"成功 {snap['successes']} / 錯誤 {snap['errors']} / 變慢 {snap['slowdowns']}，"
+            f"等待 {snap['wait_seconds']} 秒"
+        )
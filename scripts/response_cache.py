@@ -0,0 +1,248 @@
+"""
+http_client 用的磁碟回應快取（只快取 GET 的 200 回應）：
+
+  - key：正規化後的 URL + params（參數排序，忽略 fetch_card_urls 加的 t 防快取參數）
+  - 內容以 sha256 定址、gzip 壓縮存放，相同內容只存一份
+  - 每種 endpoint 有自己的 TTL（ENDPOINT_TTLS）
+  - 總大小超過 HTTP_CACHE_MAX_MB 時，依最後存取時間淘汰（LRU）
+  - HTTP_OFFLINE=1：完全不連網路，只用快取（忽略 TTL），找不到就丟 CacheMiss
+
+目錄結構（HTTP_CACHE_DIR，預設 .cache/http）：
+  index/ab/<key>.json    URL、狀態碼、部分 header、對應的 blob、時間戳
+  blobs/cd/<sha256>.gz   回應內容
+
+用法：
+  HTTP_CACHE=1 python scripts/crawl_scheduler.py                  # 邊抓邊存
+  HTTP_OFFLINE=1 HOCG_CRAWL_MODE=full python scripts/crawl_scheduler.py
+                                                                 # 只用快取重建所有 CSV
+  python scripts/response_cache.py stats | prune | clear
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+OFFLINE = os.environ.get("HTTP_OFFLINE") == "1"
+ENABLED = OFFLINE or os.environ.get("HTTP_CACHE") == "1"
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", ".cache/http")
+MAX_BYTES = int(float(os.environ.get("HTTP_CACHE_MAX_MB", "500")) * 1024 * 1024)
+
+# 不影響內容的參數，算 key 時拿掉
+IGNORED_PARAMS = {"t"}
+
+# (URL 片段, TTL 秒數)，由上往下第一個符合的為準
+ENDPOINT_TTLS = [
+    ("/cardlist/cardsearch_ex", 6 * 3600),
+    ("/cardlist/", 7 * 86400),
+    ("/wp-content/images/", 30 * 86400),
+    ("/s/search", 12 * 3600),
+]
+DEFAULT_TTL = 86400
+
+KEPT_HEADERS = ["Content-Type", "ETag", "Last-Modified"]
+
+
+class CacheMiss(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_total_bytes: int | None = None
+
+
+def normalize_url(url: str, params=None) -> str:
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        items = params.items() if isinstance(params, dict) else params
+        query += [(str(k), str(v)) for k, v in items if v is not None]
+    query = sorted((k, v) for k, v in query if k not in IGNORED_PARAMS)
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path or "/", urlencode(query), "")
+    )
+
+
+def cache_key(url: str, params=None) -> str:
+    return hashlib.sha256(normalize_url(url, params).encode("utf-8")).hexdigest()
+
+
+def ttl_for(url: str) -> int:
+    for fragment, ttl in ENDPOINT_TTLS:
+        if fragment in url:
+            return ttl
+    return DEFAULT_TTL
+
+
+def _index_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, "index", key[:2], f"{key}.json")
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, "blobs", digest[:2], f"{digest}.gz")
+
+
+def _atomic_write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _read_entry(key: str) -> dict | None:
+    try:
+        with open(_index_path(key), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_entry(key: str, entry: dict):
+    _atomic_write(_index_path(key), json.dumps(entry).encode("utf-8"))
+
+
+def _to_response(entry: dict, body: bytes) -> Response:
+    resp = Response()
+    resp.status_code = entry["status"]
+    resp._content = body
+    resp.headers = CaseInsensitiveDict(entry["headers"])
+    resp.url = entry["url"]
+    resp.encoding = None
+    return resp
+
+
+def lookup(url: str, params=None) -> Response | None:
+    """有未過期（離線模式下不看期限）的快取就回傳 Response，否則 None。"""
+    key = cache_key(url, params)
+    entry = _read_entry(key)
+    if entry is None:
+        return None
+    if not OFFLINE and time.time() - entry["stored_at"] > ttl_for(entry["url"]):
+        return None
+    try:
+        with gzip.open(_blob_path(entry["blob"]), "rb") as f:
+            body = f.read()
+    except FileNotFoundError:
+        return None
+
+    entry["accessed_at"] = time.time()
+    _write_entry(key, entry)
+    return _to_response(entry, body)
+
+
+def store(url: str, params, resp):
+    global _total_bytes
+    if resp.status_code != 200:
+        return
+    body = resp.content
+    digest = hashlib.sha256(body).hexdigest()
+    blob = _blob_path(digest)
+    added = 0
+    if not os.path.exists(blob):
+        data = gzip.compress(body)
+        _atomic_write(blob, data)
+        added = len(data)
+
+    now = time.time()
+    _write_entry(
+        cache_key(url, params),
+        {
+            "url": normalize_url(url, params),
+            "status": resp.status_code,
+            "headers": {h: resp.headers[h] for h in KEPT_HEADERS if h in resp.headers},
+            "blob": digest,
+            "size": len(body),
+            "stored_at": now,
+            "accessed_at": now,
+        },
+    )
+
+    with _lock:
+        if _total_bytes is None:
+            _total_bytes = _blob_bytes()
+        else:
+            _total_bytes += added
+        over = _total_bytes > MAX_BYTES
+    if over:
+        evict(MAX_BYTES)
+
+
+def _iter_entries():
+    index_dir = os.path.join(CACHE_DIR, "index")
+    for root, _, files in os.walk(index_dir):
+        for name in files:
+            if name.endswith(".json"):
+                key = name[:-5]
+                entry = _read_entry(key)
+                if entry is not None:
+                    yield key, entry
+
+
+def _blob_bytes() -> int:
+    total = 0
+    for root, _, files in os.walk(os.path.join(CACHE_DIR, "blobs")):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def evict(max_bytes: int, drop_expired: bool = False) -> int:
+    """依最後存取時間刪掉最舊的項目，直到總大小 <= max_bytes；回傳刪掉幾筆。"""
+    global _total_bytes
+    with _lock:
+        entries = sorted(_iter_entries(), key=lambda kv: kv[1]["accessed_at"])
+        refs: dict[str, int] = {}
+        for _, entry in entries:
+            refs[entry["blob"]] = refs.get(entry["blob"], 0) + 1
+
+        total = _blob_bytes()
+        now = time.time()
+        removed = 0
+        for key, entry in entries:
+            expired = now - entry["stored_at"] > ttl_for(entry["url"])
+            if total <= max_bytes and not (drop_expired and expired):
+                continue
+            os.remove(_index_path(key))
+            removed += 1
+            refs[entry["blob"]] -= 1
+            if refs[entry["blob"]] == 0:
+                blob = _blob_path(entry["blob"])
+                if os.path.exists(blob):
+                    total -= os.path.getsize(blob)
+                    os.remove(blob)
+        _total_bytes = total
+        return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP 回應快取維護")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    args = parser.parse_args()
+
+    if args.command == "clear":
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print(f"已清空 {CACHE_DIR}")
+        return
+    if args.command == "prune":
+        removed = evict(MAX_BYTES, drop_expired=True)
+        print(f"已刪除 {removed} 筆過期或超出容量的快取")
+
+    entries = list(_iter_entries())
+    blobs = {entry["blob"] for _, entry in entries}
+    print(
+        f"{CACHE_DIR}：{len(entries)} 筆 URL，{len(blobs)} 份內容，"
+        f"壓縮後 {_blob_bytes() / 1024 / 1024:.1f} MB（上限 {MAX_BYTES / 1024 / 1024:.0f} MB）"
+    )
+
+
+if __name__ == "__main__":
+    main()
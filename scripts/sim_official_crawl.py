@@ -0,0 +1,237 @@
+"""
+官網爬蟲的模擬測試：在本機起一個假官網（cardsearch_ex 清單頁 + 卡片詳細頁，
+每個詳細頁隨機延遲），用 HOCG_BASE_URL 指過去，實際跑 run_for_expansion。
+
+  - 同時進行的詳細頁請求數：sync 是 1，concurrent 不超過 HOCG_FETCH_CONCURRENCY（而且真的有並行）
+  - iter_fetch 依輸入順序 yield，跟各請求完成的先後無關
+  - 寫出的 CSV 依 csv_row_key（卡號 + 卡片 id）排序，不是清單頁順序；
+    每張卡的欄位都正確，sync / concurrent 寫出的檔案 byte 相同
+  - crawl_scheduler 同時跑好幾個系列時，對假官網送出中的請求不超過站台名額
+    （HOCG_OFFICIAL_MAX_IN_FLIGHT），即使系列數 × 每系列並行數比名額大
+
+rate_limiter 另外由 sim_rate_limiter.py 測，這裡關掉。任何一項沒過就 exit code 1。
+
+用法：
+  python scripts/sim_official_crawl.py
+  python scripts/sim_official_crawl.py --concurrency 8
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+EXPANSION = "hSIM01"
+CARDS = 40      # 假官網的卡片數（每個系列）
+PER_PAGE = 12   # 清單頁一頁幾張
+MAX_DELAY = 0.04  # 詳細頁的隨機延遲上限（秒）
+SCHEDULED = ["hSIM01", "hSIM02", "hSIM03"]  # 排程情境同時跑的系列
+SITE_BUDGET = 3   # 排程情境的站台名額
+
+
+def card_code_for(card_id: int) -> str:
+    # 清單順序跟卡號順序故意不同；id 37 / 38 是同一張卡的兩種圖，排序要靠 id 分先後
+    if card_id == 38:
+        card_id = 37
+    return f"{EXPANSION}-{(card_id * 7) % CARDS + 1:03d}"
+
+
+# ----------------- 假官網 ----------------- #
+
+class FakeOfficialSite:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.detail_requests = 0
+        self._random = random.Random(7)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.in_flight = self.max_in_flight = self.detail_requests = 0
+
+    def track(self, fn, *args):
+        """清單頁與詳細頁都算「送出中」的請求。"""
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def listing_html(self, page: int) -> str:
+        ids = range((page - 1) * PER_PAGE + 1, min(page * PER_PAGE, CARDS) + 1)
+        links = "".join(f'<a href="/cardlist/?id={i}">card</a>' for i in ids)
+        return f"<html><body>{links}</body></html>"
+
+    def detail_html(self, card_id: int) -> str:
+        code = card_code_for(card_id)
+        return (
+            "<html><body>"
+            f'<h1 class="name">テストカード{card_id}</h1>'
+            f'<p class="number">カードナンバー<span>{code}</span></p>'
+            f'<img src="/wp-content/images/cardlist/{EXPANSION}/{code}_{card_id}.png">'
+            f'<div class="illustrator">絵師{card_id % 3}</div>'
+            '<div class="cardlist-Detail_Products"><div class="products">'
+            f"<p>テストパック</p><dl><dt>発売日</dt><dd>2025年01月{card_id % 28 + 1:02d}日</dd></dl>"
+            "</div></div>"
+            f'<div class="txt-Inner">効果{card_id}</div>'
+            "</body></html>"
+        )
+
+    def detail(self, card_id: int) -> str:
+        with self._lock:
+            self.detail_requests += 1
+            delay = self._random.uniform(0, MAX_DELAY)
+        time.sleep(delay)
+        return self.detail_html(card_id)
+
+    def start(self) -> tuple[ThreadingHTTPServer, str]:
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                if parts.path.rstrip("/") == "/cardlist/cardsearch_ex":
+                    body = site.track(site.listing_html, int(query.get("page", ["1"])[0]))
+                elif parts.path.rstrip("/") == "/cardlist" and "id" in query:
+                    body = site.track(site.detail, int(query["id"][0]))
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ----------------- 檢查 ----------------- #
+
+def check(failures: list[str], ok: bool, message: str):
+    print(f"   {'✔' if ok else '✘'} {message}")
+    if not ok:
+        failures.append(message)
+
+
+def crawl(crawler, site: FakeOfficialSite, mode: str, workdir: str) -> bytes:
+    """在 workdir 底下跑一次完整爬取，回傳寫出的 CSV。"""
+    os.chdir(workdir)
+    crawler.FETCH_MODE = mode
+    site.reset()
+    crawler.run_for_expansion(EXPANSION, mode="full")
+    with open(f"data/{EXPANSION}_cards_v2.csv", "rb") as f:
+        return f.read()
+
+
+def check_rows(failures: list[str], crawler, data: bytes, label: str):
+    rows = list(csv.DictReader(data.decode("utf-8").splitlines()))
+    check(failures, len(rows) == CARDS, f"{label}：{len(rows)} / {CARDS} 張卡")
+    keys = [crawler.csv_row_key(r) for r in rows]
+    check(failures, keys == sorted(keys), f"{label}：CSV 依 (卡號, 卡片 id) 排序")
+    wrong = [
+        r["card_page_url"]
+        for r in rows
+        if r["card_code"] != card_code_for(int(crawler.card_id_from_url(r["card_page_url"])))
+        or r["effect_text"] != f"効果{crawler.card_id_from_url(r['card_page_url'])}"
+    ]
+    check(failures, not wrong, f"{label}：每張卡的欄位跟詳細頁一致（不符 {len(wrong)} 張）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用本機假官網測官網爬蟲的並行與順序")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    site = FakeOfficialSite()
+    server, base_url = site.start()
+    os.environ.update(
+        {
+            "HOCG_BASE_URL": base_url,
+            "HOCG_FETCH_CONCURRENCY": str(args.concurrency),
+            "HTTP_RATE_LIMIT": "0",
+            "HTTP_CACHE": "0",
+            "HOCG_METRICS": "0",
+        }
+    )
+    import crawl_official_cards as crawler
+    import crawl_scheduler
+    import parse_pool
+
+    failures: list[str] = []
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            sync_dir = os.path.join(tmp, "sync")
+            conc_dir = os.path.join(tmp, "concurrent")
+            os.makedirs(sync_dir)
+            os.makedirs(conc_dir)
+
+            print("🧪 sync")
+            sync_csv = crawl(crawler, site, "sync", sync_dir)
+            check(failures, site.max_in_flight == 1, f"同時最多 {site.max_in_flight} 個請求（應為 1）")
+            check_rows(failures, crawler, sync_csv, "sync")
+
+            print(f"🧪 concurrent（HOCG_FETCH_CONCURRENCY={args.concurrency}）")
+            conc_csv = crawl(crawler, site, "concurrent", conc_dir)
+            check(
+                failures,
+                1 < site.max_in_flight <= args.concurrency,
+                f"同時最多 {site.max_in_flight} 個請求（應在 2..{args.concurrency}）",
+            )
+            check(failures, site.detail_requests == CARDS, f"詳細頁請求 {site.detail_requests} 次（每張一次）")
+            check_rows(failures, crawler, conc_csv, "concurrent")
+            check(failures, conc_csv == sync_csv, "sync / concurrent 寫出的 CSV 完全相同")
+
+            print("🧪 iter_fetch 順序")
+            urls = [f"{base_url}/cardlist/?id={i}" for i in range(1, CARDS + 1)]
+            got = [url for url, _ in crawler.iter_fetch(urls, crawler.get_response)]
+            check(failures, got == urls, "完成先後不同，yield 順序仍跟輸入相同")
+
+            print(
+                f"🧪 crawl_scheduler：{len(SCHEDULED)} 個系列 × 並行 {args.concurrency}，"
+                f"站台名額 {SITE_BUDGET}"
+            )
+            sched_dir = os.path.join(tmp, "scheduler")
+            os.makedirs(sched_dir)
+            os.chdir(sched_dir)
+            site.reset()
+            crawl_scheduler.OFFICIAL_WORKERS = len(SCHEDULED)
+            crawl_scheduler.OFFICIAL_MAX_IN_FLIGHT = SITE_BUDGET
+            summary = crawl_scheduler.run(SCHEDULED, {"official"})
+            rows = {exp: parts["official"]["rows"] for exp, parts in summary.items()}
+            check(failures, all(n == CARDS for n in rows.values()), f"每個系列都寫出 {CARDS} 張（{rows}）")
+            check(
+                failures,
+                site.max_in_flight <= SITE_BUDGET,
+                f"同時最多 {site.max_in_flight} 個請求（名額 {SITE_BUDGET}）",
+            )
+    finally:
+        os.chdir(cwd)
+        parse_pool.shutdown()
+        server.shutdown()
+
+    if failures:
+        print(f"❌ {len(failures)} 項沒過")
+        sys.exit(1)
+    print("✅ 官網爬蟲模擬全部通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+rate_limiter 的模擬測試：在本機起一個假 host，會依設定回 429 + Retry-After，
+實際透過 http_client 送請求，檢查 AIMD 限速器的行為。
+
+  overload：假 host 每秒只收 SERVER_CAPACITY 個請求，超過就回 429
+    - 正常階段：速率要往上加
+    - 限流階段：速率要降到伺服器容量附近，Retry-After 期間不能再送請求，
+      而且每個請求最後都要成功（靠 http_client 的重試）
+    - 恢復階段：伺服器恢復正常後，速率要回到初始值以上
+  random  ：隨機 30% 的請求回 429（跟 YUYU 被擋時的情況類似），用 YUYU 的速率設定送 27 個請求；
+    花的時間不能超過「全部請求都用初始速率送、加上每次 Retry-After」的 SLACK 倍，
+    速率也不能一路卡在最低值
+
+任何一項沒過就 exit code 1。
+
+用法：
+  python scripts/sim_rate_limiter.py                 # 兩個情境都跑
+  python scripts/sim_rate_limiter.py --scenario random
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ["HTTP_CACHE"] = "0"
+os.environ["HTTP_RATE_LIMIT"] = "1"
+os.environ["HOCG_METRICS"] = "0"
+
+import http_client  # noqa: E402
+import rate_limiter  # noqa: E402
+
+SERVER_CAPACITY = 4.0  # overload 情境：假 host 每秒最多收幾個請求
+RETRY_AFTER = 1        # 假 host 回的 Retry-After 秒數
+SLACK = 1.25           # random 情境：實際時間 / 理想時間的上限
+
+
+# ----------------- 假 host ----------------- #
+
+class FakeHost:
+    """依目前設定決定要不要回 429；每個請求的時間與狀態碼都記下來。"""
+
+    def __init__(self):
+        self.capacity: float | None = None  # None = 不限流
+        self.throttle_ratio = 0.0
+        self.retry_after = RETRY_AFTER
+        self.log: list[tuple[float, int]] = []
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._random = random.Random(5)
+        self._lock = threading.Lock()
+
+    def configure(self, capacity=None, throttle_ratio=0.0):
+        with self._lock:
+            self.capacity = capacity
+            self.throttle_ratio = throttle_ratio
+            self._tokens = 1.0
+            self._last = time.monotonic()
+
+    def decide(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            status = 200
+            if self.capacity is not None:
+                self._tokens = min(1.0, self._tokens + (now - self._last) * self.capacity)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    status = 429
+            if status == 200 and self._random.random() < self.throttle_ratio:
+                status = 429
+            self.log.append((now, status))
+            return status
+
+    def start(self) -> tuple[ThreadingHTTPServer, str]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status = fake.decide()
+                body = b"ok" if status == 200 else b"slow down"
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", str(fake.retry_after))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f"127.0.0.1:{server.server_address[1]}"
+
+
+# ----------------- 情境 ----------------- #
+
+def fetch_all(base_url: str, n: int, workers: int, limiter) -> tuple[list[int], float, float]:
+    """送 n 個請求；回傳 (狀態碼, 期間最低速率, 花費秒數)。"""
+    lowest = [limiter.rate if limiter else 0.0]
+
+    def one(i):
+        resp = http_client.get(f"{base_url}/item/{i}", retries=8, raise_for_status=False)
+        if limiter:
+            lowest[0] = min(lowest[0], limiter.rate)
+        return resp.status_code
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        statuses = list(pool.map(one, range(n)))
+    return statuses, lowest[0], time.monotonic() - started
+
+
+def check(failures: list[str], ok: bool, message: str):
+    print(f"   {'✔' if ok else '✘'} {message}")
+    if not ok:
+        failures.append(message)
+
+
+def blocked_window_violations(log: list[tuple[float, int]], retry_after: float) -> int:
+    """429 之後 Retry-After 秒內又送進來的請求數（容許 50ms 誤差）。"""
+    violations = 0
+    blocked_until = 0.0
+    for at, status in log:
+        if at < blocked_until - 0.05:
+            violations += 1
+        if status == 429:
+            blocked_until = max(blocked_until, at + retry_after)
+    return violations
+
+
+def scenario_overload(failures: list[str]):
+    print("🧪 overload：伺服器容量 "
+          f"{SERVER_CAPACITY:g} req/s，超過回 429 + Retry-After {RETRY_AFTER}s")
+    fake = FakeHost()
+    server, host = fake.start()
+    base_url = f"http://{host}"
+    initial, min_rate, max_rate = 5.0, 0.5, 40.0
+    rate_limiter.configure_host(host, initial, min_rate, max_rate)
+    limiter = rate_limiter.get_limiter(base_url)
+    try:
+        fake.configure()
+        statuses, _, elapsed = fetch_all(base_url, 40, 4, limiter)
+        healthy_rate = limiter.rate
+        print(f"   正常：{elapsed:.1f}s，速率 {initial:g} → {healthy_rate:.2f} req/s")
+        check(failures, all(s == 200 for s in statuses), "正常階段全部 200")
+        check(failures, healthy_rate > initial, "正常階段速率往上加")
+
+        fake.configure(capacity=SERVER_CAPACITY)
+        start = len(fake.log)
+        statuses, lowest, elapsed = fetch_all(base_url, 60, 4, limiter)
+        log = fake.log[start:]
+        throttled = sum(1 for _, s in log if s == 429)
+        print(
+            f"   限流：{elapsed:.1f}s，{throttled} 次 429，"
+            f"最低速率 {lowest:.2f}，結束時 {limiter.rate:.2f} req/s"
+        )
+        check(failures, throttled > 0, "限流階段確實收到 429")
+        check(failures, lowest <= SERVER_CAPACITY, "速率降到伺服器容量以下")
+        check(failures, lowest > min_rate, "速率沒有一路掉到最低值")
+        check(failures, all(s == 200 for s in statuses), "重試後每個請求都成功")
+        violations = blocked_window_violations(log, RETRY_AFTER)
+        check(failures, violations == 0, f"Retry-After 期間沒有送請求（違規 {violations} 次）")
+
+        fake.configure()
+        statuses, _, elapsed = fetch_all(base_url, 60, 4, limiter)
+        print(f"   恢復：{elapsed:.1f}s，速率回到 {limiter.rate:.2f} req/s")
+        check(failures, all(s == 200 for s in statuses), "恢復階段全部 200")
+        check(failures, limiter.rate >= initial, "伺服器恢復後速率回到初始值以上")
+    finally:
+        server.shutdown()
+
+
+def scenario_random(failures: list[str]):
+    print(f"🧪 random：30% 請求回 429 + Retry-After {RETRY_AFTER}s，YUYU 的速率設定")
+    fake = FakeHost()
+    server, host = fake.start()
+    base_url = f"http://{host}"
+    initial, min_rate, max_rate = rate_limiter.HOST_RATES["yuyu-tei.jp"]
+    rate_limiter.configure_host(host, initial, min_rate, max_rate)
+    limiter = rate_limiter.get_limiter(base_url)
+    try:
+        fake.configure(throttle_ratio=0.3)
+        statuses, lowest, elapsed = fetch_all(base_url, 27, 1, limiter)
+        throttled = sum(1 for _, s in fake.log if s == 429)
+        ideal = len(fake.log) / initial + throttled * RETRY_AFTER
+        print(
+            f"   27 個請求 {elapsed:.1f}s（理想 {ideal:.1f}s），{throttled} 次 429，"
+            f"最低速率 {lowest:.2f}，結束時 {limiter.rate:.2f} req/s"
+        )
+        check(failures, all(s == 200 for s in statuses), "重試後每個請求都成功")
+        check(failures, elapsed <= ideal * SLACK, f"花費時間在理想時間的 {SLACK:g} 倍以內")
+        check(failures, limiter.rate > min_rate, "結束時速率不是卡在最低值")
+        violations = blocked_window_violations(fake.log, RETRY_AFTER)
+        check(failures, violations == 0, f"Retry-After 期間沒有送請求（違規 {violations} 次）")
+    finally:
+        server.shutdown()
+
+
+SCENARIOS = {"overload": scenario_overload, "random": scenario_random}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用會回 429 的假 host 測 rate_limiter")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                        help="只跑指定情境（可重複）；預設全部")
+    args = parser.parse_args()
+
+    failures: list[str] = []
+    for name in args.scenario or list(SCENARIOS):
+        SCENARIOS[name](failures)
+
+    if failures:
+        print(f"❌ {len(failures)} 項沒過")
+        sys.exit(1)
+    print("✅ rate_limiter 模擬全部通過")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,43 @@
+"""
+把 data/inventory_lots_v2.csv 同步到 Supabase 的 inventory_lots_raw。
+
+兩種模式（INVENTORY_SYNC_MODE 或 --mode）：
+
+  replace（預設）：整張表清空，再一次 POST 全部資料（舊做法）
+  diff           ：每筆 lot 算出 lot_key / lot_hash，先抓遠端現有的 key，
+                   只送新增 / 修改（upsert）與刪除，分塊平行送出，失敗會重試
+
+diff 模式需要表上多兩個欄位：
+
+  alter table inventory_lots_raw add column lot_key text unique;
+  alter table inventory_lots_raw add column lot_hash text;
+
+lot_key = 身分欄位（系列、卡號、稀有度、print_hint、取得方式、來源、取得日）的 hash
+          + 同一組身分在 CSV 裡第幾次出現；數量、單價、備註改了算「修改」。
+舊模式寫進去、沒有 lot_key 的列，在 diff 模式第一次跑時會被刪掉重寫。
+
+上傳前會用 print_index 對版本；對到唯一版本的 print_key 預設只在本機用（印出
+對不到 / 多個候選的 lot），CSV 的 rarity 照原樣上傳。INVENTORY_SYNC_PRINT_KEY=1
+時一起上傳 print_key（也算進 lot_hash），表上要先加欄位：
+
+  alter table inventory_lots_raw add column print_key text;
+
+本機測試：SUPABASE_PROJECT_URL 指到任何相容 PostgREST 的服務即可，
+加 --dry-run 只印出會做哪些變更。
+"""
+import argparse
 import csv
+import hashlib
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
 
-import requests
+import http_client
+import print_index
+import rate_limiter
+from card_codes import normalize_card_code
 
 # === Supabase 連線設定 ===
 
@@ -24,27 +58,34 @@ REST_BASE = f"{PROJECT_URL}/rest/v1"
 # v2 CSV 路徑
 CSV_PATH = "data/inventory_lots_v2.csv"
 
-
-# ---------- 小工具：卡號正規化 ----------
-
-def normalize_card_code(raw_code: str) -> str:
-    """
-    把使用者輸入的卡號統一成「第一個字母小寫，其餘大寫」，
-    例如：hbp04-063、HBP04-063 都會變成 hBP04-063。
-    """
-    code = (raw_code or "").strip()
-    if not code:
-        return ""
-
-    code = code.replace(" ", "")
-
-    if len(code) >= 3:
-        first = code[0].lower()
-        second_third = code[1:3].upper()
-        rest = code[3:]
-        return first + second_third + rest
-
-    return code
+SYNC_MODE = os.environ.get("INVENTORY_SYNC_MODE", "replace").strip().lower()
+CHUNK_SIZE = int(os.environ.get("INVENTORY_SYNC_CHUNK_SIZE", "500"))
+SYNC_WORKERS = int(os.environ.get("INVENTORY_SYNC_WORKERS", "4"))
+UPLOAD_PRINT_KEY = os.environ.get("INVENTORY_SYNC_PRINT_KEY") == "1"
+REMOTE_PAGE_SIZE = 1000
+
+# Supabase 不像爬蟲目標需要客氣，速率與連線數都放寬
+_SUPABASE_HOST = urlsplit(PROJECT_URL).netloc
+rate_limiter.configure_host(_SUPABASE_HOST, 10.0, 1.0, 50.0)
+http_client.set_host_limit(_SUPABASE_HOST, SYNC_WORKERS)
+
+# 決定「是不是同一筆 lot」的欄位
+LOT_IDENTITY_FIELDS = [
+    "expansion",
+    "card_code",
+    "rarity",
+    "print_hint",
+    "acquisition_type",
+    "source_name",
+    "acquired_at",
+]
+# 內容有變就要 upsert 的欄位
+LOT_CONTENT_FIELDS = LOT_IDENTITY_FIELDS + [
+    "acquired_qty",
+    "unit_cost",
+    "currency",
+    "note",
+] + (["print_key"] if UPLOAD_PRINT_KEY else [])
 
 
 # ---------- 載入 CSV ----------
@@ -125,6 +166,39 @@ def load_csv_rows(path: str):
     return rows
 
 
+# ---------- 上傳前先對版本 ----------
+
+def resolve_prints(rows: list[dict]):
+    """
+    用本機的 print_index 一次對完所有 lot：
+      - 對到唯一版本的（包含數字 print_hint 學到的 print_id）記在 r["print_key"]，
+        對不到或多個候選的是空字串；r["rarity"] 不動，照使用者填的上傳
+      - 多個候選 / 對不到的印出來（完整報表用 scripts/print_index.py 產生）
+    print_hint 是數字的照舊交給伺服器當 print_id。
+    """
+    index = print_index.build_index()
+    results = print_index.resolve_lots(index, rows)
+
+    counts: dict[str, int] = {}
+    problems = []
+    for r, (status, found) in zip(rows, results):
+        counts[status] = counts.get(status, 0) + 1
+        r["print_key"] = found[0] if len(found) == 1 else ""
+        if status in (print_index.AMBIGUOUS, print_index.MISSING):
+            problems.append(f"{r['card_code']} {r['rarity'] or '-'} {r['print_hint'] or '-'}：{status} {' | '.join(found)}")
+
+    print(
+        f"版本對照：print_id {counts.get(print_index.SERVER_PRINT_ID, 0)}、"
+        f"本機對到 {counts.get(print_index.RESOLVED, 0)}、"
+        f"多個候選 {counts.get(print_index.AMBIGUOUS, 0)}、"
+        f"對不到 {counts.get(print_index.MISSING, 0)}"
+    )
+    for line in problems[:20]:
+        print(f"   [注意] {line}", file=sys.stderr)
+    if len(problems) > 20:
+        print(f"   ... 另外 {len(problems) - 20} 筆，請跑 scripts/print_index.py 看報表", file=sys.stderr)
+
+
 # ---------- Supabase REST 小工具 ----------
 
 def supabase_headers(prefer: str | None = None):
@@ -140,11 +214,13 @@ def supabase_headers(prefer: str | None = None):
 
 def clear_inventory_lots_raw():
     """每次同步前把 staging 表清空，避免舊資料殘留。"""
-    resp = requests.delete(
+    resp = http_client.request(
+        "DELETE",
         f"{REST_BASE}/inventory_lots_raw",
         headers=supabase_headers(prefer="return=minimal"),
         params={"id": "gt.0"},
         timeout=30,
+        raise_for_status=False,
     )
     if not resp.ok:
         print(
@@ -155,45 +231,50 @@ def clear_inventory_lots_raw():
         sys.exit(1)
 
 
+def build_payload_row(r: dict, acquired_at: str) -> dict:
+    print_hint = r["print_hint"]
+
+    # 如果 print_hint 是純數字，就當成 print_id，用來 join 價格表
+    print_id = None
+    if print_hint and print_hint.isdigit():
+        print_id = int(print_hint)
+
+    row = {
+        "expansion": r["expansion"],
+        "card_code": r["card_code"],
+        "rarity": r["rarity"],
+        "print_hint": print_hint,
+        "acquisition_type": r["acquisition_type"],
+        "source_name": r["source_name"],
+        "acquired_qty": r["acquired_qty"],
+        "unit_cost": r["unit_cost"],
+        "currency": r["currency"],
+        "acquired_at": acquired_at,
+        "note": r["note"],
+        "print_id": print_id,
+    }
+    if UPLOAD_PRINT_KEY:
+        row["print_key"] = r.get("print_key") or None
+    return row
+
+
 def insert_inventory_lots_raw(rows: list[dict]):
     if not rows:
         print("CSV 沒有資料，不做任何事")
         return
 
     now_ts = datetime.now(timezone.utc).isoformat()
-    payload = []
-
-    for r in rows:
-        acquired_at = r["acquired_at"] or now_ts
-        print_hint = r["print_hint"]
-
-        # 如果 print_hint 是純數字，就當成 print_id，用來 join 價格表
-        print_id = None
-        if print_hint and print_hint.isdigit():
-            print_id = int(print_hint)
-
-        payload.append(
-            {
-                "expansion": r["expansion"],
-                "card_code": r["card_code"],
-                "rarity": r["rarity"],
-                "print_hint": print_hint,
-                "acquisition_type": r["acquisition_type"],
-                "source_name": r["source_name"],
-                "acquired_qty": r["acquired_qty"],
-                "unit_cost": r["unit_cost"],
-                "currency": r["currency"],
-                "acquired_at": acquired_at,
-                "note": r["note"],
-                "print_id": print_id,
-            }
-        )
+    payload = [build_payload_row(r, r["acquired_at"] or now_ts) for r in rows]
 
-    resp = requests.post(
+    resp = http_client.request(
+        "POST",
         f"{REST_BASE}/inventory_lots_raw",
         headers=supabase_headers(prefer="return=minimal"),
         json=payload,
         timeout=60,
+        # 一般的 insert：伺服器寫進去了但回應逾時的話，重送會重複寫入
+        retries=0,
+        raise_for_status=False,
     )
     if not resp.ok:
         print(
@@ -206,12 +287,168 @@ def insert_inventory_lots_raw(rows: list[dict]):
     print(f"成功寫入 {len(payload)} 筆 inventory_lots_raw 記錄")
 
 
+# ---------- diff 模式：只送有變動的 lot ----------
+
+def _hash_fields(r: dict, fields: list[str]) -> str:
+    raw = "\x1f".join(str(r[f]) for f in fields)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def assign_lot_keys(rows: list[dict]) -> dict[str, dict]:
+    """回傳 {lot_key: row}，每筆 row 另外帶上 lot_hash。"""
+    seen: dict[str, int] = {}
+    keyed: dict[str, dict] = {}
+    for r in rows:
+        identity = _hash_fields(r, LOT_IDENTITY_FIELDS)[:20]
+        n = seen.get(identity, 0)
+        seen[identity] = n + 1
+        keyed[f"{identity}-{n}"] = {**r, "lot_hash": _hash_fields(r, LOT_CONTENT_FIELDS)}
+    return keyed
+
+
+def fetch_remote_lots() -> list[dict]:
+    """分頁抓遠端全部的 id / lot_key / lot_hash / acquired_at。"""
+    remote: list[dict] = []
+    offset = 0
+    while True:
+        resp = http_client.request(
+            "GET",
+            f"{REST_BASE}/inventory_lots_raw",
+            headers=supabase_headers(),
+            params={
+                "select": "id,lot_key,lot_hash,acquired_at",
+                "order": "id.asc",
+                "limit": REMOTE_PAGE_SIZE,
+                "offset": offset,
+            },
+            timeout=30,
+            # 遠端狀態每次都要是最新的，HTTP_CACHE=1 也不能讀快取
+            cache=False,
+        )
+        page = resp.json()
+        remote.extend(page)
+        if len(page) < REMOTE_PAGE_SIZE:
+            return remote
+        offset += REMOTE_PAGE_SIZE
+
+
+def plan_changes(local: dict[str, dict], remote: list[dict]):
+    """比對兩邊，回傳 (inserts, updates, delete_ids, unchanged 筆數)。"""
+    remote_by_key: dict[str, dict] = {}
+    delete_ids: list[int] = []
+    for item in remote:
+        key = item.get("lot_key")
+        if not key or key not in local or key in remote_by_key:
+            # 沒 key 的舊資料、CSV 已經沒有的、重複的 key 都刪掉
+            delete_ids.append(item["id"])
+        else:
+            remote_by_key[key] = item
+
+    now_ts = datetime.now(timezone.utc).isoformat()
+    inserts: list[dict] = []
+    updates: list[dict] = []
+    unchanged = 0
+    for key, r in local.items():
+        existing = remote_by_key.get(key)
+        if existing is not None and existing.get("lot_hash") == r["lot_hash"]:
+            unchanged += 1
+            continue
+
+        # CSV 沒填取得日：新增時用現在時間，修改時沿用遠端原本的值
+        if r["acquired_at"]:
+            acquired_at = r["acquired_at"]
+        elif existing is not None and existing.get("acquired_at"):
+            acquired_at = existing["acquired_at"]
+        else:
+            acquired_at = now_ts
+
+        row = build_payload_row(r, acquired_at)
+        row["lot_key"] = key
+        row["lot_hash"] = r["lot_hash"]
+        (inserts if existing is None else updates).append(row)
+
+    return inserts, updates, delete_ids, unchanged
+
+
+def _chunks(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _upsert_chunk(chunk: list[dict]) -> str | None:
+    resp = http_client.request(
+        "POST",
+        f"{REST_BASE}/inventory_lots_raw",
+        headers=supabase_headers(prefer="resolution=merge-duplicates,return=minimal"),
+        params={"on_conflict": "lot_key"},
+        json=chunk,
+        timeout=60,
+        # 依 lot_key upsert，重送也不會重複寫入
+        retries=http_client.MAX_RETRIES,
+        raise_for_status=False,
+    )
+    return None if resp.ok else f"upsert {len(chunk)} 筆失敗: {resp.status_code} {resp.text}"
+
+
+def _delete_chunk(ids: list[int]) -> str | None:
+    resp = http_client.request(
+        "DELETE",
+        f"{REST_BASE}/inventory_lots_raw",
+        headers=supabase_headers(prefer="return=minimal"),
+        params={"id": f"in.({','.join(str(i) for i in ids)})"},
+        timeout=30,
+        raise_for_status=False,
+    )
+    return None if resp.ok else f"刪除 {len(ids)} 筆失敗: {resp.status_code} {resp.text}"
+
+
+def _run_chunks(fn, chunks: list[list]) -> list[str]:
+    if not chunks:
+        return []
+    with ThreadPoolExecutor(SYNC_WORKERS) as pool:
+        results = list(pool.map(fn, chunks))
+    return [msg for msg in results if msg]
+
+
+def sync_inventory_diff(rows: list[dict], dry_run: bool = False):
+    local = assign_lot_keys(rows)
+    remote = fetch_remote_lots()
+    inserts, updates, delete_ids, unchanged = plan_changes(local, remote)
+
+    print(
+        f"CSV {len(local)} 筆，遠端 {len(remote)} 筆 → "
+        f"新增 {len(inserts)}、修改 {len(updates)}、刪除 {len(delete_ids)}、未變 {unchanged}"
+    )
+    if dry_run:
+        return
+
+    # 先寫入再刪除：就算中途失敗，表也不會是空的
+    errors = _run_chunks(_upsert_chunk, _chunks(inserts + updates, CHUNK_SIZE))
+    errors += _run_chunks(_delete_chunk, _chunks(delete_ids, CHUNK_SIZE))
+
+    if errors:
+        for msg in errors:
+            print(f"[錯誤] {msg}", file=sys.stderr)
+        sys.exit(1)
+    print(f"同步完成（每塊 {CHUNK_SIZE} 筆，{SYNC_WORKERS} 條平行連線）")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="把持有 CSV 同步到 Supabase")
+    parser.add_argument("--mode", choices=["replace", "diff"], default=SYNC_MODE)
+    parser.add_argument("--dry-run", action="store_true", help="diff 模式下只印出變更數量")
+    args = parser.parse_args()
+
     rows = load_csv_rows(CSV_PATH)
     if not rows:
         print("CSV 沒有任何持有資料，結束")
         return
 
+    resolve_prints(rows)
+
+    if args.mode == "diff":
+        sync_inventory_diff(rows, dry_run=args.dry_run)
+        return
+
     clear_inventory_lots_raw()
     insert_inventory_lots_raw(rows)
 
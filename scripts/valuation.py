@@ -0,0 +1,292 @@
+"""
+持有卡估價：把 inventory_lots_v2.csv 的每一筆 lot 對到 YUYU 價格，一次算出
+
+  - market_value  ：數量 × 販售價（sell_price_jpy）
+  - buyback_value ：數量 × 收購價（buy_price_jpy）
+  - cost          ：數量 × 單價，依 currency 換算成日圓
+  - pnl           ：market_value - cost（未實現損益）
+
+再依系列、來源（source_name）加總。CSV 讀進來之後，對價、換匯、加總
+都是 numpy 陣列運算，幾十萬筆 lot 也在一秒內算完。
+
+對價規則：用 print_index 把 (card_code, rarity, print_hint) 對到版本（print_key），
+同一組有好幾個版本時用普通版：
+  - 非數字的 print_hint（print_key，或 print_index.HINT_VARIANTS 明列的 C / P / C+P ...）
+    精確對到一個版本；沒有 print_hint 時用 rarity 當別名
+  - 數字的 print_hint 是伺服器的 print_id，用 print_index 從 inventory 學到的
+    print_id → print_key 對照；學不到才退回用 rarity 找
+
+匯率（換成日圓）：J / JPY = 1，其他幣別一定要用環境變數 HOCG_FX_<幣別>
+（例如 HOCG_FX_NTD=4.8）或 --fx NTD=4.8 指定，沒有內建值；
+inventory 裡有沒指定匯率的幣別就直接失敗。實際用到的匯率會印出來，也寫進 --json。
+
+用法：
+  python scripts/valuation.py --fx NTD=4.8 [--lots-out out.csv] [--json out.json]
+  python scripts/valuation.py --scale 300000    # 把 lot 複製到 30 萬筆測速度
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from card_codes import normalize_card_code
+from print_index import PrintIndex, build_index, print_key_for
+
+INVENTORY_CSV = "data/inventory_lots_v2.csv"
+PRICE_GLOB = "data/*_yuyutei_prices.csv"
+
+BASE_CURRENCY = "JPY"
+DEFAULT_FX = {"J": 1.0, "JPY": 1.0}  # 其他幣別的匯率會變，不放預設值
+
+
+# ----------------- 共用小工具 ----------------- #
+
+def _float(value) -> float:
+    value = (value or "").strip()
+    if not value:
+        return np.nan
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def load_fx(overrides: dict[str, float] | None = None) -> dict[str, float]:
+    fx = dict(DEFAULT_FX)
+    for name, value in os.environ.items():
+        if name.startswith("HOCG_FX_"):
+            fx[name[len("HOCG_FX_"):].upper()] = float(value)
+    fx.update(overrides or {})
+    return fx
+
+
+# ----------------- 載入成陣列 ----------------- #
+
+def load_prices(pattern: str = PRICE_GLOB) -> dict[str, np.ndarray]:
+    """每個版本（print_key）一列；同一版本出現在好幾個系列 CSV 時取第一次出現的。"""
+    prices: dict[str, tuple[float, float]] = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                if not r.get("rarity"):
+                    continue
+                key = print_key_for({**r, "card_code": normalize_card_code(r["card_code"])})
+                if key not in prices:
+                    prices[key] = (
+                        _float(r.get("sell_price_jpy")),
+                        _float(r.get("buy_price_jpy")),
+                    )
+
+    keys = list(prices)
+    return {
+        "key": np.array(keys, dtype=object),
+        "sell": np.array([prices[k][0] for k in keys], dtype=np.float64),
+        "buy": np.array([prices[k][1] for k in keys], dtype=np.float64),
+    }
+
+
+def _factorize(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """字串欄位轉成 (整數代碼, 名稱表)，後面的運算都只碰整數。"""
+    index: dict[str, int] = {}
+    codes = [index.setdefault(v, len(index)) for v in values]
+    return np.array(codes, dtype=np.int64), np.array(list(index), dtype=object)
+
+
+def load_lots(path: str = INVENTORY_CSV) -> dict[str, np.ndarray]:
+    """類別欄位（key / expansion / source / currency）存成代碼 + {欄位}_names。"""
+    keys, expansions, sources, currencies, qty, cost = [], [], [], [], [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            code = normalize_card_code(r.get("card_code"))
+            if not code:
+                continue
+            rarity = (r.get("rarity") or "").strip()
+            hint = (r.get("print_hint") or "").strip()
+            keys.append(f"{code}\t{rarity}\t{hint}")
+            expansions.append((r.get("expansion") or "").strip() or code.split("-")[0])
+            sources.append((r.get("source_name") or "").strip() or "(未填)")
+            currencies.append(((r.get("currency") or "").strip() or "J").upper())
+            qty.append(_float(r.get("acquired_qty")))
+            cost.append(_float(r.get("unit_cost")))
+
+    lots = {}
+    for name, values in (
+        ("key", keys),
+        ("expansion", expansions),
+        ("source", sources),
+        ("currency", currencies),
+    ):
+        lots[name], lots[f"{name}_names"] = _factorize(values)
+    return {
+        **lots,
+        "qty": np.nan_to_num(np.array(qty, dtype=np.float64)),
+        "unit_cost": np.nan_to_num(np.array(cost, dtype=np.float64)),
+    }
+
+
+def tile_lots(lots: dict[str, np.ndarray], n: int) -> dict[str, np.ndarray]:
+    reps = -(-n // max(len(lots["key"]), 1))
+    return {
+        name: arr if name.endswith("_names") else np.tile(arr, reps)[:n]
+        for name, arr in lots.items()
+    }
+
+
+# ----------------- 估價 ----------------- #
+
+def join_index(lots, prices, index: PrintIndex) -> np.ndarray:
+    """每筆 lot 對到的價格列 index，對不到是 -1。只對不重複的 key 查表一次。"""
+    position = {key: i for i, key in enumerate(prices["key"])}
+    triples = [
+        dict(zip(("card_code", "rarity", "print_hint"), name.split("\t")))
+        for name in lots["key_names"]
+    ]
+    index.learn_print_ids(triples)
+    per_key = []
+    for t in triples:
+        _, found = index.resolve(t["card_code"], t["rarity"], t["print_hint"])
+        per_key.append(position.get(found[0], -1) if found else -1)
+    return np.append(np.array(per_key, dtype=np.int64), -1)[lots["key"]]
+
+
+def value_lots(lots, prices, index: PrintIndex, fx: dict[str, float]) -> dict[str, np.ndarray]:
+    idx = join_index(lots, prices, index)
+    matched = idx >= 0
+    # 最後補一格 NaN，對不到的 -1 剛好取到它
+    sell = np.append(prices["sell"], np.nan)[idx]
+    buy = np.append(prices["buy"], np.nan)[idx]
+
+    currencies = lots["currency_names"]
+    missing_fx = [c for c in currencies if c not in fx]
+    if missing_fx:
+        raise ValueError(f"沒有匯率：{', '.join(missing_fx)}（用 HOCG_FX_<幣別> 或 --fx 指定）")
+    for c in currencies:
+        if c not in DEFAULT_FX:
+            print(f"💱 {c} → {BASE_CURRENCY}：{fx[c]:g}")
+    rate = np.array([fx[c] for c in currencies], dtype=np.float64)[lots["currency"]]
+
+    qty = lots["qty"]
+    cost = qty * lots["unit_cost"] * rate
+    market = qty * sell
+    buyback = qty * buy
+    return {
+        "matched": matched,
+        "sell": sell,
+        "buy": buy,
+        "cost": cost,
+        "market_value": market,
+        "buyback_value": buyback,
+        "pnl": market - cost,
+    }
+
+
+def aggregate(column: str, lots, values) -> list[dict]:
+    inv = lots[column]
+    names = lots[f"{column}_names"]
+    n = len(names)
+
+    def total(arr):
+        return np.bincount(inv, weights=np.nan_to_num(arr), minlength=n)
+
+    priced = ~np.isnan(values["market_value"])
+    cols = {
+        "lots": np.bincount(inv, minlength=n),
+        "qty": total(lots["qty"]),
+        "unpriced_lots": np.bincount(inv, weights=~priced, minlength=n),
+        "cost": total(values["cost"]),
+        "market_value": total(values["market_value"]),
+        "buyback_value": total(values["buyback_value"]),
+        # 沒價格的 lot 不算損益，免得成本被當成全額虧損
+        "pnl": total(np.where(priced, values["pnl"], 0.0)),
+    }
+    return [
+        {"group": names[i], **{k: round(float(v[i]), 2) for k, v in cols.items()}}
+        for i in np.argsort(names)
+    ]
+
+
+# ----------------- 輸出 ----------------- #
+
+def print_table(title: str, rows: list[dict]):
+    print(f"\n===== {title}（{BASE_CURRENCY}）=====")
+    print(f"  {'':<16} {'lots':>6} {'張數':>7} {'成本':>12} {'市價':>12} {'收購價':>12} {'損益':>12} {'無價格':>6}")
+    for r in rows:
+        print(
+            f"  {r['group']:<16} {r['lots']:>6.0f} {r['qty']:>7.0f} {r['cost']:>12,.0f} "
+            f"{r['market_value']:>12,.0f} {r['buyback_value']:>12,.0f} {r['pnl']:>12,.0f} "
+            f"{r['unpriced_lots']:>6.0f}"
+        )
+
+
+def write_lots(path: str, lots, values):
+    categories = ["expansion", "source", "currency"]
+    out = ["sell", "buy", "cost", "market_value", "buyback_value", "pnl"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["card_code", "rarity", "print_hint"] + categories + ["qty", "unit_cost"] + out)
+        for i in range(len(lots["key"])):
+            code, rarity, hint = lots["key_names"][lots["key"][i]].split("\t")
+            row = [code, rarity, hint] + [lots[f"{k}_names"][lots[k][i]] for k in categories]
+            row += [lots["qty"][i], lots["unit_cost"][i]]
+            row += ["" if np.isnan(values[k][i]) else round(float(values[k][i]), 2) for k in out]
+            writer.writerow(row)
+
+
+def _parse_fx(items: list[str]) -> dict[str, float]:
+    fx = {}
+    for item in items:
+        name, _, value = item.partition("=")
+        fx[name.strip().upper()] = float(value)
+    return fx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="持有卡估價")
+    parser.add_argument("--fx", action="append", default=[], help="匯率，例如 NTD=4.8")
+    parser.add_argument("--lots-out", help="每筆 lot 的估價另存 CSV")
+    parser.add_argument("--json", help="系列 / 來源的加總另存 JSON")
+    parser.add_argument("--scale", type=int, help="把 lot 複製到 N 筆，測速度用")
+    args = parser.parse_args()
+
+    fx = load_fx(_parse_fx(args.fx))
+    index = build_index()
+    prices = load_prices()
+    lots = load_lots()
+    if args.scale:
+        lots = tile_lots(lots, args.scale)
+
+    started = time.perf_counter()
+    try:
+        values = value_lots(lots, prices, index, fx)
+    except ValueError as e:
+        print(f"[錯誤] {e}", file=sys.stderr)
+        sys.exit(1)
+    used_fx = {c: fx[c] for c in lots["currency_names"]}
+    by_expansion = aggregate("expansion", lots, values)
+    by_source = aggregate("source", lots, values)
+    elapsed = time.perf_counter() - started
+
+    print_table("依系列", by_expansion)
+    print_table("依來源", by_source)
+    print(
+        f"\n{len(lots['key'])} 筆 lot、{len(prices['key'])} 筆價格，"
+        f"對到價格 {int(values['matched'].sum())} 筆，估價 {elapsed * 1000:.0f} ms"
+    )
+
+    if args.lots_out:
+        write_lots(args.lots_out, lots, values)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {"currency": BASE_CURRENCY, "fx": used_fx, "by_expansion": by_expansion, "by_source": by_source},
+                f, ensure_ascii=False, indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()